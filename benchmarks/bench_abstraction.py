@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark for abstracting Z3 expressions back into claripy ASTs.
+
+`fresh` abstracts a big simplified expression that was never abstracted before. `shared` abstracts ten new expressions
+on top of one that was already abstracted, so that nearly all of their nodes were seen before. `roundtrip` simplifies
+big expressions (with the simplification cache disabled) and converts the results back to Z3, as the solvers do with
+their simplified constraints. The times are per expression.
+"""
+
+import argparse
+import time
+
+import z3
+import claripy
+
+z3_backend = claripy.backends.z3
+
+def expression(tag, size):
+    xs = [ claripy.BVS('%s_%d' % (tag, i), 32) for i in range(8) ]
+    e = claripy.BVV(0, 32)
+    for i in range(size):
+        e = claripy.If(xs[i % 8] > i, e + xs[(i * 3) % 8] * (i + 1), e ^ (xs[(i * 5) % 8] << (i % 31)))
+    return e
+
+def count_nodes(z):
+    seen = set()
+    stack = [ z ]
+    while stack:
+        z = stack.pop()
+        if z.get_id() in seen:
+            continue
+        seen.add(z.get_id())
+        stack.extend(z.children())
+    return len(seen)
+
+def simplified(tag, size):
+    return z3.simplify(z3_backend.convert(expression(tag, size)))
+
+def fresh(rep, size):
+    z = simplified('fresh_%d' % rep, size)
+    start = time.time()
+    z3_backend._abstract(z)
+    return time.time() - start, count_nodes(z)
+
+def shared(rep, size):
+    z = simplified('shared_%d' % rep, size)
+    a = z3_backend._abstract(z) #pylint:disable=unused-variable
+    zs = [ z ^ k for k in range(10) ]
+    start = time.time()
+    for zk in zs:
+        z3_backend._abstract(zk)
+    return (time.time() - start) / len(zs), count_nodes(zs[0])
+
+def roundtrip(rep, size):
+    es = [ expression('roundtrip_%d_%d' % (rep, i), size // 2) for i in range(4) ]
+    for e in es:
+        z3_backend.convert(e)
+    nodes = sum(count_nodes(z3.simplify(z3_backend.convert(e))) for e in es)
+    start = time.time()
+    for e in es:
+        z3_backend.convert(z3_backend.simplify(e))
+    return (time.time() - start) / len(es), nodes // len(es)
+
+def run(workload, size, repeat):
+    best = None
+    for rep in range(repeat):
+        elapsed, nodes = workload(rep, size)
+        best = elapsed if best is None else min(best, elapsed)
+    return nodes, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=30, help="size of the expressions")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    z3_backend.set_simplification_cache_size(0)
+    for workload in (fresh, shared, roundtrip):
+        nodes, elapsed = run(workload, args.n, args.repeat)
+        print("%-10s %8d nodes %10.2f ms" % (workload.__name__, nodes, elapsed * 1000))
+
+if __name__ == '__main__':
+    main()
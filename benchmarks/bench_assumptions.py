@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Benchmark for many small queries with extra constraints over one big solver.
+
+The solver has the constraints of a mixing function over a symbolic input, as a path through a parser or a hash would
+have. Every query asks whether a few bytes of the input and of the output can take given values, with the extra
+constraints drawn from a small pool, so that consecutive queries share most of them. Each query is run either by
+pushing and popping the extra constraints (`push`) or by passing their indicator literals as assumptions
+(`assumptions`).
+"""
+
+import argparse
+import random
+import time
+
+import claripy
+
+z3 = claripy.backends.z3
+
+def build(rounds):
+    data = claripy.BVS('input', 64)
+    state = data
+    constraints = [ ]
+    for i in range(rounds):
+        state = (state ^ (state << 13)) + (state >> 7) + i
+        constraints.append(claripy.ULT(state[(i % 8) * 8 + 7:(i % 8) * 8], 0xf0))
+    return data, state, constraints
+
+def queries(data, state, n):
+    rng = random.Random(0)
+    pool = [ data.get_byte(i) == rng.randrange(0x20, 0x7f) for i in range(8) ]
+    pool += [ claripy.ULT(state.get_byte(i), rng.randrange(0x20, 0x100)) for i in range(8) ]
+    return [ rng.sample(pool, 3) for _ in range(n) ]
+
+def run(assumptions, rounds, n):
+    data, state, constraints = build(rounds)
+    qs = queries(data, state, n)
+    z3.set_extra_constraints_as_assumptions(assumptions)
+    solver = z3.solver()
+    z3.add(solver, constraints)
+
+    start = time.time()
+    results = [ z3.satisfiable(extra_constraints=q, solver=solver) for q in qs ]
+    return time.time() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=200, help="number of queries")
+    parser.add_argument('--rounds', type=int, default=8, help="rounds of the mixing function")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    try:
+        answers = { }
+        for mode in ('push', 'assumptions'):
+            best = None
+            for _ in range(args.repeat):
+                elapsed, answers[mode] = run(mode == 'assumptions', args.rounds, args.n)
+                best = elapsed if best is None else min(best, elapsed)
+            print("%-12s %10.2f ms/query %6d sat" % (mode, best * 1000 / args.n, sum(answers[mode])))
+        assert answers['push'] == answers['assumptions']
+    finally:
+        z3.set_extra_constraints_as_assumptions(False)
+
+if __name__ == '__main__':
+    main()
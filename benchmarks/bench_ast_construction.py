@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for AST construction.
+
+Every node built here is unique, so each construction goes through the whole hash-consing path (hash computation,
+hash cache miss, initialization). Run with `--legacy-hash` to measure the old md5+pickle hash for comparison, or with
+`--hash-only` to time both hashes alone.
+"""
+
+import argparse
+import hashlib
+import pickle
+import struct
+import time
+
+from past.builtins import long
+
+import claripy
+from claripy.ast import base
+from claripy.ast.base import Base
+
+_md5_unpacker = struct.Struct('2Q')
+
+def _legacy_calc_hash(op, args, keywords):
+    args_tup = tuple(long(a) if type(a) is int and int is not long else (a if type(a) in (long, float) else hash(a)) for a in args) #pylint:disable=unidiomatic-typecheck
+    to_hash = (op, args_tup, keywords['symbolic'], hash(keywords['variables']), str(keywords.get('length', None)), hash(keywords.get('annotations', None)))
+    hd = hashlib.md5(pickle.dumps(to_hash, -1)).digest()
+    return _md5_unpacker.unpack(hd)[0]
+
+def bench_bvs(n):
+    for i in range(n):
+        claripy.BVS('x', 32)
+
+def bench_bvv(n):
+    for i in range(n):
+        claripy.BVV(i, 64)
+
+def bench_add(n):
+    x = claripy.BVS('x', 32)
+    for i in range(n):
+        x + i
+
+def bench_concat(n):
+    x = claripy.BVS('x', 32)
+    for i in range(n):
+        claripy.Concat(x, claripy.BVV(i, 32))
+
+def bench_extract(n):
+    x = claripy.BVS('x', 64)
+    for i in range(n):
+        claripy.Extract(i % 64, 0, x + i)
+
+BENCHMARKS = [
+    ('BVS', bench_bvs),
+    ('BVV', bench_bvv),
+    ('__add__', bench_add),
+    ('Concat', bench_concat),
+    ('Extract', bench_extract),
+]
+
+def run(n, repeat):
+    results = { }
+    for name, f in BENCHMARKS:
+        best = None
+        for _ in range(repeat):
+            # drop whatever the previous round built, so that every node is constructed from scratch
+            Base._hash_cache.clear()
+            claripy.ast.bv._bvv_cache.clear()
+            start = time.time()
+            f(n)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = n / best
+    return results
+
+def run_hash_only(n, repeat):
+    """
+    Times the hash functions alone, on the arguments of the nodes that the benchmarks build. Both are timed in the same
+    process, which resolves differences that are lost in the noise of the whole construction.
+    """
+    results = { }
+    calc_hash = Base._calc_hash
+    for name, f in BENCHMARKS:
+        calls = [ ]
+        def recording(op, args, keywords):
+            calls.append((op, args, dict(keywords)))
+            return calc_hash(op, args, keywords)
+        Base._hash_cache.clear()
+        claripy.ast.bv._bvv_cache.clear()
+        Base._calc_hash = staticmethod(recording)
+        try:
+            f(n)
+        finally:
+            Base._calc_hash = staticmethod(calc_hash)
+
+        for label, h in (('current', calc_hash), ('legacy', _legacy_calc_hash)):
+            best = None
+            for _ in range(repeat):
+                # the names of the variables are new to the hash every time they are built
+                base._stable_hashes.clear()
+                start = time.time()
+                for op, args, keywords in calls:
+                    h(op, args, keywords)
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[(name, label)] = len(calls) / best
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=20000, help="nodes constructed per benchmark")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="repetitions (the best one is reported)")
+    parser.add_argument('--legacy-hash', action='store_true', help="use the md5+pickle hash")
+    parser.add_argument('--hash-only', action='store_true', help="time the current and the md5+pickle hash alone")
+    args = parser.parse_args()
+
+    if args.hash_only:
+        for (name, label), rate in sorted(run_hash_only(args.n, args.repeat).items()):
+            print("%-10s %-8s %12.0f hashes/sec" % (name, label, rate))
+        return
+
+    if args.legacy_hash:
+        Base._calc_hash = staticmethod(_legacy_calc_hash)
+
+    for name, rate in sorted(run(args.n, args.repeat).items()):
+        print("%-10s %12.0f nodes/sec" % (name, rate))
+
+if __name__ == '__main__':
+    main()
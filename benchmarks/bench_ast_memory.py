@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for AST nodes.
+
+Builds a workload of unique nodes (constants, arithmetic, extractions and concatenations over a few symbolic
+variables), keeps all of them alive and reports the traced memory per node.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import claripy
+
+def workload(rounds):
+    variables = [ claripy.BVS('v%d' % i, 32) for i in range(16) ]
+    keep = [ ]
+    for i in range(rounds):
+        # five new nodes: the constant, the addition, two extractions and the concatenation
+        v = variables[i % 16]
+        s = v + i
+        keep.append(s[15:0])
+        keep.append(claripy.Concat(s[31:16], v[15:0]))
+    return keep
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=1000000, help="approximate number of nodes to build")
+    args = parser.parse_args()
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    keep = workload(args.n // 5)
+    elapsed = time.time() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = len(claripy.ast.base.Base._hash_cache)
+    print("live ASTs:         %d" % nodes)
+    print("traced memory:     %.1f MiB" % (current / 1024. / 1024))
+    print("bytes per AST:     %.0f" % (float(current) / nodes))
+    print("construction time: %.1f s" % elapsed)
+    del keep
+
+if __name__ == '__main__':
+    main()
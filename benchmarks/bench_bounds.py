@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark for the min and max of many expressions under the same constraints.
+
+The expressions are the addresses of the fields of an array of structures, indexed by a bounded symbolic index and
+based at a symbolic, aligned pointer, as the accesses of a loop body would be. Their bounds are asked for either with
+a min() and a max() per address (`separate`) or with one bounds() call (`bounds`), on a fresh solver every time. The
+number of solver checks and the time are for all the addresses.
+"""
+
+import argparse
+import time
+
+import claripy
+from claripy.backends import backend_z3
+
+def addresses(n, bits):
+    base = claripy.BVS('base', bits)
+    index = claripy.BVS('index', bits)
+    constraints = [
+        claripy.ULT(index, 1000),
+        claripy.UGE(base, 0x10000),
+        claripy.ULE(base, 0x20000),
+        (base & 0xff) == 0,
+    ]
+    return [ base + index * 0x40 + i * 4 for i in range(n) ], constraints
+
+def separate(solver, exprs, signed):
+    if signed:
+        return [ (solver.min(e ^ (1 << (e.size() - 1))), solver.max(e ^ (1 << (e.size() - 1)))) for e in exprs ]
+    return [ (solver.min(e), solver.max(e)) for e in exprs ]
+
+def bounds(solver, exprs, signed):
+    if signed:
+        # like separate(), in the order of the flipped values
+        return [
+            tuple((v & ((1 << e.size()) - 1)) ^ (1 << (e.size() - 1)) for v in b)
+            for e, b in zip(exprs, solver.bounds(exprs, signed=True))
+        ]
+    return solver.bounds(exprs)
+
+def run(method, signed, n, bits):
+    exprs, constraints = addresses(n, bits)
+    solver = claripy.Solver()
+    solver.add(constraints)
+    before = backend_z3.solve_count
+    start = time.time()
+    results = method(solver, exprs, signed)
+    return backend_z3.solve_count - before, time.time() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=30, help="number of addresses")
+    parser.add_argument('--bits', type=int, default=64, help="size of the addresses")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    for signed in (False, True):
+        expected = None
+        for method in (separate, bounds):
+            best = None
+            for _ in range(args.repeat):
+                checks, elapsed, results = run(method, signed, args.n, args.bits)
+                best = elapsed if best is None else min(best, elapsed)
+            expected = results if expected is None else expected
+            assert results == expected
+            print("%-10s %-8s %8d checks %10.2f ms" % (
+                method.__name__, 'signed' if signed else 'unsigned', checks, best * 1000
+            ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Benchmark for building concrete-heavy expressions.
+
+This is what address computations look like in a lifter: a base plus a scaled index plus a displacement, truncated,
+extended, byte-swapped and compared, all over concrete values, so every operation gets evaluated right away. Run
+with `--no-folding` to evaluate them through the eager (concrete) backend instead of the constant folders.
+"""
+
+import argparse
+import time
+
+import claripy
+from claripy.ast import base
+
+def address_arithmetic(n):
+    base_address = claripy.BVV(0x400000, 64)
+    scale = claripy.BVV(8, 64)
+    for i in range(n):
+        index = claripy.BVV(i, 64)
+        addr = base_address + index * scale + 0x10
+        low = claripy.Extract(31, 0, addr)
+        ext = claripy.SignExt(32, low)
+        word = claripy.Concat(claripy.Extract(15, 0, ext), claripy.BVV(0, 16))
+        swapped = word.reversed
+        cond = claripy.And(addr > base_address, claripy.ULT(swapped, 0xffff0000))
+        claripy.If(cond, addr & 0xfffffffffffff000, addr >> 3)
+
+# the number of operations in one round of address_arithmetic()
+OPS_PER_ROUND = 14
+
+def run(n, repeat):
+    best = None
+    for _ in range(repeat):
+        base.Base._hash_cache.clear()
+        claripy.ast.bv._bvv_cache.clear()
+        start = time.time()
+        address_arithmetic(n)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return n * OPS_PER_ROUND / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help="address computations per round")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="repetitions (the best one is reported)")
+    parser.add_argument('--no-folding', action='store_true', help="evaluate through the eager backends")
+    args = parser.parse_args()
+
+    if args.no_folding:
+        base._folders = { }
+
+    print("%12.0f operations/sec" % run(args.n, args.repeat))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Benchmark for excavating and burrowing the ITEs of symbolic memory reads.
+
+A symbolic read of memory is an `ite_cases` chain over the candidate addresses. The `excavate` workload adds up reads
+of two memories at the same symbolic address, which excavation turns into an If over the address. The `burrow`
+workload is an If whose branches are long chains of subtractions that only differ in their innermost operand, which burrowing sinks
+all the way down. In the `shared` workload, many expressions use the same read, which is only excavated once.
+"""
+
+import argparse
+import time
+
+import claripy
+
+def read(name, addr, depth):
+    return claripy.ite_cases(
+        [ (addr == k, claripy.BVS('%s_%d' % (name, k), 32)) for k in range(depth) ], claripy.BVS('%s_default' % name, 32)
+    )
+
+def excavate(rep, depth):
+    addr = claripy.BVS('addr_%d' % rep, 64)
+    e = read('a_%d' % rep, addr, depth) + read('b_%d' % rep, addr, depth) + 1
+    return [ e.ite_excavated ]
+
+def burrow(rep, depth):
+    c = claripy.BVS('x_%d' % rep, 32) > 5
+    t = claripy.BVS('t_%d' % rep, 32)
+    f = claripy.BVS('f_%d' % rep, 32)
+    for k in range(depth):
+        v = claripy.BVS('v_%d_%d' % (rep, k), 32)
+        t = v - t
+        f = v - f
+    return [ claripy.If(c, t, f).ite_burrowed ]
+
+def shared(rep, depth):
+    addr = claripy.BVS('addr_%d' % rep, 64)
+    r = read('s_%d' % rep, addr, depth)
+    return [ (r + i).ite_excavated for i in range(depth) ]
+
+def run(workload, depth, repeat):
+    best = None
+    for rep in range(repeat):
+        start = time.time()
+        workload(rep, depth)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=200, help="cases of every read")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    for workload in (excavate, burrow, shared):
+        try:
+            print("%-10s %10.2f ms" % (workload.__name__, run(workload, args.n, args.repeat) * 1000))
+        except RuntimeError as e:
+            print("%-10s %s" % (workload.__name__, e))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark for the min/max strategies of the Z3 backend.
+
+Every query asks for the minimum or the maximum of a symbolic address (a base plus a scaled, bounded index, as in an
+array access) under the constraints of a path, with each strategy, unsigned and signed. The number of solver checks
+and the time are per query.
+"""
+
+import argparse
+import time
+
+import claripy
+from claripy.backends import backend_z3
+
+z3 = claripy.backends.z3
+
+def queries(n, bits):
+    for i in range(n):
+        base = claripy.BVS('base_%d' % i, bits)
+        index = claripy.BVS('index_%d' % i, bits)
+        addr = base + index * 8
+        constraints = [
+            claripy.ULT(index, 100 + i),
+            claripy.UGE(base, 0x1000 * (i + 1)),
+            claripy.ULE(base, 0x1000 * (i + 1) + 0x800),
+            (base & 0xf) == 0,
+        ]
+        yield addr, constraints
+
+def run(strategy, signed, n, bits):
+    checks = 0
+    elapsed = 0.0
+    results = [ ]
+    for addr, constraints in queries(n, bits):
+        solver = z3.solver()
+        z3.add(solver, [ z3.convert(c) for c in constraints ])
+        before = backend_z3.solve_count
+        start = time.time()
+        results.append((
+            z3.min(addr, solver=solver, signed=signed, strategy=strategy),
+            z3.max(addr, solver=solver, signed=signed, strategy=strategy),
+        ))
+        elapsed += time.time() - start
+        checks += backend_z3.solve_count - before
+    return checks / (2.0 * n), elapsed / (2.0 * n), results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=20, help="number of addresses")
+    parser.add_argument('--bits', type=int, default=64, help="size of the addresses")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    for signed in (False, True):
+        expected = None
+        for strategy in z3.MIN_MAX_STRATEGIES:
+            best = None
+            for _ in range(args.repeat):
+                checks, elapsed, results = run(strategy, signed, args.n, args.bits)
+                best = elapsed if best is None else min(best, elapsed)
+            expected = results if expected is None else expected
+            assert results == expected
+            print("%-10s %-8s %8.1f checks %10.2f ms" % (
+                strategy, 'signed' if signed else 'unsigned', checks, best * 1000
+            ))
+
+if __name__ == '__main__':
+    main()
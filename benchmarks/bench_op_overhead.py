@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for the overhead of the operation wrappers.
+
+The same expressions are built over and over, so after the first round every construction is a hash-cache hit and
+the time is dominated by the operator call itself. The wrapper overhead is the difference to constructing the very
+same ASTs directly through the AST class.
+"""
+
+import argparse
+import time
+
+import claripy
+
+def _best(f, n, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        f(n)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=50000, help="operator calls per benchmark")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    b = x == y
+    c = x != y
+
+    benchmarks = [
+        ('__add__', lambda n: [ x + y for _ in range(n) ],
+                    lambda n: [ claripy.ast.BV('__add__', (x, y), length=32, uninitialized=None) for _ in range(n) ]),
+        ('__invert__', lambda n: [ ~x for _ in range(n) ],
+                       lambda n: [ claripy.ast.BV('__invert__', (x,), length=32, uninitialized=None) for _ in range(n) ]),
+        ('SLT', lambda n: [ claripy.SLT(x, y) for _ in range(n) ],
+                lambda n: [ claripy.ast.Bool('SLT', (x, y), uninitialized=None) for _ in range(n) ]),
+        ('Extract', lambda n: [ claripy.Extract(15, 0, x) for _ in range(n) ],
+                    lambda n: [ claripy.ast.BV('Extract', (15, 0, x), length=16, uninitialized=None) for _ in range(n) ]),
+        ('Concat', lambda n: [ claripy.Concat(x, y) for _ in range(n) ],
+                   lambda n: [ claripy.ast.BV('Concat', (x, y), length=64, uninitialized=None) for _ in range(n) ]),
+        ('If', lambda n: [ claripy.If(b, x, y) for _ in range(n) ],
+               lambda n: [ claripy.ast.BV('If', (b, x, y), length=32, uninitialized=None) for _ in range(n) ]),
+        ('Or', lambda n: [ claripy.Or(b, c) for _ in range(n) ],
+               lambda n: [ claripy.ast.Bool('Or', (b, c), uninitialized=None) for _ in range(n) ]),
+    ]
+
+    print("%-12s %12s %12s %12s" % ("op", "call (us)", "direct (us)", "overhead (us)"))
+    for name, call, direct in benchmarks:
+        # the first rounds populate the hash cache
+        t_call = _best(call, args.n, args.repeat)
+        t_direct = _best(direct, args.n, args.repeat)
+        print("%-12s %12.2f %12.2f %12.2f" % (name, t_call * 1e6, t_direct * 1e6, (t_call - t_direct) * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark for serializing ASTs, compared to pickle.
+
+`memory` is a Concat of bytes, each of which is an If over a shared symbolic address. `arith` is a long chain of
+arithmetic over a few variables. `constraints` is a list of constraints over a shared base expression, serialized
+together as a path's constraints would be. Sizes are in bytes, and throughput is in ASTs (nodes of the DAGs) per
+second.
+"""
+
+import argparse
+import pickle
+import time
+
+import claripy
+from claripy.ast import serialization
+from claripy.ast.base import _iter_postorder
+
+def memory(size):
+    addr = claripy.BVS('addr', 64)
+    return [ claripy.Concat(*[
+        claripy.If(addr == i, claripy.BVS('v_%d' % i, 8), claripy.BVS('m_%d' % i, 8)) for i in range(size)
+    ]) ]
+
+def arith(size):
+    xs = [ claripy.BVS('x_%d' % i, 32) for i in range(4) ]
+    e = xs[0]
+    for i in range(size):
+        e = (e ^ xs[i % 4]) - (i * 0x10001)
+    return [ e ]
+
+def constraints(size):
+    base = claripy.BVS('input', 64) * 3 + claripy.BVS('offset', 64)
+    return [ claripy.ULT(base + i, claripy.BVS('bound_%d' % i, 64)) for i in range(size) ]
+
+def best_of(f, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        f()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def measure(dumps, loads, asts, nodes, repeat):
+    data = dumps(asts)
+    return len(data), nodes / best_of(lambda: dumps(asts), repeat), nodes / best_of(lambda: loads(data), repeat)
+
+def run(workload, size, repeat):
+    asts = workload(size)
+    nodes = sum(1 for _ in _iter_postorder(asts))
+    assert all(a is b for a, b in zip(serialization.loads(serialization.dumps(asts)), asts))
+
+    formats = [
+        ('dag', serialization.dumps, serialization.loads),
+        ('pickle', lambda a: pickle.dumps(a, -1), pickle.loads),
+    ]
+    for fmt, dumps, loads in formats:
+        try:
+            yield (fmt,) + measure(dumps, loads, asts, nodes, repeat)
+        except RuntimeError as e:
+            # pickle recurses into the arguments of the ASTs
+            yield fmt, e
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=1000, help="size of the expressions")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    args = parser.parse_args()
+
+    print("%-12s %-7s %10s %14s %14s" % ('workload', 'format', 'bytes', 'dumps/sec', 'loads/sec'))
+    for workload in (memory, arith, constraints):
+        for result in run(workload, args.n, args.repeat):
+            if len(result) == 2:
+                print("%-12s %-7s %s" % ((workload.__name__,) + result))
+            else:
+                print("%-12s %-7s %10d %14.0f %14.0f" % ((workload.__name__,) + result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark for the claripy-native rewrite rules against the Z3 round trip.
+
+The expressions look like what a lifter produces: redundant masks, double negations, merged constants and
+if-then-elses over negated conditions. In the `fresh` workload every expression is built over new variables, so
+nothing is cached. In the `incremental` workload, sibling states share a long prefix of constraints and each one adds
+a single new constraint before the whole conjunction is simplified, which is where the native rules can skip the
+parts that they already simplified. In the `repeated` workload, the same few constraints are simplified over and over,
+as they are in sibling states; run it with `--z3-cache-size 0` to see the cost without Z3's simplification cache.
+"""
+
+import argparse
+import time
+
+import claripy
+
+def junk(name, i):
+    x = claripy.BVS('x_%s' % name, 32)
+    y = claripy.BVS('y_%s' % name, 32)
+    c = claripy.BoolS('c_%s' % name)
+    masked = (x + i + 4) & 0xffffffff
+    noise = ~~(y ^ ~y) & (masked << 32)
+    e = claripy.If(claripy.Not(c), masked | noise, claripy.ZeroExt(0, y) * 1)
+    return claripy.And(claripy.ULE(e, e), e != y, claripy.Not(claripy.Not(c)))
+
+def fresh(rep, n):
+    return [ junk('%d_%d' % (rep, i), i) for i in range(n) ]
+
+def incremental(rep, n):
+    prefix = [ junk('%d_prefix_%d' % (rep, i), i) for i in range(50) ]
+    return [ claripy.And(*(prefix + [ junk('%d_%d' % (rep, i), i) ])) for i in range(n) ]
+
+def repeated(rep, n):
+    constraints = [ junk('%d_%d' % (rep, i), i) for i in range(20) ]
+    return [ constraints[i % len(constraints)] for i in range(n) ]
+
+def run(workload, simplify, n, repeat):
+    best = None
+    for rep in range(repeat):
+        exprs = workload(rep, n)
+        start = time.time()
+        for e in exprs:
+            simplify(e)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return n / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=200, help="expressions simplified per repetition")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    parser.add_argument('--z3-cache-size', type=int, default=None, help="size of Z3's simplification cache")
+    args = parser.parse_args()
+
+    if args.z3_cache_size is not None:
+        claripy.backends.z3.set_simplification_cache_size(args.z3_cache_size)
+
+    simplifiers = [
+        ('native', lambda e: claripy.simplify(e, full=False)),
+        ('z3', claripy.backends.z3.simplify),
+        ('full', claripy.simplify),
+        ('both', lambda e: claripy.backends.z3.simplify(claripy.simplify(e, full=False))),
+    ]
+    for workload in (fresh, incremental, repeated):
+        for name, simplify in simplifiers:
+            rate = run(workload, simplify, args.n, args.repeat)
+            print("%-12s %-8s %10.0f expressions/sec" % (workload.__name__, name, rate))
+
+if __name__ == '__main__':
+    main()
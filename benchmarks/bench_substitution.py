@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Benchmark for substituting single variables in big memory-style expressions.
+
+`concat` is a memory region: a Concat of bytes, each of which is an If over a symbolic address. `ite` is a chain of
+symbolic writes: If(addr == a_n, v_n, If(addr == a_n-1, v_n-1, ...)). Every value variable is substituted in turn, as
+when a solver's model is applied to memory one byte at a time. Run with `--no-index` to walk the whole expression for
+every substitution instead of using the occurrence index.
+"""
+
+import argparse
+import time
+
+import claripy
+from claripy.ast import occurrences
+
+def concat(size):
+    addr = claripy.BVS('addr', 64)
+    values = [ claripy.BVS('v_%d' % i, 8) for i in range(size) ]
+    old = [ claripy.BVS('m_%d' % i, 8) for i in range(size) ]
+    return claripy.Concat(*[ claripy.If(addr == i, values[i], old[i]) for i in range(size) ]), values
+
+def ite(size):
+    addr = claripy.BVS('addr', 64)
+    values = [ claripy.BVS('v_%d' % i, 8) for i in range(size) ]
+    e = claripy.BVS('initial', 8)
+    for i in range(size):
+        e = claripy.If(addr == i, values[i], e)
+    return e, values
+
+def run(workload, size, repeat):
+    best = None
+    for _ in range(repeat):
+        e, values = workload(size)
+        # the first substitution only marks the expression as one that gets substituted
+        e.replace(values[0], claripy.BVV(0, 8))
+        start = time.time()
+        for v in values:
+            e.replace(v, claripy.BVV(0x41, 8))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(values) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=512, help="bytes of memory (and substitutions)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="repetitions (the best one is reported)")
+    parser.add_argument('--no-index', action='store_true', help="do not use the occurrence index")
+    args = parser.parse_args()
+
+    if args.no_index:
+        occurrences.set_occurrence_index_cache_size(0)
+
+    for workload in (concat, ite):
+        print("%-8s %10.0f substitutions/sec" % (workload.__name__, run(workload, args.n, args.repeat)))
+
+if __name__ == '__main__':
+    main()
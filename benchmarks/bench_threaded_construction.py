@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Multi-threaded AST construction benchmark.
+
+Every thread builds the same expressions over a shared set of variables, which is the worst case for hash-consing:
+the threads keep racing to insert identical ASTs. The benchmark also checks that all threads ended up with the very
+same AST objects.
+"""
+
+import argparse
+import threading
+import time
+
+import claripy
+from claripy.ast.base import Base
+
+def build(variables, n, out):
+    r = [ ]
+    for i in range(n):
+        a = variables[i % len(variables)]
+        b = variables[(i * 7 + 3) % len(variables)]
+        r.append(claripy.If(a > b, claripy.Concat(a, b + i), claripy.Concat(b, a - i)))
+    out.append(r)
+
+def run(threads, n, variables):
+    Base._hash_cache.clear()
+    claripy.ast.bv._bvv_cache.clear()
+
+    results = [ ]
+    workers = [ threading.Thread(target=build, args=(variables, n, results)) for _ in range(threads) ]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.time() - start
+
+    first = results[0]
+    for r in results[1:]:
+        assert all(a is b for a, b in zip(first, r)), "threads built distinct ASTs for the same expression"
+
+    return threads * n / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=5000, help="expressions built per thread")
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[1, 2, 4, 8], help="thread counts to run")
+    args = parser.parse_args()
+
+    variables = [ claripy.BVS('v%d' % i, 32) for i in range(64) ]
+    for t in args.threads:
+        print("%2d threads %12.0f expressions/sec" % (t, run(t, args.n, variables)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for the variable sets that ASTs carry.
+
+The workload mimics a symbolic memory: a region of symbolic bytes is loaded as little-endian words, the words are
+combined arithmetically and stored back byte by byte. Run with `--no-interning` to give every AST its own variable set,
+like claripy used to.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import claripy
+from claripy.ast import base
+
+def workload(n):
+    memory = [ claripy.BVS('mem_%d' % i, 8) for i in range(n) ]
+    keep = [ ]
+    for i in range(0, n - 8, 4):
+        word = claripy.Concat(*reversed(memory[i:i+4]))
+        other = claripy.Concat(*reversed(memory[i+4:i+8]))
+        value = (word + other) ^ (word >> 3)
+        keep.append(value)
+        for j in range(4):
+            memory[i + j] = value[j*8+7:j*8]
+    keep.extend(memory)
+    return keep
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', type=int, default=4096, help="symbolic bytes in the memory region")
+    parser.add_argument('--no-interning', action='store_true', help="do not share variable sets between ASTs")
+    args = parser.parse_args()
+
+    if args.no_interning:
+        base._union_variables = lambda variable_sets: frozenset.union(frozenset(), *variable_sets)
+        base._intern_variables = frozenset
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    keep = workload(args.n)
+    elapsed = time.time() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    asts = list(base.Base._hash_cache.values())
+    print("live ASTs:              %d" % len(asts))
+    print("distinct variable sets: %d" % len(set(id(a.variables) for a in asts)))
+    print("traced memory:          %.1f MiB" % (current / 1024. / 1024))
+    print("construction time:      %.2f s" % elapsed)
+    del keep
+
+if __name__ == '__main__':
+    main()
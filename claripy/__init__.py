@@ -50,6 +50,7 @@ from .ast.base import *
 from .ast.bv import *
 from .ast.fp import *
 from .ast.bool import *
+from .ast.arena import ast_arena
 from . import ast
 del BV
 del Bool
@@ -83,6 +84,11 @@ backends = _backend_manager.backends
 
 def downsize():
     backends.downsize()
+    ast.occurrences.clear_occurrence_indexes()
+
+from . import persistent_store
+
+from . import stats
 
 #
 # Frontends
@@ -0,0 +1,96 @@
+import threading
+import logging
+
+l = logging.getLogger("claripy.ast.arena")
+
+# the number of arenas that are currently entered (in any thread). Base.__new__ checks this before looking for the
+# current arena, so that there is no overhead when arenas are not used.
+_active_arenas = 0
+_active_arenas_lock = threading.Lock()
+_tls = threading.local()
+
+def _arena_stack():
+    try:
+        return _tls.stack
+    except AttributeError:
+        _tls.stack = [ ]
+        return _tls.stack
+
+def current_arena():
+    """
+    :return: The innermost arena that the current thread is in, or None.
+    """
+    stack = _arena_stack()
+    return stack[-1] if stack else None
+
+class ASTArena(object):
+    """
+    An arena tracks the ASTs that are created while it is entered (by the current thread) and can evict all of them
+    from claripy's caches at once: from the hash-consing table, from the backends' object caches and from the Z3
+    abstraction cache. This makes the memory of an analysis job reclaimable as soon as the job is over, instead of
+    depending on when the last reference to each AST happens to go away.
+
+    An AST belongs to the innermost arena that was entered when the AST was created. ASTs that already existed
+    are not tracked, even if they are constructed again inside the arena. Only the caches of the releasing thread
+    are evicted, since the backends keep their caches per thread.
+
+    Released ASTs are no longer hash-consed: if any of them is still in use, an identical AST built later will be a
+    different object. Release an arena only once its ASTs are not needed anymore.
+    """
+
+    def __init__(self):
+        self._hashes = set()
+
+    def __enter__(self):
+        global _active_arenas #pylint:disable=global-statement
+        _arena_stack().append(self)
+        with _active_arenas_lock:
+            _active_arenas += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_arenas #pylint:disable=global-statement
+        stack = _arena_stack()
+        if not stack or stack[-1] is not self:
+            l.warning("Exiting an arena that is not the innermost one.")
+        if self in stack:
+            stack.remove(self)
+        with _active_arenas_lock:
+            _active_arenas -= 1
+
+    def _track(self, h):
+        self._hashes.add(h)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def release(self):
+        """
+        Evicts the ASTs of this arena from the hash-consing table and the backend caches, and forgets about them.
+
+        :return: The number of ASTs that were still alive and got evicted.
+        """
+        asts = [ ]
+        for h in self._hashes:
+            a = Base._hash_cache.pop(h, None)
+            if a is not None:
+                asts.append(a)
+        self._hashes = set()
+
+        backends.evict(asts)
+        return len(asts)
+
+def ast_arena():
+    """
+    Creates an arena for the ASTs constructed in a `with` block. Use it as::
+
+        with claripy.ast_arena() as arena:
+            run_analysis_job()
+        arena.release()
+
+    :return: An ASTArena.
+    """
+    return ASTArena()
+
+from .base import Base
+from ..backend_manager import backends
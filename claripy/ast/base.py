@@ -6,20 +6,305 @@ import numbers
 import os
 import struct
 import weakref
+from ..utils import ShardedWeakValueDictionary
 from ..utils.transition import raise_from
-from past.builtins import long
-
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
+from past.builtins import long, unicode
 
 import ana
 
 l = logging.getLogger("claripy.ast")
 
 WORKER = bool(os.environ.get('WORKER', False))
-md5_unpacker = struct.Struct('2Q')
+float_packer = struct.Struct('<d')
+
+#
+# AST hashing
+#
+
+# the hashes are signed 64-bit integers, so that hash(ast) == ast._hash (Python only keeps __hash__ results that fit in
+# a Py_ssize_t as they are)
+_hash_packer = struct.Struct('<q')
+_stable_hash_unpacker = struct.Struct('<Q')
+
+# the tags of the values in the tuples that AST hashes are computed from
+_H_AST, _H_NONE, _H_TRUE, _H_FALSE, _H_INT, _H_NEG, _H_BIG, _H_STR, _H_OTHER, _H_ANNOTATIONS = range(10)
+# ints below this hash to themselves, and so do the stable hashes
+_H_SMALL = 1 << 60
+_H_LOW = 0xffffffff
+
+# the stable hashes of strings (mostly ops and variable names), which Python only hashes with a per-process seed
+_stable_hashes = { }
+_stable_hashes_max = 100000
+
+def _stable_hash(a):
+    """
+    :return: A 60-bit hash of a non-AST object that does not change between processes (unless the object is only known
+             to the hash encoding of _fingerprint_encode() by its builtin hash).
+    """
+    return _stable_hash_unpacker.unpack_from(hashlib.md5(_fingerprint_bytes(a, True)).digest())[0] >> 4
+
+def _stable_str_hash(a):
+    try:
+        return _stable_hashes[a]
+    except KeyError:
+        if len(_stable_hashes) >= _stable_hashes_max:
+            _stable_hashes.clear()
+        # most of these are new variable names, which are hashed the way _stable_hash() would, minus the encoding
+        if type(a) is unicode:
+            e = a.encode('utf-8')
+            d = hashlib.md5(b'u%d:%s' % (len(e), e)).digest()
+        elif type(a) is bytes:
+            d = hashlib.md5(b's%d:%s' % (len(a), a)).digest()
+        else:
+            h = _stable_hashes[a] = _stable_hash(a)
+            return h
+        h = _stable_hashes[a] = _stable_hash_unpacker.unpack_from(d)[0] >> 4
+        return h
+
+def _hash_int(a, out):
+    """
+    Appends the values that an int contributes to an AST hash to `out`. Ints that Python would reduce modulo 2**61-1
+    when it hashes them are split into chunks.
+    """
+    if 0 <= a < _H_SMALL:
+        out += (_H_INT, a)
+    elif -_H_SMALL < a < 0:
+        # -1 hashes to the same value as -2, so negative ints are negated
+        out += (_H_NEG, -a)
+    else:
+        chunks = [ ]
+        n = -a if a < 0 else a
+        while n:
+            chunks.append(n & (_H_SMALL - 1))
+            n >>= 60
+        out += (_H_BIG, a < 0, len(chunks))
+        out += chunks
+
+#
+# AST fingerprinting
+#
+
+def _fingerprint_encode(a, out, hashing=False):
+    """
+    Appends an unambiguous, process-independent byte encoding of the non-AST object `a` to the list `out`. Child ASTs
+    are encoded by their fingerprint, which must have been computed already, or by their hash if `hashing` is set.
+
+    Besides the builtin scalars and containers, only claripy's own value objects (sorts, annotations and backend
+    objects) are known. They are encoded as their class and their state (__getstate__() if they define it, their
+    __dict__ otherwise), so a subclass that keeps state elsewhere has to define __getstate__. Other objects raise a
+    ClaripySerializationError, or, when hashing, are encoded by their builtin hash.
+    """
+    t = type(a)
+    if a is None:
+        out.append(b'N')
+    elif t is bool:
+        out.append(b'T' if a else b'F')
+    elif t is int or t is long:
+        out.append(b'i%d;' % a)
+    elif t is float:
+        out.append(b'f' + float_packer.pack(a))
+    elif isinstance(a, Base):
+        out.append(b'a' + (_hash_packer.pack(a._hash) if hashing else a._fingerprint))
+    elif isinstance(a, (bytes, unicode)):
+        if t is not bytes and t is not unicode:
+            # str subclasses (such as fp.RM) are tagged with their type
+            out.append(('c%s;' % t.__name__).encode())
+        if isinstance(a, unicode):
+            a = a.encode('utf-8')
+            out.append(b'u')
+        else:
+            out.append(b's')
+        out.append(('%d:' % len(a)).encode())
+        out.append(a)
+    elif t is tuple or t is list:
+        out.append(('t%d:' % len(a)).encode())
+        for e in a:
+            _fingerprint_encode(e, out, hashing)
+    elif isinstance(a, (set, frozenset, dict)):
+        # the elements are sorted by their encoding, since the iteration order depends on the hashes
+        items = a.items() if isinstance(a, dict) else a
+        encoded = sorted(_fingerprint_bytes(e, hashing) for e in items)
+        out.append(('%s%d:' % ('d' if isinstance(a, dict) else 'e', len(encoded))).encode())
+        out.extend(encoded)
+    elif hashing and isinstance(a, Annotation):
+        # annotations have always been told apart by their own hash within a process
+        out.append(b'h' + _hash_packer.pack(hash(a)))
+    elif isinstance(a, (FSort, Annotation, BackendObject)):
+        # claripy's own value objects are identified by their class and their state
+        getstate = getattr(a, '__getstate__', None)
+        if getstate is not None:
+            state = getstate()
+        elif hasattr(a, '__dict__'):
+            state = a.__dict__
+        else:
+            raise ClaripySerializationError("can't fingerprint an instance of %s without state" % t.__name__)
+        out.append(('o%s.%s;' % (t.__module__, t.__name__)).encode())
+        _fingerprint_encode(state, out, hashing)
+    elif hashing:
+        # the hash only has to identify the object within this process
+        out.append(b'h' + _hash_packer.pack(hash(a)))
+    else:
+        raise ClaripySerializationError("can't fingerprint an object of type %s" % t.__name__)
+
+def _fingerprint_bytes(a, hashing=False):
+    out = [ ]
+    _fingerprint_encode(a, out, hashing)
+    return b''.join(out)
+
+#
+# AST variable sets
+#
+
+class _VariableSet(frozenset):
+    """
+    The interned sets of variable names that ASTs carry. Only _intern_variables() creates them, so every instance is
+    the canonical one for its contents (except for the rare sets whose hash collides with another interned set).
+    """
+    __slots__ = ('_stable_hash',)
+
+    @property
+    def stable_hash(self):
+        """
+        The hash that this set contributes to the AST hashes: the stable hash of the variable name for sets of one
+        variable (most of them), and that of the sorted names otherwise.
+        """
+        try:
+            return self._stable_hash
+        except AttributeError:
+            if len(self) == 1:
+                for v in self:
+                    h = _stable_str_hash(v)
+            else:
+                # the names are sorted by their encoding, since some are bytes and others are not
+                h = _stable_hash(tuple(sorted(_fingerprint_bytes(v) for v in self)))
+            self._stable_hash = h
+            return h
+
+    def __reduce__(self):
+        return _intern_variables, (frozenset(self),)
+
+# the interned sets, by their hashes. Only weak references to the sets are kept (which remove themselves when their
+# sets are freed), so that the keys do not keep the sets alive.
+_variable_sets = { }
+_empty_variables = _VariableSet()
+# the unions of two interned sets, by the ids of the sets: the weak references to the two sets and to their union
+_variable_set_unions = { }
+_variable_set_unions_max = 4096
+
+def _forget_variables(ref):
+    # a set is only forgotten if it is still the one with its hash, and not one that replaced it
+    if _variable_sets.get(ref.key, None) is ref:
+        _variable_sets.pop(ref.key, None)
+
+def _intern_variables(variables):
+    """
+    Returns the canonical (shared) set of variable names that is equal to `variables`.
+    """
+    if type(variables) is _VariableSet:
+        return variables
+    if not variables:
+        return _empty_variables
+    if type(variables) is not frozenset:
+        variables = frozenset(variables)
+
+    h = hash(variables)
+    ref = _variable_sets.get(h, None)
+    if ref is not None:
+        v = ref()
+        if v is not None and v == variables:
+            return v
+        if v is not None:
+            # another set has the same hash, which is rare enough to leave this one out of the table
+            return _VariableSet(variables)
+
+    v = _VariableSet(variables)
+    _variable_sets[h] = weakref.KeyedRef(v, _forget_variables, h)
+    return v
+
+def _union_variables(variable_sets):
+    """
+    Returns the canonical union of a list of canonical sets of variable names. Most ASTs have children that share the
+    same set, which is returned as is. Unions of two sets are cached, and bigger ones (such as the arguments of a wide
+    Concat) are computed in one go, instead of interning every intermediate set.
+    """
+    if not variable_sets:
+        return _empty_variables
+
+    r = variable_sets[0]
+    others = None
+    for v in variable_sets[1:]:
+        if v is r or not v:
+            continue
+        if not r:
+            r = v
+            continue
+        # the sets are canonical, so they are compared by identity
+        if others is None:
+            others = { id(v): v }
+        else:
+            others[id(v)] = v
+
+    if others is None:
+        return r
+    if len(others) > 1:
+        return _intern_variables(r.union(*others.values()))
+
+    v, = others.values()
+    key = (id(r), id(v))
+    cached = _variable_set_unions.get(key, None)
+    if cached is not None:
+        # the ids of freed sets can be reused, so the sets themselves are checked
+        r_ref, v_ref, u_ref = cached
+        u = u_ref()
+        if u is not None and r_ref() is r and v_ref() is v:
+            return u
+
+    if len(_variable_set_unions) >= _variable_set_unions_max:
+        _variable_set_unions.clear()
+    u = _intern_variables(r | v)
+    _variable_set_unions[key] = (weakref.ref(r), weakref.ref(v), weakref.ref(u))
+    return u
+
+#
+# AST annotation bookkeeping
+#
+
+_empty_uneliminatable_annotations = frozenset()
+_empty_relocatable_annotations = collections.OrderedDict().keys()
+
+#
+# AST traversal
+#
+
+def _iter_postorder(roots, memo=None, descend=None):
+    """
+    Walks the DAG below `roots` with an explicit stack and yields every AST exactly once, after all of its AST
+    arguments (and from left to right). This is the traversal that the AST walks are built on, so that they are not
+    limited by Python's recursion limit.
+
+    :param roots:   An iterable of ASTs to start from.
+    :param memo:    A container of cache keys. ASTs whose cache key is in it (when they are reached) are neither yielded
+                    nor descended into, since their result is already known. Results that the caller stores into it
+                    while iterating are honored.
+    :param descend: An optional function. The arguments of an AST for which it returns False are not visited (the AST
+                    itself is still yielded).
+    """
+    seen = set()
+    stack = [ (r, False) for r in reversed(tuple(roots)) ]
+    while stack:
+        ast, expanded = stack.pop()
+        if expanded:
+            yield ast
+            continue
+
+        # everything that is on the stack is alive, so the ids are unique
+        if id(ast) in seen or (memo is not None and ast._cache_key in memo):
+            continue
+        seen.add(id(ast))
+
+        stack.append((ast, True))
+        if descend is None or descend(ast):
+            stack.extend((a, False) for a in reversed(ast.args) if isinstance(a, Base))
 
 #pylint:enable=unused-argument
 #pylint:disable=unidiomatic-typecheck
@@ -43,6 +328,64 @@ class ASTCacheKey(object):
     def __repr__(self):
         return '<Key %s %s>' % (self.ast._type_name(), self.ast.__repr__(inner=True))
 
+#
+# Rarely used AST fields
+#
+
+class _ASTExtension(object):
+    """
+    Holds the fields that almost all ASTs leave empty, so that they only take up memory on the ASTs that use them.
+    """
+    __slots__ = (
+        'uninitialized', 'uc_alloc_depth', 'excavated', 'burrowed', 'eager_backends', 'rewritten', 'dag_size',
+        'occurrence_index',
+    )
+
+    def __init__(self):
+        self.uninitialized = None
+        self.uc_alloc_depth = None
+        self.excavated = None
+        self.burrowed = None
+        self.eager_backends = None
+        self.rewritten = None
+        self.dag_size = None
+        self.occurrence_index = None
+
+def _ext_property(name):
+    def getter(self):
+        ext = self._ext
+        return None if ext is None else getattr(ext, name)
+
+    def setter(self, v):
+        ext = self._ext
+        if ext is None:
+            if v is None:
+                return
+            ext = self._ext = _ASTExtension()
+        setattr(ext, name, v)
+
+    return property(getter, setter)
+
+#
+# Backend errors
+#
+
+# the backends that failed to convert an AST (or something below it). Conversion errors are rare, so almost every AST
+# shares this empty set, and a failing backend replaces the set of the failing AST instead of mutating it.
+_empty_errored = frozenset()
+
+#
+# Hash-consing statistics (see claripy.stats). They are not updated atomically, so they are approximate when several
+# threads build ASTs.
+#
+
+_hash_cache_hits = 0
+_hash_cache_misses = 0
+
+# the constant folders of the operations, by op name (see folding.py). This is filled in at the bottom of this module,
+# since the folders build BVVs and BoolVs, so the ASTs created while claripy is still being imported are not folded.
+_folders = { }
+
 #
 # AST variable naming
 #
@@ -76,10 +419,11 @@ class Base(ana.Storable):
     :ivar args:         The arguments that are being used
     """
 
-    __slots__ = [ 'op', 'args', 'variables', 'symbolic', '_hash', '_simplified',
-                  '_cache_key', '_errored', '_eager_backends', 'length', '_excavated', '_burrowed', '_uninitialized',
-                  '_uc_alloc_depth', 'annotations', 'simplifiable', '_uneliminatable_annotations', '_relocatable_annotations']
-    _hash_cache = weakref.WeakValueDictionary()
+    __slots__ = [ 'op', 'args', 'variables', 'symbolic', '_hash', '_fingerprint', '_simplified',
+                  '_cache_key_object', '_errored', 'length', '_ext', 'annotations', 'simplifiable', '_annotated',
+                  '_tree_depth', '_tree_size',
+                  '_uneliminatable_annotations', '_relocatable_annotations']
+    _hash_cache = ShardedWeakValueDictionary()
 
     FULL_SIMPLIFY=1
     LITE_SIMPLIFY=2
@@ -110,21 +454,33 @@ class Base(ana.Storable):
         #if any(isinstance(a, BackendObject) for a in args):
         #   raise Exception('asdf')
 
+        # concrete operations are folded directly on ints, as long as the concrete backend is the one that would
+        # have evaluated them eagerly
+        folder = _folders.get(op)
+        if folder is not None and 'eager_backends' not in kwargs and not kwargs.get('symbolic', False):
+            eager_backends = backends._eager_backends
+            if eager_backends and eager_backends[0] is backends._backends_by_name.get('concrete'):
+                r = folder(args)
+                if r is not None:
+                    return r
+
         # fix up args and kwargs
         a_args = tuple((a.to_claripy() if isinstance(a, BackendObject) else a) for a in args)
         if 'symbolic' not in kwargs:
             kwargs['symbolic'] = any(a.symbolic for a in a_args if isinstance(a, Base))
         if 'variables' not in kwargs:
-            kwargs['variables'] = frozenset.union(
-                frozenset(), *(a.variables for a in a_args if isinstance(a, Base))
-            )
-        elif type(kwargs['variables']) is not frozenset: #pylint:disable=unidiomatic-typecheck
-            kwargs['variables'] = frozenset(kwargs['variables'])
+            kwargs['variables'] = _union_variables([ a.variables for a in a_args if isinstance(a, Base) ])
+        else:
+            kwargs['variables'] = _intern_variables(kwargs['variables'])
         if 'errored' not in kwargs:
-            kwargs['errored'] = set.union(set(), *(a._errored for a in a_args if isinstance(a, Base)))
+            errored = _empty_errored
+            for a in a_args:
+                if isinstance(a, Base) and a._errored:
+                    errored = a._errored if not errored else errored | a._errored
+            kwargs['errored'] = errored
 
         if 'add_variables' in kwargs:
-            kwargs['variables'] = kwargs['variables'] | kwargs['add_variables']
+            kwargs['variables'] = _intern_variables(kwargs['variables'] | kwargs['add_variables'])
 
         eager_backends = list(backends._eager_backends) if 'eager_backends' not in kwargs else kwargs['eager_backends']
 
@@ -152,13 +508,23 @@ class Base(ana.Storable):
         if 'annotations' not in kwargs:
             kwargs['annotations'] = ()
 
+        global _hash_cache_hits, _hash_cache_misses #pylint:disable=global-statement
         h = Base._calc_hash(op, a_args, kwargs)
         self = cls._hash_cache.get(h, None)
-        if self is None:
+        if self is not None:
+            _hash_cache_hits += 1
+        else:
+            _hash_cache_misses += 1
             self = super(Base, cls).__new__(cls)
             self.__a_init__(op, a_args, **kwargs)
             self._hash = h
-            cls._hash_cache[h] = self
+            # if another thread created the same AST in the meantime, we use that one
+            new = self
+            self = cls._hash_cache.setdefault(h, new)
+            if arena._active_arenas and self is new:
+                a = arena.current_arena()
+                if a is not None:
+                    a._track(h)
         # else:
         #    if self.args != f_args or self.op != f_op or self.variables != f_kwargs['variables']:
         #        raise Exception("CRAP -- hash collision")
@@ -178,17 +544,45 @@ class Base(ana.Storable):
         :param keywords:    A dict including the 'symbolic', 'variables', and 'length' items.
         :returns:           a hash.
 
-        We do it using md5 to avoid hash collisions.
-        (hash(-1) == hash(-2), for example)
+        The hash is built incrementally from the (already computed) hashes of the child ASTs. Each node only puts
+        them, the stable hashes of its other arguments and of its variables (which are cached), and tags that keep the
+        values apart into a tuple of ints, which Python hashes into 64 bits. None of this depends on Python's hash
+        randomization, unless an argument or annotation is of a type that the fingerprint encoding does not know.
         """
-        args_tup = tuple(long(a) if type(a) is int and int is not long else (a if type(a) in (long, float) else hash(a)) for a in args)
-        to_hash = (op, args_tup, keywords['symbolic'], hash(keywords['variables']), str(keywords.get('length', None)), hash(keywords.get('annotations', None)))
+        out = [ _stable_str_hash(op), len(args) ]
+        for a in args:
+            t = type(a)
+            if isinstance(a, Base):
+                # Python reduces ints modulo 2**61-1 when it hashes them, so the 64 bits go in two halves
+                h = a._hash
+                out += (_H_AST, (h >> 32) & _H_LOW, h & _H_LOW)
+            elif a is None:
+                out.append(_H_NONE)
+            elif t is int or t is long:
+                if 0 <= a < _H_SMALL:
+                    out += (_H_INT, a)
+                else:
+                    _hash_int(a, out)
+            elif t is bool:
+                out.append(_H_TRUE if a else _H_FALSE)
+            elif t is str or t is bytes:
+                out += (_H_STR, _stable_str_hash(a))
+            else:
+                out += (_H_OTHER, _stable_hash(a))
+        out.append(_H_TRUE if keywords['symbolic'] else _H_FALSE)
+        out.append(keywords['variables'].stable_hash)
+        length = keywords.get('length', None)
+        if length is None:
+            out.append(_H_NONE)
+        else:
+            _hash_int(length, out)
+        annotations = keywords.get('annotations', None)
+        if annotations:
+            # annotations have always been told apart by their own hash within a process
+            out += (_H_ANNOTATIONS, len(annotations))
+            out += [ hash(an) for an in annotations ]
 
-        # Why do we use md5 when it's broken? Because speed is more important
-        # than cryptographic integrity here. Then again, look at all those
-        # allocations we're doing here... fast python is painful.
-        hd = hashlib.md5(pickle.dumps(to_hash, -1)).digest()
-        return md5_unpacker.unpack(hd)[0] # 64 bits
+        return hash(tuple(out))
 
     def _get_hashables(self):
         return self.op, tuple(str(a) if isinstance(a, numbers.Number) else hash(a) for a in self.args), self.symbolic, hash(self.variables), str(self.length)
@@ -204,31 +598,49 @@ class Base(ana.Storable):
         self.op = op
         self.args = args
         self.length = length
-        self.variables = frozenset(variables)
+        self.variables = _intern_variables(variables)
         self.symbolic = symbolic
+        self._ext = None
         self._eager_backends = eager_backends
+        self._fingerprint = None
 
-        self._errored = errored if errored is not None else set()
+        self._errored = frozenset(errored) if errored else _empty_errored
 
         self._simplified = simplified
-        self._cache_key = ASTCacheKey(self)
-        self._excavated = None
-        self._burrowed = None
+        self._cache_key_object = None
 
-        self._uninitialized = uninitialized
+        if uninitialized is not False or op != 'BVS':
+            # the BVS args include the flag, so a BVS that is not uninitialized does not need an extension for it
+            self._uninitialized = uninitialized
         self._uc_alloc_depth = uc_alloc_depth
         self.annotations = annotations
 
         ast_args = tuple(a for a in self.args if isinstance(a, Base))
-        self._uneliminatable_annotations = frozenset(itertools.chain(
-            itertools.chain.from_iterable(a._uneliminatable_annotations for a in ast_args),
-            tuple(a for a in self.annotations if not a.eliminatable and not a.relocatable)
-        ))
 
-        self._relocatable_annotations = collections.OrderedDict((e, True) for e in tuple(itertools.chain(
-            itertools.chain.from_iterable(a._relocatable_annotations for a in ast_args),
-            tuple(a for a in self.annotations if not a.eliminatable and a.relocatable)
-        ))).keys()
+        # whether there are annotations on this AST or anywhere below it. Most ASTs have none, and they all share the
+        # same empty annotation bookkeeping.
+        self._annotated = bool(self.annotations) or any(a._annotated for a in ast_args)
+        if not self._annotated:
+            self._uneliminatable_annotations = _empty_uneliminatable_annotations
+            self._relocatable_annotations = _empty_relocatable_annotations
+        else:
+            self._uneliminatable_annotations = frozenset(itertools.chain(
+                itertools.chain.from_iterable(a._uneliminatable_annotations for a in ast_args),
+                tuple(a for a in self.annotations if not a.eliminatable and not a.relocatable)
+            ))
+
+            self._relocatable_annotations = collections.OrderedDict((e, True) for e in tuple(itertools.chain(
+                itertools.chain.from_iterable(a._relocatable_annotations for a in ast_args),
+                tuple(a for a in self.annotations if not a.eliminatable and a.relocatable)
+            ))).keys()
+
+        # the structural metrics that only depend on the arguments are maintained as the ASTs are built
+        if ast_args:
+            self._tree_depth = 1 + max(a._tree_depth for a in ast_args)
+            self._tree_size = 1 + sum(a._tree_size for a in ast_args)
+        else:
+            self._tree_depth = 1
+            self._tree_size = 1
 
         if len(args) == 0:
             raise ClaripyOperationError("AST with no arguments!")
@@ -261,6 +673,34 @@ class Base(ana.Storable):
     def __hash__(self):
         return self._hash
 
+    @property
+    def fingerprint(self):
+        """
+        A 128-bit (16 byte) digest of the structure of this AST. Unlike the hash, the fingerprint does not depend on
+        Python's hash randomization, so it is identical across processes and interpreter runs and can be used to key
+        persistent or shared caches. It is computed on first access and memoized.
+
+        :raises ClaripySerializationError: if an argument or annotation is of a type that can't be fingerprinted.
+        """
+        if self._fingerprint is None:
+            self._compute_fingerprints()
+        return self._fingerprint
+
+    def _compute_fingerprints(self):
+        for ast in _iter_postorder((self,), descend=lambda a: a._fingerprint is None):
+            if ast._fingerprint is not None:
+                continue
+
+            out = [ ]
+            _fingerprint_encode(ast.op, out)
+            _fingerprint_encode(ast.args, out)
+            _fingerprint_encode(ast.length, out)
+            _fingerprint_encode(ast.symbolic, out)
+            out.append(('v%d:' % len(ast.variables)).encode())
+            out.extend(sorted(_fingerprint_bytes(v) for v in ast.variables))
+            _fingerprint_encode(ast.annotations, out)
+            ast._fingerprint = hashlib.md5(b''.join(out)).digest()
+
     @property
     def cache_key(self):
         """
@@ -268,6 +708,25 @@ class Base(ana.Storable):
         """
         return self._cache_key
 
+    @property
+    def _cache_key(self):
+        # the cache key is only created once something wants to use the AST as a key
+        k = self._cache_key_object
+        if k is None:
+            k = self._cache_key_object = ASTCacheKey(self)
+        return k
+
+    # the rarely used fields live in an _ASTExtension, which is only created when one of them is set
+    _uninitialized = _ext_property('uninitialized')
+    _uc_alloc_depth = _ext_property('uc_alloc_depth')
+    _excavated = _ext_property('excavated')
+    _burrowed = _ext_property('burrowed')
+    _eager_backends = _ext_property('eager_backends')
+    # what the rewrite rules of claripy/simplifications.py turned this AST into, if they changed it
+    _rewritten = _ext_property('rewritten')
+    _dag_size = _ext_property('dag_size')
+    _occurrence_index = _ext_property('occurrence_index')
+
     #
     # Serialization support
     #
@@ -506,53 +965,46 @@ class Base(ana.Storable):
         """
         The depth of this AST. For example, an AST representing (a+(b+c)) would have a depth of 2.
         """
-        return self._depth()
+        return self._tree_depth
 
-    def _depth(self, memoized=None):
+    @property
+    def tree_size(self):
         """
-        :param memoized:    A dict of ast hashes to depths we've seen before
-        :return:            The depth of the AST. For example, an AST representing (a+(b+c)) would have a depth of 2.
+        The number of nodes of this AST, counting every occurrence of the ASTs that it shares, i.e., the size that it
+        would have if it were printed as a tree. This can be exponential in the size of the DAG.
         """
-        if memoized is None:
-            memoized = dict()
-
-        ast_args = [ a for a in self.args if isinstance(a, Base) ]
-        max_depth = 0
-        for a in ast_args:
-            if a.cache_key not in memoized:
-                memoized[a.cache_key] = a._depth(memoized)
-            max_depth = max(memoized[a.cache_key], max_depth)
+        return self._tree_size
 
-        return 1 + max_depth
+    @property
+    def dag_size(self):
+        """
+        The number of distinct ASTs in this AST (including itself). It is computed on first access and memoized.
+        """
+        size = self._dag_size
+        if size is None:
+            size = 1 if self._tree_size == 1 else sum(1 for _ in _iter_postorder((self,)))
+            self._dag_size = size
+        return size
 
     @property
     def recursive_children_asts(self):
-        for a in self.args:
-            if isinstance(a, Base):
-                l.debug("Yielding AST %s with hash %s with %d children", a, hash(a), len(a.args))
-                yield a
-                for b in a.recursive_children_asts:
-                    yield b
+        stack = [ a for a in reversed(self.args) if isinstance(a, Base) ]
+        while stack:
+            a = stack.pop()
+            l.debug("Yielding AST %s with hash %s with %d children", a, hash(a), len(a.args))
+            yield a
+            stack.extend(b for b in reversed(a.args) if isinstance(b, Base))
 
     @property
     def recursive_leaf_asts(self):
         return self._recursive_leaf_asts()
 
     def _recursive_leaf_asts(self, seen=None):
-        if self.depth == 1:
-            yield self
-            return
-
         seen = set() if seen is None else seen
-        for a in self.args:
-            if isinstance(a, Base) and not a.cache_key in seen:
-                seen.add(a.cache_key)
-
-                if a.depth == 1:
-                    yield a
-                else:
-                    for b in a.recursive_leaf_asts:
-                        yield b
+        for ast in _iter_postorder((self,), memo=seen):
+            seen.add(ast._cache_key)
+            if not any(isinstance(a, Base) for a in ast.args):
+                yield ast
 
     def dbg_is_looped(self, seen=None, checked=None):
         seen = set() if seen is None else seen
@@ -588,56 +1040,11 @@ class Base(ana.Storable):
         :param variable_set: For optimization, ast's without these variables are not checked for replacing.
         :param replacements: A dictionary of hashes to their replacements.
         """
-        try:
-            if variable_set is None:
-                variable_set = set()
-
-            hash_key = self.cache_key
-
-            try:
-                r = replacements[hash_key]
-                return r
-            except KeyError:
-                pass
-
-            if not self.variables.issuperset(variable_set):
-                r = self
-            elif leaf_operation is not None and self.op in operations.leaf_operations:
-                r = leaf_operation(self)
-                if r is not self:
-                    replacements[hash_key] = r
-                return r
-            else:
-                new_args = [ ]
-                replaced = False
-
-                op_is_or = self.op == "Or"
-
-                for a in self.args:
-                    if isinstance(a, Base):
-                        new_a = a._replace(replacements=replacements, variable_set=variable_set, leaf_operation=leaf_operation)
-                        replaced |= new_a is not a
-                    else:
-                        new_a = a
-
-                    # Optimization: if self.op is 'Or' and new_a is True, the entire AST should be evaluated to True
-                    # regardless of future replacements
-                    if op_is_or and is_true(new_a):
-                        new_args = [ new_a ]
-                        break
-
-                    new_args.append(new_a)
-
-                if replaced:
-                    r = self.make_like(self.op, tuple(new_args))
-                    replacements[hash_key] = r
-                else:
-                    r = self
-
-            return r
-        except ClaripyReplacementError:
-            l.error("Replacement error:", exc_info=True)
-            return self
+        if variable_set:
+            skip = lambda ast: not ast.variables.issuperset(variable_set)
+        else:
+            skip = None
+        return _replace_many((self,), replacements, leaf_operation=leaf_operation, skip=skip)[0]
 
     def swap_args(self, new_args, new_length=None):
         """
@@ -732,6 +1139,12 @@ class Base(ana.Storable):
         Returns this AST but with the AST 'old' replaced with AST 'new' in its subexpressions.
         """
         self._check_replaceability(old, new)
+
+        # ASTs that keep getting substituted are indexed, so that only the nodes above `old` are visited
+        index = cached_occurrence_index(self)
+        if index is not None:
+            return index.replace(old, new)
+
         replacements = {old.cache_key: new}
         return self._replace(replacements, variable_set=old.variables)
 
@@ -787,80 +1200,112 @@ class Base(ana.Storable):
     # This code handles burrowing ITEs deeper into the ast and excavating
     # them to shallower levels.
     #
+    # Both are done by _ite_pass(), which walks the DAG iteratively, so deep If chains (such as the ones that symbolic
+    # memory reads produce) do not hit the recursion limit. The results are memoized on the ASTs, so every AST is only
+    # burrowed or excavated once, no matter how many ASTs share it.
+    #
 
-    def _burrow_ite(self):
-        if self.op != 'If':
-            # print("i'm not an if")
-            return self.swap_args([ (a.ite_burrowed if isinstance(a, Base) else a) for a in self.args ])
+    def _burrow_ite_step(self):
+        """
+        Checks whether this If can be burrowed into its branches, i.e., whether they are the same operation and differ
+        in a single argument.
 
+        :return: The If over that argument and its index, or None.
+        """
         if not all(isinstance(a, Base) for a in self.args):
             # print("not all my args are bases")
-            return self
+            return None
 
         old_true = self.args[1]
         old_false = self.args[2]
 
         if old_true.op != old_false.op or len(old_true.args) != len(old_false.args):
-            return self
+            return None
 
         if old_true.op == 'If':
             # let's no go into this right now
-            return self
+            return None
 
         if any(a.op in {'BVS', 'BVV', 'FPS', 'FPV', 'BoolS', 'BoolV'} for a in self.args):
             # burrowing through these is pretty funny
-            return self
+            return None
 
         matches = [ old_true.args[i] is old_false.args[i] for i in range(len(old_true.args)) ]
         if matches.count(True) != 1 or all(matches):
             # TODO: handle multiple differences for multi-arg ast nodes
             # print("wrong number of matches:",matches,old_true,old_false)
-            return self
+            return None
 
         different_idx = matches.index(False)
-        inner_if = If(self.args[0], old_true.args[different_idx], old_false.args[different_idx])
+        return If(self.args[0], old_true.args[different_idx], old_false.args[different_idx]), different_idx
+
+    def _burrow_ite_dependencies(self):
+        if self.op != 'If':
+            return [ a for a in self.args if isinstance(a, Base) ], None
+
+        step = self._burrow_ite_step()
+        if step is None:
+            return [ ], None
+        return [ step[0] ], step
+
+    def _burrow_ite(self, burrowed, step, lift):
+        """
+        Burrows this AST, given the burrowed forms of the ASTs that _burrow_ite_dependencies() asked for.
+        """
+        if self.op != 'If':
+            # print("i'm not an if")
+            return self.swap_args([ (burrowed[id(a)] if isinstance(a, Base) else a) for a in self.args ])
+
+        if step is None or not lift:
+            return self
+
+        inner_if, different_idx = step
+        old_true = self.args[1]
         new_args = list(old_true.args)
-        new_args[different_idx] = inner_if.ite_burrowed
+        new_args[different_idx] = burrowed[id(inner_if)]
         # print("replaced the",different_idx,"arg:",new_args)
         return old_true.__class__(old_true.op, new_args, length=self.length)
 
-    def _excavate_ite(self):
+    def _excavate_ite_dependencies(self):
+        if self.op in { 'BVS', 'I', 'BVV' } or self.annotations:
+            return [ ], None
+        return [ a for a in self.args if isinstance(a, Base) ], None
+
+    def _excavate_ite(self, excavated, _, lift):
+        """
+        Excavates this AST, given the excavated forms of its arguments.
+        """
         if self.op in { 'BVS', 'I', 'BVV' } or self.annotations:
             return self
 
-        excavated_args = [ (a.ite_excavated if isinstance(a, Base) else a) for a in self.args ]
+        excavated_args = [ (excavated[id(a)] if isinstance(a, Base) else a) for a in self.args ]
         ite_args = [ isinstance(a, Base) and a.op == 'If' for a in excavated_args ]
 
         if self.op == 'If':
             # if we are an If, call the If handler so that we can take advantage of its simplifiers
             return If(*excavated_args)
-        elif ite_args.count(True) == 0:
+        elif ite_args.count(True) == 0 or not lift:
             # if there are no ifs that came to the surface, there's nothing more to do
             return self.swap_args(excavated_args)
         else:
             # this gets called when we're *not* in an If, but there are Ifs in the args.
             # it pulls those Ifs out to the surface.
             cond = excavated_args[ite_args.index(True)].args[0]
+            not_cond = Not(cond)
             new_true_args = [ ]
             new_false_args = [ ]
 
             for a in excavated_args:
-                # print("OC", cond.dbg_repr())
-                # print("NC", Not(cond).dbg_repr())
-
                 if not isinstance(a, Base) or a.op != 'If':
                     new_true_args.append(a)
                     new_false_args.append(a)
                 elif a.args[0] is cond:
-                    # print("AC", a.args[0].dbg_repr())
                     new_true_args.append(a.args[1])
                     new_false_args.append(a.args[2])
-                elif a.args[0] is Not(cond):
-                    # print("AN", a.args[0].dbg_repr())
+                elif a.args[0] is not_cond:
                     new_true_args.append(a.args[2])
                     new_false_args.append(a.args[1])
                 else:
-                    # print("AB", a.args[0].dbg_repr())
                     # weird conditions -- giving up!
                     return self.swap_args(excavated_args)
 
@@ -872,10 +1317,12 @@ class Base(ana.Storable):
         Returns an equivalent AST that "burrows" the ITE expressions as deep as possible into the ast, for simpler
         printing.
         """
-        if self._burrowed is None:
-            self._burrowed = self._burrow_ite() #pylint:disable=attribute-defined-outside-init
-            self._burrowed._burrowed = self._burrowed
-        return self._burrowed
+        r = self._burrowed
+        if r is True:
+            return self
+        if r is None:
+            r = _ite_pass(self, 'burrowed', Base._burrow_ite_dependencies, Base._burrow_ite)
+        return r
 
     @property
     def ite_excavated(self):
@@ -883,14 +1330,12 @@ class Base(ana.Storable):
         Returns an equivalent AST that "excavates" the ITE expressions out as far as possible toward the root of the
         AST, for processing in static analyses.
         """
-        if self._excavated is None:
-            self._excavated = self._excavate_ite() #pylint:disable=attribute-defined-outside-init
-
-            # we set the flag for the children so that we avoid re-excavating during
-            # VSA backend evaluation (since the backend evaluation recursively works on
-            # the excavated ASTs)
-            self._excavated._excavated = self._excavated
-        return self._excavated
+        r = self._excavated
+        if r is True:
+            return self
+        if r is None:
+            r = _ite_pass(self, 'excavated', Base._excavate_ite_dependencies, Base._excavate_ite)
+        return r
 
     #
     # these are convenience operations
@@ -931,7 +1376,10 @@ class Base(ana.Storable):
 
         #TODO: It should definitely be moved to the proposed Annotation backend.
 
-        return self._uninitialized
+        u = self._uninitialized
+        if u is None and self.op == 'BVS':
+            return self.args[4]
+        return u
 
     @property
     def uc_alloc_depth(self):
@@ -974,26 +1422,221 @@ class Base(ana.Storable):
         except BackendError:
             return self
 
-def simplify(e):
+# the number of ASTs that a single burrowing or excavation may rebuild. Past it, no more ITEs are moved: the remaining
+# ASTs are only rebuilt over their transformed arguments, and (since the results are not as burrowed or excavated as
+# they could be) nothing is memoized anymore.
+ITE_PASS_LIMIT = 100000
+
+def _ite_pass(root, field, dependencies, transform):
+    """
+    Burrows or excavates the ITEs of an AST, without recursion.
+
+    :param root:            The AST.
+    :param field:           The field of the AST extension that memoizes the results ('burrowed' or 'excavated'). It
+                            is True for the ASTs that are their own result.
+    :param dependencies:    A function of an AST to the ASTs whose results it needs (they can be new ASTs, and not
+                            only arguments), and to some state that is passed on to the transformation.
+    :param transform:       A function of an AST, the dict of results, the state and whether it may move ITEs, to the
+                            result of the AST.
+    :return:                The result of the root.
+    """
+    def memo(ast):
+        ext = ast._ext
+        r = None if ext is None else getattr(ext, field)
+        return ast if r is True else r
+
+    # the results by the ids of the ASTs, which are kept alive by `kept` as long as they are keys here
+    results = { }
+    pending = { }
+    kept = [ ]
+    rebuilt = 0
+    stack = [ root ]
+    while stack:
+        ast = stack[-1]
+        key = id(ast)
+        if key in results:
+            stack.pop()
+            continue
+        r = memo(ast)
+        if r is not None:
+            results[key] = r
+            kept.append(ast)
+            stack.pop()
+            continue
+
+        if key not in pending:
+            deps, state = dependencies(ast)
+            pending[key] = state
+            todo = [ d for d in deps if id(d) not in results ]
+            if todo:
+                stack.extend(reversed(todo))
+                continue
+
+        state = pending.pop(key)
+        lift = rebuilt < ITE_PASS_LIMIT
+        r = transform(ast, results, state, lift)
+        if r is not ast:
+            rebuilt += 1
+        results[key] = r
+        kept.append(ast)
+        stack.pop()
+
+        if lift:
+            if r is not ast:
+                setattr(ast, '_' + field, r)
+            # the result is as burrowed (or excavated) as it gets, so we do not have to go through it again. it is
+            # flagged with True rather than referring to itself, which would keep it alive until the next gc run
+            setattr(r, '_' + field, True)
+
+    return results[id(root)]
+
+def _replace_many(asts, replacements, leaf_operation=None, skip=None):
+    """
+    Replaces subexpressions in several ASTs at once. The DAGs of the ASTs are walked together, so subexpressions that
+    they share are only visited once.
+
+    :param asts:            The ASTs (anything else is returned as it is).
+    :param replacements:    A dict of cache keys to their replacements. The replaced ASTs are added to it, so that
+                            it can serve as a memo over several calls.
+    :param leaf_operation:  A function that is applied to every leaf AST, returning its replacement.
+    :param skip:            For optimization, a function that tells which ASTs can not contain anything that is
+                            replaced. They are left alone and not descended into.
+    :return:                A list of the replaced ASTs, in order.
+    """
+    # the nodes visited during this replacement, including the ones that did not change
+    results = { }
+
+    descend = None if skip is None else lambda ast: not skip(ast)
+    roots = [ a for a in asts if isinstance(a, Base) ]
+    for ast in _iter_postorder(roots, memo=replacements, descend=descend):
+        hash_key = ast._cache_key
+
+        if skip is not None and skip(ast):
+            r = ast
+        elif leaf_operation is not None and ast.op in operations.leaf_operations:
+            r = leaf_operation(ast)
+            if r is not ast:
+                replacements[hash_key] = r
+        else:
+            new_args = [ ]
+            replaced = False
+
+            op_is_or = ast.op == "Or"
+
+            for a in ast.args:
+                if isinstance(a, Base):
+                    try:
+                        new_a = replacements[a._cache_key]
+                    except KeyError:
+                        new_a = results[a._cache_key]
+                    replaced |= new_a is not a
+                else:
+                    new_a = a
+
+                # Optimization: if ast.op is 'Or' and new_a is True, the entire AST should be evaluated to True
+                # regardless of future replacements
+                if op_is_or and is_true(new_a):
+                    new_args = [ new_a ]
+                    break
+
+                new_args.append(new_a)
+
+            r = ast
+            if replaced:
+                try:
+                    r = ast.make_like(ast.op, tuple(new_args))
+                    replacements[hash_key] = r
+                except ClaripyReplacementError:
+                    l.error("Replacement error:", exc_info=True)
+
+        results[hash_key] = r
+
+    out = [ ]
+    for a in asts:
+        if isinstance(a, Base):
+            key = a._cache_key
+            try:
+                a = replacements[key]
+            except KeyError:
+                a = results[key]
+        out.append(a)
+    return out
+
+def _replacement_variables(replacements):
+    """
+    :param replacements:    A dict of cache keys to their replacements.
+    :return:                The names of the variables that the replaced ASTs have, or None if some of them have no
+                            variables (so that every AST might contain one of them).
+    """
+    variables = set()
+    for k in replacements:
+        if not k.ast.variables:
+            return None
+        variables |= k.ast.variables
+    return variables
+
+def replace_many(asts, replacements, variables=None):
+    """
+    Replaces subexpressions in several ASTs at once. This is what ``Base.replace_dict()`` does, but the ASTs are walked
+    together, so subexpressions that they share are only visited once, and subexpressions that have none of the
+    variables of the replaced ASTs are not visited at all.
+
+    :param asts:            A list of ASTs.
+    :param replacements:    A dict of the cache keys of ASTs to their replacements.
+    :param variables:       The names of the variables of the replaced ASTs, if the caller already knows them. None
+                            means that they are computed from `replacements`, which takes time linear in its size, so
+                            callers that keep passing the same (growing) dict should keep them around.
+    :return:                A list of the replaced ASTs, in order.
+    """
+    if not replacements:
+        return list(asts)
+
+    if variables is None:
+        variables = _replacement_variables(replacements)
+    skip = None if variables is None else lambda ast: ast.variables.isdisjoint(variables)
+    return _replace_many(asts, replacements, skip=skip)
+
+def simplify(e, full=True):
+    """
+    Simplifies an AST. A full simplification is done by the backends (i.e., Z3). Otherwise, only the claripy-native
+    rewrite rules (see claripy/simplifications.py) are applied, which is much cheaper but finds less.
+
+    :param e:       The AST.
+    :param full:    Whether to simplify the AST with the backends, or with the native rewrite rules only.
+    :return:        The simplified AST.
+    """
     if isinstance(e, Base) and e.op == 'I':
         return e
 
-    s = e._first_backend('simplify')
-    if s is None:
-        l.debug("Unable to simplify expression")
-        return e
+    if full:
+        s = e._first_backend('simplify')
+        if s is None:
+            # the native rules are better than nothing, but the result is not marked as fully simplified, so that it is
+            # simplified again once a backend can
+            l.debug("Unable to simplify expression")
+            s = simpleton.simplify(e)
+            full = False
     else:
-        # Copy some parameters (that should really go to the Annotation backend)
-        s._uninitialized = e.uninitialized
-        s._uc_alloc_depth = e._uc_alloc_depth
+        s = simpleton.simplify(e)
+
+    # Copy some parameters (that should really go to the Annotation backend)
+    s._uninitialized = e._uninitialized
+    s._uc_alloc_depth = e._uc_alloc_depth
 
+    if full:
         s._simplified = Base.FULL_SIMPLIFY
 
-        return s
+    return s
 
-from ..errors import BackendError, ClaripyOperationError, ClaripyRecursionError, ClaripyReplacementError
+from ..errors import BackendError, ClaripyOperationError, ClaripyRecursionError, ClaripyReplacementError, ClaripySerializationError
+from ..annotation import Annotation
+from ..fp import FSort
 from .. import operations
 from ..backend_object import BackendObject
 from ..backend_manager import backends
+from . import arena
 from ..ast.bool import If, Not, BoolS, is_true
 from ..ast.bv import BV
+from .folding import _folders
+from .occurrences import cached_occurrence_index
+from ..simplifications import simpleton
@@ -0,0 +1,295 @@
+import logging
+import operator
+from functools import reduce
+
+l = logging.getLogger("claripy.ast.folding")
+
+#
+# Constant folding
+#
+# When all the arguments of an operation are concrete, Base.__new__ used to go through the eager backends: the
+# arguments were converted to bv.BVV objects, the operation was run on them and the result was abstracted back into
+# an AST, with exceptions signalling the cases that the concrete backend does not handle. The folders below compute
+# the same results directly on Python ints. They follow the semantics of claripy/bv.py exactly, and return None for
+# anything out of the ordinary (division by zero, differently-sized operands, negative shift amounts, annotated
+# operands...), in which case Base.__new__ falls back to the eager backends, so that the corner cases keep behaving
+# (and failing) the way they always did.
+#
+
+def _bv_operands(args):
+    """
+    :return: The values of the arguments and their common size, or (None, None) if they are not all unannotated BVVs
+             of the same, non-zero size.
+    """
+    values = [ ]
+    bits = None
+    for a in args:
+        if not isinstance(a, Base) or a.op != 'BVV' or a._annotated:
+            return None, None
+        v, size = a.args
+        if v is None or size == 0 or (bits is not None and size != bits):
+            return None, None
+        bits = size
+        values.append(v)
+    return values, bits
+
+def _bool_operands(args):
+    """
+    :return: The values of the arguments, or None if they are not all unannotated BoolVs.
+    """
+    values = [ ]
+    for a in args:
+        if not isinstance(a, Base) or a.op != 'BoolV' or a._annotated:
+            return None
+        values.append(a.args[0])
+    return values
+
+def _signed(v, bits):
+    return v - (1 << bits) if v >> (bits - 1) else v
+
+def _arithmetic(f):
+    # the concrete backend reduces these over all of their arguments. Masking only the final result gives the same
+    # value, since all of them are compatible with arithmetic modulo 2**bits.
+    def folder(args):
+        values, bits = _bv_operands(args)
+        if values is None:
+            return None
+        return BVV(reduce(f, values) & ((1 << bits) - 1), bits)
+    return folder
+
+def _binary(f):
+    def folder(args):
+        if len(args) != 2:
+            return None
+        values, bits = _bv_operands(args)
+        if values is None:
+            return None
+        r = f(values[0], values[1], bits)
+        if r is None:
+            return None
+        return BVV(r & ((1 << bits) - 1), bits)
+    return folder
+
+def _unary(f):
+    def folder(args):
+        if len(args) != 1:
+            return None
+        values, bits = _bv_operands(args)
+        if values is None:
+            return None
+        return BVV(f(values[0], bits) & ((1 << bits) - 1), bits)
+    return folder
+
+def _comparison(f, zero_length=False):
+    def folder(args):
+        if len(args) != 2:
+            return None
+        a, b = args
+        if isinstance(a, Base) and a.op == 'BoolV':
+            # __eq__ and __ne__ on Bools
+            values = _bool_operands(args)
+            if values is None or not zero_length:
+                return None
+            return BoolV(f(values[0], values[1], None))
+
+        if zero_length and isinstance(a, Base) and isinstance(b, Base) and a.op == 'BVV' and b.op == 'BVV' \
+                and a.args[1] == 0 and b.args[1] == 0 and not a._annotated and not b._annotated:
+            return BoolV(f(a.args[0], b.args[0], 0))
+
+        values, bits = _bv_operands(args)
+        if values is None:
+            return None
+        return BoolV(f(values[0], values[1], bits))
+    return folder
+
+def _div(a, b, bits): #pylint:disable=unused-argument
+    return a // b if b != 0 else None
+
+def _mod(a, b, bits): #pylint:disable=unused-argument
+    return a % b if b != 0 else None
+
+def _sdiv(a, b, bits):
+    # rounds towards zero, like in C
+    a = _signed(a, bits)
+    b = _signed(b, bits)
+    if b == 0:
+        return None
+    return a//b if a*b>0 else (a+(-a%b))//b
+
+def _smod(a, b, bits):
+    # the remainder of _sdiv, like the % operator in C
+    a = _signed(a, bits)
+    b = _signed(b, bits)
+    if b == 0:
+        return None
+    division_result = a//b if a*b>0 else (a+(-a%b))//b
+    return a - division_result*b
+
+def _lshift(a, b, bits):
+    b = _signed(b, bits)
+    if b < 0:
+        return None
+    return a << b if b < bits else 0
+
+def _rshift(a, b, bits):
+    # arithmetic shift. Note that bv.py shifts everything out, even negative values, when shifting by the size or more.
+    b = _signed(b, bits)
+    if b < 0:
+        return None
+    return _signed(a, bits) >> b if b < bits else 0
+
+def _lshr(a, b, bits):
+    b = _signed(b, bits)
+    if b < 0:
+        return None
+    return a >> b
+
+def _rotate_left(a, b, bits):
+    # bv.py implements rotations with shifts of a BVV holding the size, which only works out for more than two bits
+    if bits <= 2:
+        return None
+    b %= bits
+    return (a << b) | (a >> (bits - b))
+
+def _rotate_right(a, b, bits):
+    if bits <= 2:
+        return None
+    b %= bits
+    return (a >> b) | (a << (bits - b))
+
+def _fold_extract(args):
+    if len(args) != 3:
+        return None
+    high, low, a = args
+    values, _ = _bv_operands((a,))
+    if values is None or type(high) not in (int, long) or type(low) not in (int, long) or high < low or low < 0:
+        return None
+    size = high - low + 1
+    return BVV((values[0] >> low) & ((1 << size) - 1), size)
+
+def _extension(signed):
+    def folder(args):
+        if len(args) != 2:
+            return None
+        n, a = args
+        values, bits = _bv_operands((a,))
+        if values is None or type(n) not in (int, long) or n < 0:
+            return None
+        v = _signed(values[0], bits) if signed else values[0]
+        return BVV(v & ((1 << (bits + n)) - 1), bits + n)
+    return folder
+
+def _fold_concat(args):
+    total_bits = 0
+    total_value = 0
+    for a in args:
+        if not isinstance(a, Base) or a.op != 'BVV' or a._annotated or a.args[0] is None:
+            return None
+        v, size = a.args
+        total_value = (total_value << size) | v
+        total_bits += size
+    return BVV(total_value, total_bits)
+
+def _fold_reverse(args):
+    if len(args) != 1:
+        return None
+    values, bits = _bv_operands(args)
+    if values is None or bits % 8 != 0:
+        return None
+    if bits == 8:
+        return args[0]
+    v = values[0]
+    out = 0
+    for i in range(0, bits, 8):
+        out = (out << 8) | ((v >> i) & 0xff)
+    return BVV(out, bits)
+
+def _fold_and(args):
+    values = _bool_operands(args)
+    return None if values is None else BoolV(all(values))
+
+def _fold_or(args):
+    values = _bool_operands(args)
+    return None if values is None else BoolV(any(values))
+
+def _fold_not(args):
+    if len(args) != 1:
+        return None
+    values = _bool_operands(args)
+    return None if values is None else BoolV(not values[0])
+
+def _fold_if(args):
+    if len(args) != 3:
+        return None
+    c, t, f = args
+    if not isinstance(c, Base) or c.op != 'BoolV' or c._annotated:
+        return None
+    # the concrete backend returns the chosen branch as it is
+    for a in (t, f):
+        if not isinstance(a, Base) or a.op not in ('BVV', 'BoolV') or a._annotated:
+            return None
+    if t.op != f.op or (t.op == 'BVV' and (t.args[0] is None or f.args[0] is None)):
+        return None
+    return t if c.args[0] else f
+
+_folders = {
+    '__add__': _arithmetic(operator.add),
+    '__sub__': _arithmetic(operator.sub),
+    '__mul__': _arithmetic(operator.mul),
+    '__and__': _arithmetic(operator.and_),
+    '__or__': _arithmetic(operator.or_),
+    '__xor__': _arithmetic(operator.xor),
+
+    '__floordiv__': _binary(_div),
+    '__mod__': _binary(_mod),
+    'SDiv': _binary(_sdiv),
+    'SMod': _binary(_smod),
+    '__lshift__': _binary(_lshift),
+    '__rshift__': _binary(_rshift),
+    'LShR': _binary(_lshr),
+    'RotateLeft': _binary(_rotate_left),
+    'RotateRight': _binary(_rotate_right),
+
+    '__invert__': _unary(lambda a, bits: ~a),
+    '__neg__': _unary(lambda a, bits: -a),
+
+    '__eq__': _comparison(lambda a, b, bits: a == b, zero_length=True),
+    '__ne__': _comparison(lambda a, b, bits: a != b, zero_length=True),
+    '__lt__': _comparison(lambda a, b, bits: a < b),
+    '__le__': _comparison(lambda a, b, bits: a <= b),
+    '__gt__': _comparison(lambda a, b, bits: a > b),
+    '__ge__': _comparison(lambda a, b, bits: a >= b),
+    'SLT': _comparison(lambda a, b, bits: _signed(a, bits) < _signed(b, bits)),
+    'SLE': _comparison(lambda a, b, bits: _signed(a, bits) <= _signed(b, bits)),
+    'SGT': _comparison(lambda a, b, bits: _signed(a, bits) > _signed(b, bits)),
+    'SGE': _comparison(lambda a, b, bits: _signed(a, bits) >= _signed(b, bits)),
+
+    'Extract': _fold_extract,
+    'ZeroExt': _extension(False),
+    'SignExt': _extension(True),
+    'Concat': _fold_concat,
+    'Reverse': _fold_reverse,
+
+    'And': _fold_and,
+    'Or': _fold_or,
+    'Not': _fold_not,
+    'If': _fold_if,
+}
+
+def fold(op, args):
+    """
+    Evaluates the operation `op` on concrete arguments, the way the concrete backend would.
+
+    :param op:      The AST operation ('__add__', 'Extract', etc).
+    :param args:    The arguments to the operation.
+    :return:        The resulting concrete AST, or None if the operation cannot be folded here.
+    """
+    folder = _folders.get(op)
+    if folder is None:
+        return None
+    return folder(args)
+
+from past.builtins import long
+from .base import Base
+from .bv import BVV
+from .bool import BoolV
@@ -0,0 +1,185 @@
+import logging
+import weakref
+
+from ..utils import LRUCache
+
+l = logging.getLogger("claripy.ast.occurrences")
+
+#
+# Occurrence indexes
+#
+# Base._replace() prunes the subtrees that do not have the variables of the replaced AST, but it still descends into
+# every subtree that has them and looks at all of their arguments. For big expressions that get substituted over and
+# over, such as the Concats and Ifs that model memory, an index from every node of the DAG to the nodes that have it as
+# an argument lets a substitution walk up from the replaced AST instead, rebuilding only the nodes above it.
+#
+
+class OccurrenceIndex(object):
+    """
+    An index of the DAG below an AST: the parents of every node, the position of every node in a post-order walk, and
+    the leaves of every variable.
+
+    The index only holds its root weakly (it stands for the root as None), so that the root can hold the index.
+    """
+
+    __slots__ = ('_root', '_position', '_parents', '_leaves')
+
+    def __init__(self, root):
+        """
+        :param root:    The AST to index.
+        """
+        self._root = weakref.ref(root)
+        self._position = { }
+        self._parents = { }
+        self._leaves = { }
+
+        for node in _iter_postorder((root,)):
+            self._position[node._hash] = len(self._position)
+            ref = None if node is root else node
+            if node.op in operations.leaf_operations_symbolic:
+                for v in node.variables:
+                    self._leaves.setdefault(v, [ ]).append(ref)
+            for a in node.args:
+                if isinstance(a, Base):
+                    parents = self._parents.setdefault(a._hash, [ ])
+                    # an AST can be an argument of the same parent several times
+                    if not parents or parents[-1] is not ref:
+                        parents.append(ref)
+
+    @property
+    def root(self):
+        """
+        The indexed AST.
+        """
+        return self._root()
+
+    def __len__(self):
+        return len(self._position)
+
+    def __contains__(self, ast):
+        return ast._hash in self._position
+
+    def leaves(self, variable):
+        """
+        :param variable:    The name of a variable.
+        :return:            The leaf ASTs of that variable in the DAG.
+        """
+        root = self.root
+        return tuple(root if leaf is None else leaf for leaf in self._leaves.get(variable, ()))
+
+    def ancestors(self, ast):
+        """
+        :param ast:     An AST in the DAG.
+        :return:        The ASTs that contain it (and it), in post-order.
+        """
+        if ast._hash not in self._position:
+            return [ ]
+
+        found = { ast._hash: ast }
+        stack = [ ast ]
+        parents = self._parents
+        root = self.root
+        while stack:
+            for p in parents.get(stack.pop()._hash, ()):
+                if p is None:
+                    p = root
+                if p._hash not in found:
+                    found[p._hash] = p
+                    stack.append(p)
+
+        position = self._position
+        return sorted(found.values(), key=lambda a: position[a._hash])
+
+    def replace(self, old, new):
+        """
+        Replaces an AST in the indexed DAG, rebuilding only the ASTs that contain it.
+
+        :param old:     The AST to replace.
+        :param new:     Its replacement.
+        :return:        The indexed AST, with `old` replaced.
+        """
+        affected = self.ancestors(old) if new is not old else None
+        if not affected:
+            return self.root
+
+        results = { old._hash: new }
+        for node in affected[1:]:
+            new_args = [ ]
+            op_is_or = node.op == 'Or'
+            for a in node.args:
+                new_a = results.get(a._hash, a) if isinstance(a, Base) else a
+
+                # as in Base._replace(), an Or with a true argument is true
+                if op_is_or and is_true(new_a):
+                    new_args = [ new_a ]
+                    break
+
+                new_args.append(new_a)
+
+            try:
+                results[node._hash] = node.make_like(node.op, tuple(new_args))
+            except ClaripyReplacementError:
+                l.error("Replacement error:", exc_info=True)
+                results[node._hash] = node
+
+        return results[self.root._hash]
+
+#
+# The indexes of the ASTs that get substituted repeatedly
+#
+# An index is kept on (the extension object of) its root, so it goes away with it. The roots with indexes are tracked
+# weakly, and the least recently used ones lose their indexes, so that only a few indexes are kept.
+#
+
+def _drop_index(_, root):
+    if root is not None:
+        root._occurrence_index = None
+
+# the roots with indexes, by their hashes
+_indexed = LRUCache(max_size=64, weak=True, on_evict=_drop_index)
+# the hashes of the ASTs that were substituted once, which get indexed the next time
+_unindexed = LRUCache(max_size=1024)
+
+def occurrence_index(ast):
+    """
+    :param ast:     An AST.
+    :return:        The (cached) occurrence index of the AST.
+    """
+    index = ast._occurrence_index
+    if index is None:
+        index = OccurrenceIndex(ast)
+        ast._occurrence_index = index
+        _indexed[ast._hash] = ast
+    else:
+        _indexed.get(ast._hash)
+    return index
+
+def cached_occurrence_index(ast):
+    """
+    :param ast:     An AST.
+    :return:        The occurrence index of the AST if it is cached, or None. The first time that this is asked for an
+                    AST, it only remembers it, and the second time, it builds the index, so that the ASTs that are only
+                    substituted once are not indexed.
+    """
+    if ast._occurrence_index is not None or _unindexed.pop(ast._hash) is not None:
+        return occurrence_index(ast)
+    _unindexed[ast._hash] = True
+    return None
+
+def set_occurrence_index_cache_size(size):
+    """
+    Changes the number of occurrence indexes that are kept. 0 disables them.
+    """
+    _indexed.resize(size)
+
+def clear_occurrence_indexes():
+    """
+    Drops all the occurrence indexes.
+    """
+    _indexed.clear()
+    _unindexed.clear()
+
+from ..errors import ClaripyReplacementError
+from .. import operations
+from .base import Base, _iter_postorder
+from .bool import is_true
@@ -0,0 +1,417 @@
+import struct
+import pickle
+import logging
+
+from past.builtins import long, unicode
+
+l = logging.getLogger("claripy.ast.serialization")
+
+#
+# A compact binary format for ASTs
+#
+# Pickling an AST goes through ana, which encodes the nested arguments of every AST, and building the ASTs back does
+# not hash-cons them in another process (the pickled hashes depend on the process that computed them). This format
+# writes every distinct AST once, after its arguments, and refers to the ASTs that were already written by their
+# index. The ASTs are rebuilt through their constructors, so they are hash-consed like any other AST. Several ASTs
+# can be written into the same buffer, and the ASTs that they share are only written once.
+#
+# The buffer starts with MAGIC, followed by records. A node record is
+#
+#     'N' class op flags [length] nargs arg* [nvariables variable*] [annotations]
+#
+# and a root record is 'R' followed by the index of a node. Numbers are unsigned LEB128 varints, and every other
+# value is tagged (see the _TAG_* constants). Strings are written once and then referred to by their index.
+#
+# Values that have no tag of their own (such as annotations and VSA values) are pickled. Since unpickling runs
+# arbitrary code, both the writer and the reader can be told not to allow pickles, for data that comes from (or goes
+# to) a place that other users can write to.
+#
+
+MAGIC = b'CLDAG\x01'
+
+_NODE = ord('N')
+_ROOT = ord('R')
+
+_FLAG_SYMBOLIC = 1
+_FLAG_LENGTH = 2
+_FLAG_VARIABLES = 4
+_FLAG_ANNOTATIONS = 8
+
+_TAG_NONE = 0
+_TAG_FALSE = 1
+_TAG_TRUE = 2
+_TAG_INT = 3
+_TAG_FLOAT = 4
+_TAG_NEW_STRING = 5
+_TAG_STRING = 6
+_TAG_NEW_BYTES = 7
+_TAG_BYTES = 8
+_TAG_TUPLE = 9
+_TAG_LIST = 10
+_TAG_NODE = 11
+_TAG_PICKLE = 12
+_TAG_RM = 13
+_TAG_FSORT = 14
+
+_double = struct.Struct('<d')
+
+class ASTWriter(object):
+    """
+    Writes ASTs into a buffer. The ASTs (and strings) that were already written are remembered, so writing several
+    ASTs that share subexpressions only writes them once.
+    """
+
+    def __init__(self, allow_pickle=True):
+        """
+        :param allow_pickle:    Whether values without a tag of their own are pickled. If not, writing them raises a
+                                ClaripySerializationError.
+        """
+        self._allow_pickle = allow_pickle
+        self._out = bytearray(MAGIC)
+        # the indexes of the written ASTs, by their cache keys (which keep them alive)
+        self._nodes = { }
+        self._strings = { }
+        # the encoded start of the records of the nodes of every (class, op)
+        self._headers = { }
+
+    def getvalue(self):
+        """
+        :return: The bytes that were written so far.
+        """
+        return bytes(self._out)
+
+    def __len__(self):
+        return len(self._out)
+
+    def write(self, ast):
+        """
+        Writes an AST.
+
+        :param ast:     The AST.
+        :return:        The index of the AST in the buffer.
+        """
+        nodes = self._nodes
+        out = self._out
+        for node in _iter_postorder((ast,), memo=nodes):
+            self._write_node(node)
+            nodes[node._cache_key] = len(nodes)
+
+        index = nodes[ast._cache_key]
+        out.append(_ROOT)
+        _write_uint(out, index)
+        return index
+
+    def write_all(self, asts):
+        """
+        Writes several ASTs.
+
+        :return:        The indexes of the ASTs in the buffer.
+        """
+        return [ self.write(a) for a in asts ]
+
+    def _write_node(self, node):
+        out = self._out
+        cls = type(node)
+        header = self._headers.get((cls, node.op), None)
+        if header is not None:
+            out.extend(header)
+        else:
+            out.append(_NODE)
+            self._write_value(cls.__name__)
+            self._write_value(node.op)
+            # the next nodes with this class and op refer to the strings that were just written
+            header = bytearray((_NODE,))
+            for string in (cls.__name__, node.op):
+                header.append(_TAG_STRING)
+                _write_uint(header, self._strings[(type(string), string)])
+            self._headers[(cls, node.op)] = bytes(header)
+
+        explicit_variables = node.op in operations.leaf_operations or node.variables is not _union_variables(
+            [ a.variables for a in node.args if isinstance(a, Base) ]
+        )
+
+        flags = 0
+        if node.symbolic:
+            flags |= _FLAG_SYMBOLIC
+        if node.length is not None:
+            flags |= _FLAG_LENGTH
+        if explicit_variables:
+            flags |= _FLAG_VARIABLES
+        if node.annotations:
+            flags |= _FLAG_ANNOTATIONS
+        out.append(flags)
+
+        if node.length is not None:
+            _write_uint(out, node.length)
+
+        _write_uint(out, len(node.args))
+        nodes = self._nodes
+        for a in node.args:
+            # most arguments are ASTs that were written just before, and most of their indexes fit into two bytes
+            if isinstance(a, Base):
+                index = nodes[a._cache_key]
+                out.append(_TAG_NODE)
+                if index < 0x4000:
+                    if index < 0x80:
+                        out.append(index)
+                    else:
+                        out.append((index & 0x7f) | 0x80)
+                        out.append(index >> 7)
+                else:
+                    _write_uint(out, index)
+            else:
+                self._write_value(a)
+
+        if explicit_variables:
+            _write_uint(out, len(node.variables))
+            # the names are sorted by their encoding, since some are bytes and others are not
+            for v in sorted(node.variables, key=_fingerprint_bytes):
+                self._write_value(v)
+
+        if node.annotations:
+            self._write_value(tuple(node.annotations))
+
+    def _write_value(self, a):
+        out = self._out
+        t = type(a)
+        if a is None:
+            out.append(_TAG_NONE)
+        elif t is bool:
+            out.append(_TAG_TRUE if a else _TAG_FALSE)
+        elif t is int or t is long:
+            out.append(_TAG_INT)
+            _write_uint(out, a << 1 if a >= 0 else ((-a) << 1) - 1)
+        elif t is float:
+            out.append(_TAG_FLOAT)
+            out.extend(_double.pack(a))
+        elif t is unicode or t is bytes:
+            key = (t, a)
+            index = self._strings.get(key, None)
+            if index is not None:
+                out.append(_TAG_STRING if t is unicode else _TAG_BYTES)
+                _write_uint(out, index)
+            else:
+                self._strings[key] = len(self._strings)
+                encoded = a.encode('utf-8') if t is unicode else a
+                out.append(_TAG_NEW_STRING if t is unicode else _TAG_NEW_BYTES)
+                _write_uint(out, len(encoded))
+                out.extend(encoded)
+        elif isinstance(a, Base):
+            out.append(_TAG_NODE)
+            _write_uint(out, self._nodes[a._cache_key])
+        elif t is tuple or t is list:
+            out.append(_TAG_TUPLE if t is tuple else _TAG_LIST)
+            _write_uint(out, len(a))
+            for e in a:
+                self._write_value(e)
+        elif t is fp.RM:
+            out.append(_TAG_RM)
+            self._write_value(str(a))
+        elif t is fp.FSort:
+            out.append(_TAG_FSORT)
+            self._write_value(a.name)
+            _write_uint(out, a.exp)
+            _write_uint(out, a.mantissa)
+        else:
+            # everything else (VSA values, annotations) is pickled
+            if not self._allow_pickle:
+                raise ClaripySerializationError("can't write a %s without pickling it" % t.__name__)
+            p = pickle.dumps(a, 2)
+            out.append(_TAG_PICKLE)
+            _write_uint(out, len(p))
+            out.extend(p)
+
+class ASTReader(object):
+    """
+    Reads the ASTs that an ASTWriter wrote, in the order in which they were written.
+    """
+
+    def __init__(self, data, allow_pickle=True):
+        """
+        :param data:            The bytes that an ASTWriter wrote.
+        :param allow_pickle:    Whether pickled values are unpickled. If not, reading them raises a
+                                ClaripySerializationError.
+        """
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ClaripySerializationError("this is not a serialized AST")
+        self._allow_pickle = allow_pickle
+        self._data = bytearray(data)
+        self._pos = len(MAGIC)
+        self._nodes = [ ]
+        self._strings = [ ]
+
+    def __iter__(self):
+        while True:
+            ast = self.read()
+            if ast is None:
+                return
+            yield ast
+
+    def read(self):
+        """
+        :return: The next AST, or None if there are no more.
+        """
+        data = self._data
+        try:
+            while self._pos < len(data):
+                record = data[self._pos]
+                self._pos += 1
+                if record == _NODE:
+                    self._nodes.append(self._read_node())
+                elif record == _ROOT:
+                    return self._nodes[self._read_uint()]
+                else:
+                    raise ClaripySerializationError("unknown record %d" % record)
+        except ClaripySerializationError:
+            raise
+        except IndexError as e:
+            raise_from(ClaripySerializationError("truncated AST data"), e)
+        except Exception as e: #pylint:disable=broad-except
+            # corrupt data can fail anywhere, from decoding a string to building an AST out of the wrong arguments
+            raise_from(ClaripySerializationError("corrupt AST data: %s" % e), e)
+        return None
+
+    def _read_uint(self):
+        data = self._data
+        pos = self._pos
+        b = data[pos]
+        pos += 1
+        if b < 0x80:
+            self._pos = pos
+            return b
+        n = b & 0x7f
+        shift = 7
+        while b & 0x80:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7f) << shift
+            shift += 7
+        self._pos = pos
+        return n
+
+    def _read_bytes(self):
+        n = self._read_uint()
+        start = self._pos
+        if start + n > len(self._data):
+            raise IndexError("truncated")
+        self._pos = start + n
+        return bytes(self._data[start:start + n])
+
+    def _read_node(self):
+        cls_name = self._read_value()
+        op = self._read_value()
+        flags = self._data[self._pos]
+        self._pos += 1
+
+        length = self._read_uint() if flags & _FLAG_LENGTH else None
+
+        data = self._data
+        nodes = self._nodes
+        args = [ ]
+        for _ in range(self._read_uint()):
+            if data[self._pos] == _TAG_NODE:
+                self._pos += 1
+                args.append(nodes[self._read_uint()])
+            else:
+                args.append(self._read_value())
+        args = tuple(args)
+
+        kwargs = { 'symbolic': bool(flags & _FLAG_SYMBOLIC), 'eager_backends': None }
+        if length is not None:
+            kwargs['length'] = length
+        if flags & _FLAG_VARIABLES:
+            kwargs['variables'] = frozenset(self._read_value() for _ in range(self._read_uint()))
+        kwargs['annotations'] = self._read_value() if flags & _FLAG_ANNOTATIONS else ()
+
+        try:
+            cls = _ast_classes[cls_name]
+        except KeyError:
+            raise ClaripySerializationError("unknown AST class %s" % cls_name)
+        return cls(op, args, **kwargs)
+
+    def _read_value(self):
+        data = self._data
+        tag = data[self._pos]
+        self._pos += 1
+        if tag == _TAG_NODE:
+            return self._nodes[self._read_uint()]
+        elif tag == _TAG_STRING or tag == _TAG_BYTES:
+            return self._strings[self._read_uint()]
+        elif tag == _TAG_INT:
+            z = self._read_uint()
+            return z >> 1 if not z & 1 else -((z + 1) >> 1)
+        elif tag == _TAG_NEW_STRING:
+            s = self._read_bytes().decode('utf-8')
+            self._strings.append(s)
+            return s
+        elif tag == _TAG_NEW_BYTES:
+            s = self._read_bytes()
+            self._strings.append(s)
+            return s
+        elif tag == _TAG_NONE:
+            return None
+        elif tag == _TAG_FALSE:
+            return False
+        elif tag == _TAG_TRUE:
+            return True
+        elif tag == _TAG_FLOAT:
+            start = self._pos
+            self._pos += 8
+            return _double.unpack(bytes(data[start:start + 8]))[0]
+        elif tag == _TAG_TUPLE:
+            return tuple(self._read_value() for _ in range(self._read_uint()))
+        elif tag == _TAG_LIST:
+            return [ self._read_value() for _ in range(self._read_uint()) ]
+        elif tag == _TAG_RM:
+            return fp.RM(self._read_value())
+        elif tag == _TAG_FSORT:
+            name = self._read_value()
+            return fp.FSort(name, self._read_uint(), self._read_uint())
+        elif tag == _TAG_PICKLE:
+            if not self._allow_pickle:
+                raise ClaripySerializationError("refusing to unpickle a value")
+            return pickle.loads(self._read_bytes())
+        else:
+            raise ClaripySerializationError("unknown value tag %d" % tag)
+
+def _write_uint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def dumps(asts, allow_pickle=True):
+    """
+    Serializes a list of ASTs.
+
+    :param asts:            The ASTs.
+    :param allow_pickle:    Whether values without a tag of their own may be pickled.
+    :return:                The bytes.
+    """
+    w = ASTWriter(allow_pickle=allow_pickle)
+    w.write_all(asts)
+    return w.getvalue()
+
+def loads(data, allow_pickle=True):
+    """
+    Deserializes the ASTs that dumps() (or an ASTWriter) serialized.
+
+    :param data:            The bytes.
+    :param allow_pickle:    Whether pickled values may be unpickled. Only allow this for data that you trust.
+    :return:                A list of the ASTs.
+    """
+    return list(ASTReader(data, allow_pickle=allow_pickle))
+
+from ..utils.transition import raise_from
+from ..errors import ClaripySerializationError
+from .. import operations
+from .. import fp
+from .base import Base, _iter_postorder, _union_variables, _fingerprint_bytes
+from .bits import Bits
+from .bv import BV
+from .vs import VS
+from .fp import FP
+from .bool import Bool
+from .int import Int
+
+_ast_classes = { c.__name__: c for c in (Bits, BV, VS, FP, Bool, Int) }
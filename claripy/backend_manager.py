@@ -26,4 +26,8 @@ class BackendManager(object):
         for b in self._all_backends:
             b.downsize()
 
+    def evict(self, asts):
+        for b in self._all_backends:
+            b.evict(asts)
+
 backends = BackendManager()
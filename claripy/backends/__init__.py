@@ -121,6 +121,32 @@ class Backend(object):
         self._true_cache.clear()
         self._false_cache.clear()
 
+    def cache_sizes(self):
+        """
+        Returns the number of entries in each cache of this backend (for the current thread, for the per-thread
+        caches).
+
+        :return: A dict of cache names to sizes.
+        """
+        return {
+            'object_cache': len(self._object_cache),
+            'true_cache': len(self._true_cache),
+            'false_cache': len(self._false_cache),
+        }
+
+    def evict(self, asts):
+        """
+        Removes the given ASTs from the caches of this backend.
+
+        :param asts:    A list of ASTs.
+        """
+        object_cache = self._object_cache
+        for a in asts:
+            k = a._cache_key
+            object_cache.pop(k, None)
+            self._true_cache.pop(k, None)
+            self._false_cache.pop(k, None)
+
     def handles(self, expr):
         """
         Checks whether this backend can handle the expression.
@@ -138,47 +164,92 @@ class Backend(object):
         """
         Resolves a claripy.ast.Base into something usable by the backend.
 
+        The AST is converted bottom-up with an explicit stack, so that converting each node only ever looks up the
+        already-converted arguments instead of recursing into them.
+
         :param expr:    The expression.
         :param save:    Save the result in the expression's object cache
         :return:        A backend object.
         """
         if isinstance(expr, Base):
+            key = expr._cache_key
+
             # if it's cached in the backend, use it
             if self._cache_objects:
-                try: return self._object_cache[expr._cache_key]
+                cache = self._object_cache
+                outermost = False
+                try: return cache[key]
                 except KeyError: pass
+            else:
+                # backends that don't cache their objects still have to remember the nodes converted during this
+                # conversion, or the arguments would be converted all over again
+                cache = getattr(self._tls, 'convert_memo', None)
+                outermost = cache is None
+                if outermost:
+                    cache = self._tls.convert_memo = { }
+                else:
+                    try: return cache[key]
+                    except KeyError: pass
 
             # if we've errroed on this in the past, give up
             if self in expr._errored:
                 raise BackendError("%s can't handle operation %s (%s) due to a failed conversion on a child node" % (self, expr.op, expr.__class__.__name__))
 
-            # otherwise, resolve it!
             try:
-                if expr.op in self._op_expr:
-                    r = self._op_expr[expr.op](expr)
-                else:
+                for e in _iter_postorder((expr,), memo=cache, descend=self._converts_args):
+                    # converting an earlier node might have converted this one on the way
+                    if e._cache_key in cache:
+                        continue
                     try:
-                        r = self.call(expr.op, expr.args)
-                    except BackendUnsupportedError:
-                        r = self.default_op(expr)
-            except (RuntimeError, ctypes.ArgumentError) as e:
-                raise_from(ClaripyRecursionError("Recursion limit reached. Sorry about that."), e)
-                raise # make static analysis happy
-            except BackendError:
-                expr._errored.add(self)
-                raise
-
-            # apply the annotations
-            for a in expr.annotations:
-                r = self.apply_annotation(r, a)
-
-            if self._cache_objects:
-                self._object_cache[expr._cache_key] = r
-            return r
+                        cache[e._cache_key] = self._convert_ast(e)
+                    except BackendError:
+                        expr._errored = expr._errored | { self }
+                        raise
+                return cache[key]
+            finally:
+                if outermost:
+                    del self._tls.convert_memo
         else:
             #l.debug('converting non-expr')
             return self._convert(expr)
 
+    # a function that tells convert() whether _convert_ast() converts an AST from its arguments, so that they have to be
+    # converted first, or None if it always does
+    _converts_args = None
+
+    def _convert_ast(self, expr):
+        """
+        Converts a single AST node. Its AST arguments have already been converted when this is called by convert().
+
+        :param expr:    The expression.
+        :return:        A backend object.
+        """
+        # if we've errroed on this in the past, give up
+        if self in expr._errored:
+            raise BackendError("%s can't handle operation %s (%s) due to a failed conversion on a child node" % (self, expr.op, expr.__class__.__name__))
+
+        # otherwise, resolve it!
+        try:
+            if expr.op in self._op_expr:
+                r = self._op_expr[expr.op](expr)
+            else:
+                try:
+                    r = self.call(expr.op, expr.args)
+                except BackendUnsupportedError:
+                    r = self.default_op(expr)
+        except (RuntimeError, ctypes.ArgumentError) as e:
+            raise_from(ClaripyRecursionError("Recursion limit reached. Sorry about that."), e)
+            raise # make static analysis happy
+        except BackendError:
+            expr._errored = expr._errored | { self }
+            raise
+
+        # apply the annotations
+        for a in expr.annotations:
+            r = self.apply_annotation(r, a)
+
+        return r
+
     def convert_list(self, args):
         return [ self.convert(a) for a in args ]
 
@@ -228,6 +299,15 @@ class Backend(object):
         """
         raise BackendError("backend %s doesn't implement abstract()" % self.__class__.__name__)
 
+    def _abstract_list(self, es):
+        """
+        Abstracts several BackendObjects to ASTs. Backends that can share the work between them override this.
+
+        :param es:  The backend objects.
+        :return:    A list of ASTs.
+        """
+        return [ self._abstract(e) for e in es ]
+
     #
     # These functions simplify expressions.
     #
@@ -413,7 +493,7 @@ class Backend(object):
         :return: The unsat core.
         """
 
-        return [ self._abstract(core) for core in self._unsat_core(s) ]
+        return self._abstract_list(self._unsat_core(s))
 
     def _unsat_core(self, s):  #pylint:disable=no-self-use,unused-argument
         """
@@ -463,6 +543,38 @@ class Backend(object):
         """
         raise BackendError("backend doesn't support eval()")
 
+    def iter_eval(self, expr, extra_constraints=(), solver=None, model_callback=None):
+        """
+        This function generates the possible solutions for expression `expr`, one at a time, as they are found.
+
+        :param expr: expression (an AST) to evaluate
+        :param solver: a solver object, native to the backend, to assist in
+                       the evaluation (for example, a z3.Solver)
+        :param extra_constraints: extra constraints (as ASTs) to add to the solver for this solve
+        :param model_callback:      a function that will be executed with recovered models (if any)
+        :return:              A generator of the results (backend objects)
+        """
+        if self._solver_required and solver is None:
+            raise BackendError("%s requires a solver for evaluation" % self.__class__.__name__)
+
+        return self._iter_eval(
+            self.convert(expr), extra_constraints=self.convert_list(extra_constraints),
+            solver=solver, model_callback=model_callback
+        )
+
+    def _iter_eval(self, expr, extra_constraints=(), solver=None, model_callback=None): #pylint:disable=unused-argument,no-self-use
+        """
+        This function generates the possible solutions for expression `expr`, one at a time, as they are found.
+
+        :param expr:                An expression (backend object) to evaluate.
+        :param extra_constraints:   Extra constraints (as ASTs) to add to the solver for this solve.
+        :param solver:              A solver object, native to the backend, to assist in the evaluation (for example, a
+                                    z3.Solver).
+        :param model_callback:      a function that will be executed with recovered models (if any)
+        :return:                    A generator of the results (backend objects).
+        """
+        raise BackendError("backend doesn't support iter_eval()")
+
     def batch_eval(self, exprs, n, extra_constraints=(), solver=None, model_callback=None):
         """
         Evaluate one or multiple expressions.
@@ -498,7 +610,7 @@ class Backend(object):
 
         raise BackendError("backend doesn't support batch_eval()")
 
-    def min(self, expr, extra_constraints=(), solver=None, model_callback=None):
+    def min(self, expr, extra_constraints=(), solver=None, model_callback=None, signed=False, strategy=None):
         """
         Return the minimum value of `expr`.
 
@@ -507,12 +619,22 @@ class Backend(object):
                        the evaluation (for example, a z3.Solver)
         :param extra_constraints: extra constraints (as ASTs) to add to the solver for this solve
         :param model_callback:      a function that will be executed with recovered models (if any)
+        :param signed:      whether to treat expr as a signed value
+        :param strategy:    how to search for the value, for the backends that have several ways to do it (None for their
+                            default)
         :return: the minimum possible value of expr (backend object)
         """
         if self._solver_required and solver is None:
             raise BackendError("%s requires a solver for evaluation" % self.__class__.__name__)
 
-        return self._min(self.convert(expr), extra_constraints=self.convert_list(extra_constraints), solver=solver, model_callback=model_callback)
+        # only the backends that support them get these
+        kwargs = { }
+        if signed:
+            kwargs['signed'] = signed
+        if strategy is not None:
+            kwargs['strategy'] = strategy
+
+        return self._min(self.convert(expr), extra_constraints=self.convert_list(extra_constraints), solver=solver, model_callback=model_callback, **kwargs)
 
     def _min(self, expr, extra_constraints=(), solver=None, model_callback=None): #pylint:disable=unused-argument,no-self-use
         """
@@ -527,7 +649,7 @@ class Backend(object):
         """
         raise BackendError("backend doesn't support min()")
 
-    def max(self, expr, extra_constraints=(), solver=None, model_callback=None):
+    def max(self, expr, extra_constraints=(), solver=None, model_callback=None, signed=False, strategy=None):
         """
         Return the maximum value of expr.
 
@@ -536,12 +658,22 @@ class Backend(object):
                        the evaluation (for example, a z3.Solver)
         :param extra_constraints: extra constraints (as ASTs) to add to the solver for this solve
         :param model_callback:      a function that will be executed with recovered models (if any)
+        :param signed:      whether to treat expr as a signed value
+        :param strategy:    how to search for the value, for the backends that have several ways to do it (None for their
+                            default)
         :return: the maximum possible value of expr (backend object)
         """
         if self._solver_required and solver is None:
             raise BackendError("%s requires a solver for evaluation" % self.__class__.__name__)
 
-        return self._max(self.convert(expr), extra_constraints=self.convert_list(extra_constraints), solver=solver, model_callback=model_callback)
+        # only the backends that support them get these
+        kwargs = { }
+        if signed:
+            kwargs['signed'] = signed
+        if strategy is not None:
+            kwargs['strategy'] = strategy
+
+        return self._max(self.convert(expr), extra_constraints=self.convert_list(extra_constraints), solver=solver, model_callback=model_callback, **kwargs)
 
     def _max(self, expr, extra_constraints=(), solver=None, model_callback=None): #pylint:disable=unused-argument,no-self-use
         """
@@ -556,6 +688,48 @@ class Backend(object):
         """
         raise BackendError("backend doesn't support max()")
 
+    def bounds(self, exprs, extra_constraints=(), solver=None, model_callback=None, signed=False):
+        """
+        Return the minimum and the maximum values of several expressions.
+
+        :param exprs: expressions (ASTs) to evaluate
+        :param solver: a solver object, native to the backend, to assist in
+                       the evaluation (for example, a z3.Solver)
+        :param extra_constraints: extra constraints (as ASTs) to add to the solver for this solve
+        :param model_callback:      a function that will be executed with recovered models (if any)
+        :param signed:      whether to treat the expressions as signed values
+        :return: a list of (min, max) tuples, one per expression
+        """
+        if self._solver_required and solver is None:
+            raise BackendError("%s requires a solver for evaluation" % self.__class__.__name__)
+
+        # only the backends that support it get this
+        kwargs = { }
+        if signed:
+            kwargs['signed'] = signed
+
+        return self._bounds(self.convert_list(exprs), extra_constraints=self.convert_list(extra_constraints), solver=solver, model_callback=model_callback, **kwargs)
+
+    def _bounds(self, exprs, extra_constraints=(), solver=None, model_callback=None, **kwargs):
+        """
+        Return the minimum and the maximum values of several expressions. By default, this is a min() and a max() per
+        expression.
+
+        :param exprs: expressions (backend objects) to evaluate
+        :param solver: a solver object, native to the backend, to assist in
+                       the evaluation (for example, a z3.Solver)
+        :param extra_constraints: extra constraints (as ASTs) to add to the solver for this solve
+        :param model_callback:      a function that will be executed with recovered models (if any)
+        :return: a list of (min, max) tuples, one per expression
+        """
+        return [
+            (
+                self._min(e, extra_constraints=extra_constraints, solver=solver, model_callback=model_callback, **kwargs),
+                self._max(e, extra_constraints=extra_constraints, solver=solver, model_callback=model_callback, **kwargs),
+            )
+            for e in exprs
+        ]
+
     def satisfiable(self, extra_constraints=(), solver=None, model_callback=None):
         """
         This function does a constraint check and checks if the solver is in a sat state.
@@ -578,6 +752,13 @@ class Backend(object):
         """
         raise BackendError("backend doesn't support solving")
 
+    def last_check_definite(self): #pylint:disable=no-self-use
+        """
+        :return: Whether the last satisfiability check of this thread had a definite result, instead of giving up (for
+                 example, because it timed out) and reporting it as unsatisfiable.
+        """
+        return True
+
 
     def solution(self, expr, v, extra_constraints=(), solver=None, model_callback=None):
         """
@@ -710,4 +891,4 @@ from .backend_z3 import BackendZ3
 from .backend_z3_parallel import BackendZ3Parallel
 from .backend_concrete import BackendConcrete
 from .backend_vsa import BackendVSA
-from ..ast.base import Base
+from ..ast.base import Base, _iter_postorder
@@ -97,6 +97,17 @@ class BackendVSA(Backend):
     def convert(self, expr):
         return Backend.convert(self, expr.ite_excavated if isinstance(expr, Base) else expr)
 
+    def _converts_args(self, expr): #pylint:disable=no-self-use
+        # the ASTs that are not excavated are converted through their excavated version, not from their arguments
+        return expr.ite_excavated is expr
+
+    def _convert_ast(self, expr):
+        # the arguments of an excavated AST are not necessarily excavated themselves
+        excavated = expr.ite_excavated
+        if excavated is not expr:
+            return self.convert(excavated)
+        return Backend._convert_ast(self, expr)
+
     def _convert(self, a):
         if isinstance(a, numbers.Number):
             return a
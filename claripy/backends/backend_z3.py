@@ -6,10 +6,12 @@ import numbers
 import operator
 import threading
 import weakref
+import itertools
 from past.builtins import long
 from functools import reduce
 from decimal import Decimal
 
+from ..utils import LRUCache
 from ..utils.transition import raise_from
 from ..errors import ClaripyZ3Error
 
@@ -81,9 +83,23 @@ from . import Backend
 class BackendZ3(Backend):
     _split_on = { 'And', 'Or' }
 
-    def __init__(self):
+    def __init__(self, simplification_cache_size=1000, extra_constraints_as_assumptions=False):
+        """
+        :param simplification_cache_size:           The number of simplification results to keep (0 disables the
+                                                    cache).
+        :param extra_constraints_as_assumptions:    Whether to pass the extra constraints of queries to the solvers as
+                                                    assumptions instead of pushing and popping them (see
+                                                    set_extra_constraints_as_assumptions()).
+        """
         Backend.__init__(self, solver_required=True)
-        self._enable_simplification_cache = False
+        self._extra_constraints_as_assumptions = extra_constraints_as_assumptions
+        self._min_max_strategy = 'bisect'
+        self._assumption_counter = itertools.count()
+
+        # the results of simplify(), by the hash of the simplified AST. The ASTs do not depend on the thread (unlike the
+        # Z3 objects), so all threads share this. The results are only weakly referenced, so that the cache does not
+        # keep ASTs alive (or in the way of the arenas).
+        self._simplification_cache = LRUCache(max_size=simplification_cache_size, weak=True)
         self._hash_to_constraint = weakref.WeakValueDictionary()
 
         # and the operations
@@ -157,6 +173,7 @@ class BackendZ3(Backend):
 
     @property
     def _ast_cache(self):
+        # the abstractions of the z3 ASTs of this thread's context, by their ids
         try:
             return self._tls.ast_cache
         except AttributeError:
@@ -164,45 +181,138 @@ class BackendZ3(Backend):
             return self._tls.ast_cache
 
     @property
-    def _var_cache(self):
+    def _ast_pins(self):
+        # the z3 ASTs that the abstractions in the AST cache came from, by the cache keys of the abstractions. z3 reuses
+        # the ids of the ASTs that it frees, so they are kept alive for as long as their abstractions are cached.
         try:
-            return self._tls.var_cache
+            return self._tls.ast_pins
         except AttributeError:
-            self._tls.var_cache = weakref.WeakValueDictionary()
-            return self._tls.var_cache
+            self._tls.ast_pins = weakref.WeakKeyDictionary()
+            return self._tls.ast_pins
 
     @property
-    def _sym_cache(self):
+    def _assumption_literals(self):
+        # the indicator literals of the extra constraints of every solver, by the ids of the constraints
         try:
-            return self._tls.sym_cache
+            return self._tls.assumption_literals
         except AttributeError:
-            self._tls.sym_cache = weakref.WeakValueDictionary()
-            return self._tls.sym_cache
+            self._tls.assumption_literals = weakref.WeakKeyDictionary()
+            return self._tls.assumption_literals
 
     @property
-    def _simplification_cache_key(self):
+    def _var_cache(self):
         try:
-            return self._tls.simplification_cache_key
+            return self._tls.var_cache
         except AttributeError:
-            self._tls.simplification_cache_key = weakref.WeakValueDictionary()
-            return self._tls.simplification_cache_key
+            self._tls.var_cache = weakref.WeakValueDictionary()
+            return self._tls.var_cache
 
     @property
-    def _simplification_cache_val(self):
+    def _sym_cache(self):
         try:
-            return self._tls.simplification_cache_val
+            return self._tls.sym_cache
         except AttributeError:
-            self._tls.simplification_cache_val = weakref.WeakValueDictionary()
-            return self._tls.simplification_cache_val
+            self._tls.sym_cache = weakref.WeakValueDictionary()
+            return self._tls.sym_cache
 
     def downsize(self):
         Backend.downsize(self)
 
         self._ast_cache.clear()
+        self._ast_pins.clear()
         self._var_cache.clear()
         self._sym_cache.clear()
-        self._simplification_cache_key.clear()
-        self._simplification_cache_val.clear()
+        self._simplification_cache.clear()
+
+    def cache_sizes(self):
+        sizes = Backend.cache_sizes(self)
+        sizes['ast_cache'] = len(self._ast_cache)
+        sizes['ast_pins'] = len(self._ast_pins)
+        sizes['var_cache'] = len(self._var_cache)
+        sizes['sym_cache'] = len(self._sym_cache)
+        sizes['simplification_cache'] = len(self._simplification_cache)
+        return sizes
+
+    def simplification_cache_stats(self):
+        """
+        :return: A dict with the size, maximum size, hits, misses and evictions of the simplification cache.
+        """
+        return self._simplification_cache.stats()
+
+    def set_simplification_cache_size(self, size):
+        """
+        Changes the number of simplification results that are kept. 0 disables the cache.
+        """
+        self._simplification_cache.resize(size)
+
+    def set_extra_constraints_as_assumptions(self, enabled):
+        """
+        Chooses how the extra constraints of queries are passed to the solvers.
+
+        By default, the solver is pushed, the extra constraints are added, and the solver is popped after the query,
+        which throws away what the solver learned during it. When this is enabled, every extra constraint is instead
+        guarded by an indicator literal (`literal => constraint`), which is added to the solver once and passed to its
+        check() as an assumption. Queries with overlapping extra constraints then keep what the solver learned, at the
+        cost of the guarded constraints staying in the solver for as long as it is alive. Every distinct constraint is
+        guarded once, and once max_assumption_literals of them are, the queries with new ones push and pop them again.
+        """
+        self._extra_constraints_as_assumptions = enabled
+
+    _ASSUMPTION_PREFIX = '__claripy_assumption_'
+
+    # the maximum number of extra constraints that are guarded on a solver
+    max_assumption_literals = 10000
+
+    def _assumptions(self, solver, extra_constraints):
+        """
+        :return: The indicator literals of the extra constraints on a solver, guarding the new ones, or None if that
+                 would guard too many constraints.
+        """
+        try:
+            literals = self._assumption_literals[solver]
+        except KeyError:
+            literals = self._assumption_literals[solver] = { }
+
+        new = [ c for c in extra_constraints if c.get_id() not in literals ]
+        if len(literals) + len(new) > self.max_assumption_literals:
+            return None
+        for c in new:
+            literal = self._fresh_literal()
+            solver.add(z3.Implies(literal, c))
+            # the constraints are kept with their literals, so that their ids are not reused
+            literals[c.get_id()] = (c, literal)
+        return [ literals[c.get_id()][1] for c in extra_constraints ]
+
+    def _extra_constraints_scope(self, solver, extra_constraints):
+        """
+        Passes the extra constraints of a query to a solver, either as assumptions or by pushing them.
+
+        :return: The assumptions to check with (None if the constraints were pushed), and whether the solver was pushed.
+        """
+        if self._extra_constraints_as_assumptions:
+            assumptions = self._assumptions(solver, extra_constraints)
+            if assumptions is not None:
+                return assumptions, False
+        if len(extra_constraints) == 0:
+            return None, False
+        solver.push()
+        solver.add(*extra_constraints)
+        return None, True
+
+    def _fresh_literal(self):
+        return z3.Bool(self._ASSUMPTION_PREFIX + str(next(self._assumption_counter)), ctx=self._context)
+
+    def evict(self, asts):
+        Backend.evict(self, asts)
+
+        hashes = set(a._hash for a in asts)
+        ast_cache = self._ast_cache
+        for k, v in list(ast_cache.items()):
+            if v._hash in hashes:
+                del ast_cache[k]
+        for k, v in self._simplification_cache.items():
+            if k in hashes or v._hash in hashes:
+                self._simplification_cache.pop(k)
 
     @condom
     def _size(self, e):
@@ -310,45 +420,92 @@ class BackendZ3(Backend):
 
     @condom
     def _abstract(self, z):
-        #return self._abstract(z, split_on=split_on)[0]
-        return self._abstract_internal(z.ctx.ctx, z.ast)
+        return self._abstract_internal(z.ctx, (z,))[0]
 
-    @staticmethod
-    def _z3_ast_hash(ctx, ast):
-        """
-        This is a better hashing function for z3 Ast objects. Z3_get_ast_hash() creates too many hash collisions.
+    @condom
+    def _abstract_list(self, zs):
+        zs = list(zs)
+        if not zs:
+            return [ ]
+        return self._abstract_internal(zs[0].ctx, zs)
 
-        :param ctx: A z3 Context.
-        :param ast: A z3 Ast object.
-        :return:    An integer - the hash.
+    def _abstract_internal(self, context, roots):
         """
+        Abstracts z3 ASTs into claripy ASTs. The z3 DAG below all of them is walked once in post-order with an explicit
+        stack, so the depth of the expressions is not limited by Python's recursion limit, and the nodes that they share
+        are only abstracted once.
 
-        z3_hash = z3.Z3_get_ast_hash(ctx, ast)
-        z3_ast_ref = ast.value # this seems to be the memory address
-        z3_sort = z3.Z3_get_sort(ctx, ast).value
-        return "%d_%d_%d" % (z3_hash, z3_sort, z3_ast_ref)
+        The abstractions are cached by the ids of the z3 ASTs, across calls, for as long as the claripy ASTs are alive.
+        The z3 ASTs are pinned by their abstractions (so that z3 cannot free them and reuse their ids), and the z3 ASTs
+        of the roots are also cached as the conversions of their abstractions, since they are often converted back.
 
-    def _abstract_internal(self, ctx, ast, split_on=None):
-        h = self._z3_ast_hash(ctx, ast)
-        try:
-            return self._ast_cache[h]
-        except KeyError:
-            pass
+        :param context:     The z3 Context of the ASTs.
+        :param roots:       The z3 expressions.
+        :return:            A list of the claripy ASTs.
+        """
+        ctx = context.ref()
+        get_id = z3.Z3_get_ast_id
+        if context is self._context:
+            ast_cache = self._ast_cache
+            pins = self._ast_pins
+        else:
+            # the ids are only unique within a context
+            ast_cache = { }
+            pins = None
+        results = { }
+
+        # each stack entry is (z3 ast, id, node info); the node info is None until the children have been pushed
+        root_ids = [ r.get_id() for r in roots ]
+        stack = [ (r.ast, i, None) for r, i in zip(reversed(roots), reversed(root_ids)) ]
+        while stack:
+            z, i, info = stack.pop()
+
+            if info is not None:
+                decl, decl_num, op_name, child_ids = info
+                a = self._abstract_node(ctx, z, decl, decl_num, op_name, [ results[ci] for ci in child_ids ])
+                results[i] = a
+                if isinstance(a, Base):
+                    ast_cache[i] = a
+                    if pins is not None:
+                        pins.setdefault(a._cache_key, [ ]).append(z3.AstRef(z, context))
+                continue
+
+            if i in results:
+                continue
+            try:
+                results[i] = ast_cache[i]
+                continue
+            except KeyError:
+                pass
 
-        decl = z3.Z3_get_app_decl(ctx, ast)
-        decl_num = z3.Z3_get_decl_kind(ctx, decl)
+            decl = z3.Z3_get_app_decl(ctx, z)
+            decl_num = z3.Z3_get_decl_kind(ctx, decl)
+
+            if decl_num not in z3_op_nums:
+                raise ClaripyError("unknown decl kind %d" % decl_num)
+            if z3_op_nums[decl_num] not in op_map:
+                raise ClaripyError("unknown decl op %s" % z3_op_nums[decl_num])
+            op_name = op_map[z3_op_nums[decl_num]]
+
+            children = [ z3.Z3_get_app_arg(ctx, z, j) for j in range(z3.Z3_get_app_num_args(ctx, z)) ]
+            child_ids = [ get_id(ctx, c) for c in children ]
+            stack.append((z, i, (decl, decl_num, op_name, child_ids)))
+            stack.extend(reversed([ (c, ci, None) for c, ci in zip(children, child_ids) if ci not in results ]))
+
+        abstracted = [ results[i] for i in root_ids ]
+        if pins is not None:
+            object_cache = self._object_cache
+            for r, a in zip(roots, abstracted):
+                if isinstance(a, Base) and not a.annotations and a._cache_key not in object_cache:
+                    object_cache[a._cache_key] = r
+        return abstracted
+
+    def _abstract_node(self, ctx, ast, decl, decl_num, op_name, children):
+        """
+        Abstracts a single z3 AST node, given the claripy ASTs of its children.
+        """
         z3_sort = z3.Z3_get_sort(ctx, ast)
-
-        if decl_num not in z3_op_nums:
-            raise ClaripyError("unknown decl kind %d" % decl_num)
-        if z3_op_nums[decl_num] not in op_map:
-            raise ClaripyError("unknown decl op %s" % z3_op_nums[decl_num])
-        op_name = op_map[z3_op_nums[decl_num]]
-
-        num_args = z3.Z3_get_app_num_args(ctx, ast)
-        split_on = self._split_on if split_on is None else split_on
-        new_split_on = split_on if op_name in split_on else set()
-        children = [ self._abstract_internal(ctx, z3.Z3_get_app_arg(ctx, ast, i), new_split_on) for i in range(num_args) ]
+        num_args = len(children)
 
         append_children = True
 
@@ -466,7 +623,6 @@ class BackendZ3(Backend):
         else:
             a = result_ty(op_name, tuple(args))
 
-        self._ast_cache[h] = a
         return a
 
     def _abstract_to_primitive(self, ctx, ast):
@@ -541,7 +697,9 @@ class BackendZ3(Backend):
         cores = s.unsat_core()
         constraints = [ ]
         for core in cores:
-            constraints.append(self._hash_to_constraint.get(str(core)))
+            name = str(core)
+            if not name.startswith(self._ASSUMPTION_PREFIX):
+                constraints.append(self._hash_to_constraint.get(name))
         return constraints
 
     @condom
@@ -560,6 +718,8 @@ class BackendZ3(Backend):
         model = { }
         for m_f in z3_model:
             n = m_f.name()
+            if n.startswith(self._ASSUMPTION_PREFIX):
+                continue
             m = m_f()
             me = z3_model.eval(m)
             model[n] = self._abstract_to_primitive(me.ctx.ctx, me.ast)
@@ -570,24 +730,27 @@ class BackendZ3(Backend):
         global solve_count
 
         solve_count += 1
-        if len(extra_constraints) > 0:
-            solver.push()
-            solver.add(*extra_constraints)
+        assumptions, pushed = self._extra_constraints_scope(solver, extra_constraints)
 
         try:
 
             l.debug("Doing a check!")
             #print "CHECKING"
-            if solver.check() != z3.sat:
+            result = solver.check(*(assumptions or ()))
+            self._tls.last_check_definite = result != z3.unknown
+            if result != z3.sat:
                 return False
 
             if model_callback is not None:
                 model_callback(self._generic_model(solver.model()))
         finally:
-            if len(extra_constraints) > 0:
+            if pushed:
                 solver.pop()
         return True
 
+    def last_check_definite(self):
+        return getattr(self._tls, 'last_check_definite', True)
+
     def _eval(self, expr, n, extra_constraints=(), solver=None, model_callback=None):
         results = self._batch_eval(
             [ expr ], n, extra_constraints=extra_constraints,
@@ -603,15 +766,18 @@ class BackendZ3(Backend):
 
         result_values = [ ]
 
-        if len(extra_constraints) > 0 or n != 1:
+        # the solutions that were found are excluded by blocking constraints, which are added to the scope that the
+        # extra constraints were pushed in, or to one of their own if they were passed as assumptions
+        assumptions, pushed = self._extra_constraints_scope(solver, extra_constraints)
+        assumptions = assumptions or ()
+        blocking = n != 1 and not pushed
+        if blocking:
             solver.push()
-        if len(extra_constraints) > 0:
-            solver.add(*extra_constraints)
 
         for i in range(n):
             solve_count += 1
             l.debug("Doing a check!")
-            if solver.check() != z3.sat:
+            if solver.check(*assumptions) != z3.sat:
                 break
             model = solver.model()
 
@@ -632,28 +798,277 @@ class BackendZ3(Backend):
             # Construct the extra constraint so we don't get the same result anymore
             if i + 1 != n:
                 if len(exprs) == 1:
-                    solver.add(exprs[0] != r[0])
+                    block = exprs[0] != r[0]
                 else:
-                    solver.add(self._op_raw_Not(self._op_raw_And(*[(ex == ex_v) for ex, ex_v in zip(exprs, r)])))
+                    block = self._op_raw_Not(self._op_raw_And(*[(ex == ex_v) for ex, ex_v in zip(exprs, r)]))
+                solver.add(block)
                 model = None
 
-        if len(extra_constraints) > 0 or n != 1:
+        if blocking:
+            solver.pop()
+        if pushed:
             solver.pop()
 
         return result_values
 
     @condom
-    def _min(self, expr, extra_constraints=(), solver=None, model_callback=None):
+    def _iter_eval(self, expr, extra_constraints=(), solver=None, model_callback=None):
+        # the solutions are found on a copy of the solver, which the extra constraints and the constraints that exclude
+        # the solutions that were found are added to. Nothing is added to the solver itself, so the caller can stop at
+        # any point, and the other queries on the solver in the meantime do not see any of it.
+        scratch = solver.translate(self._context)
+        if len(extra_constraints) > 0:
+            scratch.add(*extra_constraints)
+        return self._iter_solutions(expr, scratch, model_callback)
+
+    def _iter_solutions(self, expr, solver, model_callback):
+        global solve_count
+
+        try:
+            while True:
+                solve_count += 1
+                l.debug("Doing a check!")
+                if solver.check() != z3.sat:
+                    return
+                model = solver.model()
+                v = self._primitive_from_model(model, expr)
+                if model_callback is not None:
+                    model_callback(self._generic_model(model))
+                solver.add(expr != v)
+                yield v
+        except z3.Z3Exception as ze:
+            raise_from(ClaripyZ3Error("Z3Exception: %s" % ze), ze)
+
+    MIN_MAX_STRATEGIES = ('bisect', 'model', 'optimize')
+
+    def set_min_max_strategy(self, strategy):
+        """
+        Chooses how min() and max() search for the value when they are not told:
+
+            - 'bisect' bisects the range of the value, with one check per bit of it.
+            - 'model' also bisects it, but it tightens the bound to the value in the model of every satisfiable check,
+              which is usually well past the middle of the range, so it takes fewer checks.
+            - 'optimize' leaves the search to Z3's optimizer, on a copy of the solver's constraints.
+        """
+        if strategy not in self.MIN_MAX_STRATEGIES:
+            raise BackendError("unknown min/max strategy %s" % strategy)
+        self._min_max_strategy = strategy
+
+    @condom
+    def _min(self, expr, extra_constraints=(), solver=None, model_callback=None, signed=False, strategy=None):
+        return self._extremum(expr, False, extra_constraints, solver, model_callback, signed, strategy)
+
+    @condom
+    def _max(self, expr, extra_constraints=(), solver=None, model_callback=None, signed=False, strategy=None):
+        return self._extremum(expr, True, extra_constraints, solver, model_callback, signed, strategy)
+
+    @condom
+    def _bounds(self, exprs, extra_constraints=(), solver=None, model_callback=None, signed=False):
+        if signed:
+            flips = [ 1 << (e.size() - 1) for e in exprs ]
+            bounds = self._bounds(
+                [ e ^ flip for e, flip in zip(exprs, flips) ], extra_constraints, solver, model_callback
+            )
+            return [
+                (self._unflip(lo, flip), self._unflip(hi, flip)) for (lo, hi), flip in zip(bounds, flips)
+            ]
+
+        if len(exprs) == 0:
+            return [ ]
+
+        # the smallest and the largest value of every expression in the models so far
+        mins = [ None ] * len(exprs)
+        maxs = [ None ] * len(exprs)
+
+        def seen(model, i, maximize):
+            for j, e in enumerate(exprs):
+                v = self._primitive_from_model(model, e)
+                if mins[j] is None or v < mins[j]:
+                    mins[j] = v
+                if maxs[j] is None or v > maxs[j]:
+                    maxs[j] = v
+            if model_callback is not None:
+                model_callback(self._generic_model(model))
+            return maxs[i] if maximize else mins[i]
+
+        assumptions = self._bound_scope(solver, extra_constraints)
+        try:
+            self._bound_model(solver, assumptions, lambda m: seen(m, 0, False), 'bounds')
+
+            # every model tightens the bounds of all the expressions, so the searches for the later ones start from
+            # the values that the earlier ones came across
+            results = [ ]
+            for i, e in enumerate(exprs):
+                lo = self._tighten(
+                    e, False, 0, mins[i], solver, assumptions,
+                    lambda m: seen(m, i, False), #pylint:disable=cell-var-from-loop
+                    probe=i > 0
+                )
+                hi = self._tighten(
+                    e, True, maxs[i], 2**e.size() - 1, solver, assumptions,
+                    lambda m: seen(m, i, True), #pylint:disable=cell-var-from-loop
+                    probe=i > 0
+                )
+                results.append((lo, hi))
+            return results
+        finally:
+            if assumptions is None and len(extra_constraints) > 0:
+                solver.pop()
+
+    def _extremum(self, expr, maximize, extra_constraints, solver, model_callback, signed, strategy):
+        if signed:
+            # flipping the sign bit maps the signed order onto the unsigned one
+            flip = 1 << (expr.size() - 1)
+            return self._unflip(
+                self._extremum(expr ^ flip, maximize, extra_constraints, solver, model_callback, False, strategy), flip
+            )
+
+        strategy = self._min_max_strategy if strategy is None else strategy
+        if strategy == 'bisect':
+            search = self._max_bisect if maximize else self._min_bisect
+            return search(expr, extra_constraints=extra_constraints, solver=solver, model_callback=model_callback)
+        elif strategy == 'model':
+            return self._extremum_model(expr, maximize, extra_constraints, solver, model_callback)
+        elif strategy == 'optimize':
+            return self._extremum_optimize(expr, maximize, extra_constraints, solver, model_callback)
+        else:
+            raise BackendError("unknown min/max strategy %s" % strategy)
+
+    @staticmethod
+    def _unflip(v, flip):
+        """
+        Converts the min or max of a value with its sign bit flipped back to the signed value.
+        """
+        v ^= flip
+        return v - (flip << 1) if v & flip else v
+
+    def _extremum_model(self, expr, maximize, extra_constraints, solver, model_callback):
+        def value(model):
+            if model_callback is not None:
+                model_callback(self._generic_model(model))
+            return self._primitive_from_model(model, expr)
+
+        assumptions = self._bound_scope(solver, extra_constraints)
+        try:
+            v = self._bound_model(solver, assumptions, value, 'max' if maximize else 'min')
+            if maximize:
+                return self._tighten(expr, True, v, 2**expr.size() - 1, solver, assumptions, value)
+            else:
+                return self._tighten(expr, False, 0, v, solver, assumptions, value)
+        finally:
+            if assumptions is None and len(extra_constraints) > 0:
+                solver.pop()
+
+    def _tighten(self, expr, maximize, lo, hi, solver, assumptions, on_model, probe=False):
+        """
+        Searches for the min or the max of a value, the model-guided way. The value is known to be in [lo, hi], and
+        the end that is being tightened is a value that some model has.
+
+        :param on_model:    A function that is called with the model of every satisfiable check, and returns the value
+                            of expr to tighten the bound to (its value in the model, or a better one).
+        :param probe:       Whether to first check if the end can be tightened at all, which takes a single check when
+                            it is likely to be the min or the max already.
+        :return:            The min or the max of the value.
+        """
+        numpop = 0
+        try:
+            while lo != hi:
+                # a probe asks for anything past the end, instead of past the middle of the range
+                if maximize:
+                    middle = lo + 1 if probe else (lo + hi + 1) // 2
+                    constraints = [ z3.UGE(expr, middle), z3.ULE(expr, hi) ]
+                else:
+                    middle = hi - 1 if probe else (lo + hi) // 2
+                    constraints = [ z3.UGE(expr, lo), z3.ULE(expr, middle) ]
+                probe = False
+
+                sat, pushed = self._bound_check(solver, assumptions, constraints)
+                numpop += pushed
+                if sat:
+                    if maximize:
+                        lo = on_model(solver.model())
+                    else:
+                        hi = on_model(solver.model())
+                elif maximize:
+                    hi = middle - 1
+                else:
+                    lo = middle + 1
+            return lo
+        finally:
+            for _ in range(numpop):
+                solver.pop()
+
+    def _extremum_optimize(self, expr, maximize, extra_constraints, solver, model_callback):
         global solve_count
 
+        optimizer = z3.Optimize(ctx=self._context)
+        optimizer.add(solver.assertions())
+        optimizer.add(*[ self.convert(e) for e in extra_constraints ])
+        if maximize:
+            optimizer.maximize(expr)
+        else:
+            optimizer.minimize(expr)
+
+        solve_count += 1
+        l.debug("Doing an optimization!")
+        if optimizer.check() != z3.sat:
+            raise UnsatError("unsat during %s()" % ('max' if maximize else 'min'))
+        model = optimizer.model()
+        if model_callback is not None:
+            model_callback(self._generic_model(model))
+        return self._primitive_from_model(model, expr)
+
+    def _bound_scope(self, solver, extra_constraints):
+        """
+        Prepares a solver for the checks of min() and max().
+
+        :return: The assumptions to check with, or None if the extra constraints were pushed instead.
+        """
+        extra_constraints = [ self.convert(e) for e in extra_constraints ]
+        return self._extra_constraints_scope(solver, extra_constraints)[0]
+
+    def _bound_model(self, solver, assumptions, on_model, what):
+        """
+        Checks the solver for min() and max() without constraining the value, for a first model.
+
+        :return: What on_model returns for the model.
+        """
+        sat, pushed = self._bound_check(solver, assumptions, [ ])
+        try:
+            if not sat:
+                raise UnsatError("unsat during %s()" % what)
+            return on_model(solver.model())
+        finally:
+            if pushed:
+                solver.pop()
+
+    def _bound_check(self, solver, assumptions, constraints):
+        """
+        Checks the solver with some constraints for min() and max(). Without assumptions, the constraints are pushed,
+        and they stay pushed if they are satisfiable.
+
+        :return: Whether it is satisfiable, and whether the constraints were pushed.
+        """
+        global solve_count
+
+        solve_count += 1
+        l.debug("Doing a check!")
+        if assumptions is not None:
+            return solver.check(*(assumptions + constraints)) == z3.sat, False
+
+        solver.push()
+        solver.add(*constraints)
+        if solver.check() == z3.sat:
+            return True, True
+        solver.pop()
+        return False, False
+
+    def _min_bisect(self, expr, extra_constraints=(), solver=None, model_callback=None):
         lo = 0
         hi = 2**expr.size()-1
         vals = set()
 
-        if len(extra_constraints) > 0:
-            solver.push()
-            solver.add(*[self.convert(e) for e in extra_constraints])
-
+        assumptions = self._bound_scope(solver, extra_constraints)
         numpop = 0
 
         # TODO: Can only deal with bitvectors, not floats
@@ -661,13 +1076,9 @@ class BackendZ3(Backend):
             middle = (lo + hi)//2
             #l.debug("h/m/l/d: %d %d %d %d", hi, middle, lo, hi-lo)
 
-            solver.push()
-            solver.add(z3.UGE(expr, lo), z3.ULE(expr, middle))
-            numpop += 1
-
-            solve_count += 1
-            l.debug("Doing a check!")
-            if solver.check() == z3.sat:
+            sat, pushed = self._bound_check(solver, assumptions, [ z3.UGE(expr, lo), z3.ULE(expr, middle) ])
+            numpop += pushed
+            if sat:
                 l.debug("... still sat")
                 if model_callback is not None:
                     model_callback(self._generic_model(solver.model()))
@@ -676,8 +1087,6 @@ class BackendZ3(Backend):
             else:
                 l.debug("... now unsat")
                 lo = middle
-                solver.pop()
-                numpop -= 1
 
         for _ in range(numpop):
             solver.pop()
@@ -687,35 +1096,27 @@ class BackendZ3(Backend):
         if hi == lo:
             vals.add(lo)
         else:
-            solver.push()
-            solver.add(expr == lo)
-            l.debug("Doing a check!")
-            if solver.check() == z3.sat:
+            sat, pushed = self._bound_check(solver, assumptions, [ expr == lo ])
+            if sat:
                 if model_callback is not None:
                     model_callback(self._generic_model(solver.model()))
                 vals.add(lo)
-                solver.pop()
             else:
                 vals.add(hi)
+            if pushed:
                 solver.pop()
 
-        if len(extra_constraints) > 0:
+        if assumptions is None and len(extra_constraints) > 0:
             solver.pop()
 
         return min(vals)
 
-    @condom
-    def _max(self, expr, extra_constraints=(), solver=None, model_callback=None):
-        global solve_count
-
+    def _max_bisect(self, expr, extra_constraints=(), solver=None, model_callback=None):
         lo = 0
         hi = 2**expr.size()-1
         vals = set()
 
-        if len(extra_constraints) > 0:
-            solver.push()
-            solver.add(*[self.convert(e) for e in extra_constraints])
-
+        assumptions = self._bound_scope(solver, extra_constraints)
         numpop = 0
 
         # TODO: Can only deal with bitvectors, not floats
@@ -723,13 +1124,9 @@ class BackendZ3(Backend):
             middle = (lo + hi)//2
             #l.debug("h/m/l/d: %d %d %d %d", hi, middle, lo, hi-lo)
 
-            solver.push()
-            solver.add(z3.UGT(expr, middle), z3.ULE(expr, hi))
-            numpop += 1
-
-            solve_count += 1
-            l.debug("Doing a check!")
-            if solver.check() == z3.sat:
+            sat, pushed = self._bound_check(solver, assumptions, [ z3.UGT(expr, middle), z3.ULE(expr, hi) ])
+            numpop += pushed
+            if sat:
                 l.debug("... still sat")
                 lo = middle
                 vals.add(self._primitive_from_model(solver.model(), expr))
@@ -738,8 +1135,6 @@ class BackendZ3(Backend):
             else:
                 l.debug("... now unsat")
                 hi = middle
-                solver.pop()
-                numpop -= 1
             #l.debug("          now: %d %d %d %d", hi, middle, lo, hi-lo)
 
         for _ in range(numpop):
@@ -748,19 +1143,17 @@ class BackendZ3(Backend):
         if hi == lo:
             vals.add(hi)
         else:
-            solver.push()
-            solver.add(expr == hi)
-            l.debug("Doing a check!")
-            if solver.check() == z3.sat:
+            sat, pushed = self._bound_check(solver, assumptions, [ expr == hi ])
+            if sat:
                 if model_callback is not None:
                     model_callback(self._generic_model(solver.model()))
                 vals.add(hi)
-                solver.pop()
             else:
                 vals.add(lo)
+            if pushed:
                 solver.pop()
 
-        if len(extra_constraints) > 0:
+        if assumptions is None and len(extra_constraints) > 0:
             solver.pop()
 
         return max(vals)
@@ -770,24 +1163,23 @@ class BackendZ3(Backend):
 
     @condom
     def simplify(self, expr):
-        if expr._simplified:
+        if expr._simplified == Base.FULL_SIMPLIFY:
             return expr
 
-        if self._enable_simplification_cache:
-            try:
-                k = self._simplification_cache_key[expr._cache_key]
-                #print "HIT WEAK KEY CACHE"
-                return k
-            except KeyError:
-                pass
-            try:
-                k = self._simplification_cache_val[expr._cache_key]
-                #print "HIT WEAK VALUE CACHE"
-                return k
-            except KeyError:
-                pass
-
-            #print "MISS CACHE"
+        cache = self._simplification_cache
+        if cache.max_size:
+            o = cache.get(expr._hash)
+            if o is not None:
+                return o
+
+        store = persistent_store.store
+        if store is not None:
+            o = store.get_simplification(expr)
+            if o is not None:
+                o._simplified = Base.FULL_SIMPLIFY
+                if cache.max_size:
+                    cache[expr._hash] = o
+                return o
 
         l.debug("SIMPLIFYING EXPRESSION")
 
@@ -814,9 +1206,10 @@ class BackendZ3(Backend):
         o = self._abstract(s)
         o._simplified = Base.FULL_SIMPLIFY
 
-        if self._enable_simplification_cache:
-            self._simplification_cache_val[expr._cache_key] = o
-            self._simplification_cache_key[expr._cache_key] = o
+        if cache.max_size:
+            cache[expr._hash] = o
+        if store is not None:
+            store.put_simplification(expr, o)
         return o
 
     def _is_false(self, e, extra_constraints=(), solver=None, model_callback=None):
@@ -1150,8 +1543,9 @@ from ..ast.bool import BoolV, Bool
 from ..ast.fp import FP, FPV
 from ..operations import backend_operations, backend_fp_operations
 from ..fp import FSort, RM, RM_RNE, RM_RNA, RM_RTP, RM_RTN, RM_RTZ
-from ..errors import ClaripyError, BackendError, ClaripyOperationError
+from ..errors import ClaripyError, BackendError, ClaripyOperationError, UnsatError
 from .. import _all_operations
+from .. import persistent_store
 
 op_type_map = {
     # Boolean
@@ -80,12 +80,62 @@ class Frontend(ana.Storable):
     def batch_eval(self, exprs, n, extra_constraints=(), exact=None):
         raise NotImplementedError()
 
+    def iter_eval(self, e, extra_constraints=(), exact=None):
+        """
+        Generates the solutions of an expression, one at a time, so that the caller can stop once it has enough. By
+        default, this asks eval() for twice as many solutions every time, and the frontends that can find them one by
+        one override it.
+
+        :param e:                   The expression.
+        :param extra_constraints:   Extra constraints to solve with.
+        :return:                    A generator of the solutions, which generates nothing if there are none.
+        """
+        seen = set()
+        n = 1
+        while True:
+            try:
+                results = self.eval(e, n, extra_constraints=extra_constraints, exact=exact)
+            except UnsatError:
+                return
+            for r in results:
+                if r not in seen:
+                    seen.add(r)
+                    yield r
+            if len(results) < n:
+                return
+            n *= 2
+
     def max(self, e, extra_constraints=(), exact=None):
         raise NotImplementedError()
 
     def min(self, e, extra_constraints=(), exact=None):
         raise NotImplementedError()
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), exact=None):
+        """
+        Returns the minimum and the maximum values of several expressions. By default, this is a min() and a max() per
+        expression, and the frontends that can search for the bounds of all of them together override it.
+
+        :param exprs:               The expressions.
+        :param signed:              Whether to treat the expressions as signed values.
+        :param extra_constraints:   Extra constraints to solve with.
+        :return:                    A list of (min, max) tuples, one per expression.
+        """
+        results = [ ]
+        for e in exprs:
+            if signed:
+                # flipping the sign bit maps the signed order onto the unsigned one
+                flip = 1 << (e.size() - 1)
+                lo = self.min(e ^ flip, extra_constraints=extra_constraints, exact=exact) ^ flip
+                hi = self.max(e ^ flip, extra_constraints=extra_constraints, exact=exact) ^ flip
+                results.append((self._to_signed(lo, e.size()), self._to_signed(hi, e.size())))
+            else:
+                results.append((
+                    self.min(e, extra_constraints=extra_constraints, exact=exact),
+                    self.max(e, extra_constraints=extra_constraints, exact=exact),
+                ))
+        return results
+
     def solution(self, e, v, extra_constraints=(), exact=None):
         raise NotImplementedError()
 
@@ -109,6 +159,10 @@ class Frontend(ana.Storable):
             return None
     _concrete_constraint = _concrete_value
 
+    @staticmethod
+    def _to_signed(v, size):
+        return v - (1 << size) if v >> (size - 1) else v
+
     def _constraint_filter(self, c): #pylint:disable=no-self-use
         return c
 
@@ -160,3 +214,4 @@ class Frontend(ana.Storable):
         return results
 
 from . import ast
+from .errors import UnsatError
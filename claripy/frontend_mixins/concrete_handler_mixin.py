@@ -6,6 +6,13 @@ class ConcreteHandlerMixin(object):
         else:
             return super(ConcreteHandlerMixin, self).eval(e, n, **kwargs)
 
+    def iter_eval(self, e, **kwargs):
+        c = self._concrete_value(e)
+        if c is not None:
+            return iter((c,))
+        else:
+            return super(ConcreteHandlerMixin, self).iter_eval(e, **kwargs)
+
     def batch_eval(self, exprs, n, **kwargs): #pylint:disable=unused-argument
         concrete_exprs = [ self._concrete_value(e) for e in exprs ]
         symbolic_exprs = [ e for e,c in zip(exprs, concrete_exprs) if c is None ]
@@ -36,6 +43,24 @@ class ConcreteHandlerMixin(object):
         else:
             return super(ConcreteHandlerMixin, self).min(e, **kwargs)
 
+    def bounds(self, exprs, signed=False, **kwargs):
+        concrete_exprs = [ self._concrete_value(e) for e in exprs ]
+        symbolic_exprs = [ e for e,c in zip(exprs, concrete_exprs) if c is None ]
+
+        if len(symbolic_exprs) == 0:
+            symbolic_results = [ ]
+        else:
+            symbolic_results = super(ConcreteHandlerMixin, self).bounds(symbolic_exprs, signed=signed, **kwargs)
+
+        results = [ ]
+        for e, c in zip(exprs, concrete_exprs):
+            if c is None:
+                results.append(symbolic_results.pop(0))
+            else:
+                c = self._to_signed(c, e.size()) if signed else c
+                results.append((c, c))
+        return results
+
     def solution(self, e, v, **kwargs):
         ce = self._concrete_value(e)
         cv = self._concrete_value(v)
@@ -20,6 +20,21 @@ class ConstraintExpansionMixin(object):
 
         return results
 
+    def iter_eval(self, e, extra_constraints=(), exact=None, **kwargs):
+        results = [ ]
+        for v in super(ConstraintExpansionMixin, self).iter_eval(
+            e,
+            extra_constraints=extra_constraints,
+            exact=exact,
+            **kwargs
+        ):
+            results.append(v)
+            yield v
+
+        # all the solutions were generated, like in eval()
+        if len(extra_constraints) == 0 and len(results) > 0:
+            self.add([Or(*[e == v for v in results])], invalidate_cache=False)
+
     def max(self, e, extra_constraints=(), exact=None, **kwargs):
         m = super(ConstraintExpansionMixin, self).max(e, extra_constraints=extra_constraints, exact=exact, **kwargs)
         if len(extra_constraints) == 0:
@@ -32,6 +47,17 @@ class ConstraintExpansionMixin(object):
             self.add([e >= m], invalidate_cache=False)
         return m
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), exact=None, **kwargs):
+        bounds = super(ConstraintExpansionMixin, self).bounds(
+            exprs, signed=signed, extra_constraints=extra_constraints, exact=exact, **kwargs
+        )
+        if len(extra_constraints) == 0:
+            if signed:
+                self.add([ c for e, (lo, hi) in zip(exprs, bounds) for c in (SGE(e, lo), SLE(e, hi)) ], invalidate_cache=False)
+            else:
+                self.add([ c for e, (lo, hi) in zip(exprs, bounds) for c in (e >= lo, e <= hi) ], invalidate_cache=False)
+        return bounds
+
     def solution(self, e, v, extra_constraints=(), exact=None, **kwargs):
         b = super(ConstraintExpansionMixin, self).solution(
             e, v,
@@ -44,3 +70,4 @@ class ConstraintExpansionMixin(object):
         return b
 
 from ..ast.bool import Or
+from ..ast.bv import SGE, SLE
@@ -39,6 +39,13 @@ class ConstraintFilterMixin(object):
         ec = self._constraint_filter(extra_constraints)
         return super(ConstraintFilterMixin, self).eval(e, n, extra_constraints=ec, **kwargs)
 
+    def iter_eval(self, e, extra_constraints=(), **kwargs):
+        try:
+            ec = self._constraint_filter(extra_constraints)
+        except UnsatError:
+            return iter(())
+        return super(ConstraintFilterMixin, self).iter_eval(e, extra_constraints=ec, **kwargs)
+
     def batch_eval(self, exprs, n, extra_constraints=(), **kwargs):
         ec = self._constraint_filter(extra_constraints)
         return super(ConstraintFilterMixin, self).batch_eval(exprs, n, extra_constraints=ec, **kwargs)
@@ -51,6 +58,10 @@ class ConstraintFilterMixin(object):
         ec = self._constraint_filter(extra_constraints)
         return super(ConstraintFilterMixin, self).min(e, extra_constraints=ec, **kwargs)
 
+    def bounds(self, exprs, extra_constraints=(), **kwargs):
+        ec = self._constraint_filter(extra_constraints)
+        return super(ConstraintFilterMixin, self).bounds(exprs, extra_constraints=ec, **kwargs)
+
     def solution(self, e, v, extra_constraints=(), **kwargs):
         ec = self._constraint_filter(extra_constraints)
         return super(ConstraintFilterMixin, self).solution(e, v, extra_constraints=ec, **kwargs)
@@ -49,12 +49,16 @@ class ModelCache(object):
             a
         )
 
+    def _replace_leaves(self, asts):
+        # every variable is replaced, so only the ASTs without variables are left alone
+        return _replace_many(asts, self.replacements, leaf_operation=self._leaf_op, skip=lambda a: not a.variables)
+
     def eval_ast(self, ast):
         """Eval the ast, replacing symbols by their last value in the model.
         """
         # If there was no last value, it was not constrained, so we can use
         # anything.
-        new_ast = ast._replace(self.replacements, leaf_operation=self._leaf_op)
+        new_ast = self._replace_leaves((ast,))[0]
         return backends.concrete.eval(new_ast, 1)[0]
 
     def eval_constraints(self, constraints):
@@ -63,12 +67,14 @@ class ModelCache(object):
         # eval_ast is concretizing symbols and evaluating them, this can raise
         # exceptions.
         try:
-            return all(self.eval_ast(c) for c in constraints)
+            # the constraints are replaced one at a time, so that nothing is replaced after one of them fails (the
+            # replacements are memoized, so the ones that they share are still only replaced once)
+            return all(backends.concrete.eval(self._replace_leaves((c,))[0], 1)[0] for c in constraints)
         except errors.ClaripyZeroDivisionError:
             return False
 
     def eval_list(self, asts):
-        return tuple(self.eval_ast(c) for c in asts)
+        return tuple(backends.concrete.eval(a, 1)[0] for a in self._replace_leaves(asts))
 
 class ModelCacheMixin(object):
     def __init__(self, *args, **kwargs):
@@ -266,6 +272,27 @@ class ModelCacheMixin(object):
     def eval(self, e, n, **kwargs):
         return tuple( r[0] for r in ModelCacheMixin.batch_eval(self, [e], n=n, **kwargs) )
 
+    def iter_eval(self, e, extra_constraints=(), **kwargs):
+        # the cached solutions come first, and the solver is only asked for the others
+        cached = self._get_solutions(e, extra_constraints=extra_constraints)
+        for v in cached:
+            yield v
+
+        if e.cache_key in self._eval_exhausted:
+            return
+
+        if len(cached) != 0:
+            constraints = (all_operations.And(*[ e != v for v in cached ]),) + tuple(extra_constraints)
+        else:
+            constraints = extra_constraints
+
+        # the models of the new solutions are cached as they are found
+        for v in super(ModelCacheMixin, self).iter_eval(e, extra_constraints=constraints, **kwargs):
+            yield v
+
+        if len(extra_constraints) == 0:
+            self._eval_exhausted.add(e.cache_key)
+
     def min(self, e, extra_constraints=(), **kwargs):
         cached = [ ]
         if e.cache_key in self._eval_exhausted or e.cache_key in self._min_exhausted:
@@ -290,6 +317,38 @@ class ModelCacheMixin(object):
             self._max_exhausted.add(e.cache_key)
             return m
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), **kwargs):
+        results = [ None ] * len(exprs)
+        missing = [ ]
+        for i, e in enumerate(exprs):
+            # the cached models have every value of e, or its (unsigned) min and max without extra constraints
+            key = e.cache_key
+            cached = [ ]
+            if key in self._eval_exhausted or (
+                not signed and len(extra_constraints) == 0 and
+                key in self._min_exhausted and key in self._max_exhausted
+            ):
+                cached = self._get_solutions(e, extra_constraints=extra_constraints)
+
+            if len(cached) > 0:
+                if signed:
+                    cached = [ self._to_signed(v, e.size()) for v in cached ]
+                results[i] = (min(cached), max(cached))
+            else:
+                missing.append(i)
+
+        if len(missing) > 0:
+            bounds = super(ModelCacheMixin, self).bounds(
+                [ exprs[i] for i in missing ], signed=signed, extra_constraints=extra_constraints, **kwargs
+            )
+            for i, b in zip(missing, bounds):
+                results[i] = b
+            if not signed and len(extra_constraints) == 0:
+                self._min_exhausted.update(exprs[i].cache_key for i in missing)
+                self._max_exhausted.update(exprs[i].cache_key for i in missing)
+
+        return results
+
     def solution(self, e, v, extra_constraints=(), **kwargs):
         if isinstance(v, Base):
             cached = self._get_batch_solutions([e,v], extra_constraints=extra_constraints)
@@ -306,3 +365,4 @@ class ModelCacheMixin(object):
 from .. import backends, false
 from ..errors import UnsatError
 from ..ast import all_operations, Base
+from ..ast.base import _replace_many
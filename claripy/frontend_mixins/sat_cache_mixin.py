@@ -62,6 +62,18 @@ class SatCacheMixin(object):
                 self._cached_satness = False
             raise
 
+    def iter_eval(self, e, extra_constraints=(), **kwargs):
+        if self._cached_satness is False:
+            return
+        found = False
+        for v in super(SatCacheMixin, self).iter_eval(e, extra_constraints=extra_constraints, **kwargs):
+            if not found:
+                found = True
+                self._cached_satness = True
+            yield v
+        if not found and len(extra_constraints) == 0:
+            self._cached_satness = False
+
     def batch_eval(self, e, n, extra_constraints=(), **kwargs):
         if self._cached_satness is False: raise UnsatError("cached unsat")
         try:
@@ -104,6 +116,20 @@ class SatCacheMixin(object):
                 self._cached_satness = False
             raise
 
+    def bounds(self, exprs, extra_constraints=(), **kwargs):
+        if self._cached_satness is False: raise UnsatError("cached unsat")
+        try:
+            r = super(SatCacheMixin, self).bounds(
+                exprs,
+                extra_constraints=extra_constraints, **kwargs
+            )
+            self._cached_satness = True
+            return r
+        except UnsatError:
+            if len(extra_constraints) == 0:
+                self._cached_satness = False
+            raise
+
     def solution(self, e, v, extra_constraints=(), **kwargs):
         if self._cached_satness is False: raise UnsatError("cached unsat")
         try:
@@ -7,11 +7,19 @@ class SimplifyHelperMixin(object):
         self.simplify()
         return super(SimplifyHelperMixin, self).min(*args, **kwargs)
 
+    def bounds(self, *args, **kwargs):
+        self.simplify()
+        return super(SimplifyHelperMixin, self).bounds(*args, **kwargs)
+
     def eval(self, e, n, *args, **kwargs):
         if n > 1:
             self.simplify()
         return super(SimplifyHelperMixin, self).eval(e, n, *args, **kwargs)
 
+    def iter_eval(self, *args, **kwargs):
+        self.simplify()
+        return super(SimplifyHelperMixin, self).iter_eval(*args, **kwargs)
+
     def batch_eval(self, e, n, *args, **kwargs):
         if n > 1:
             self.simplify()
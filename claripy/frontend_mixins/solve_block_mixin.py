@@ -15,6 +15,10 @@ class SolveBlockMixin(object):
         assert self.can_solve
         return super(SolveBlockMixin, self).eval(*args, **kwargs)
 
+    def iter_eval(self, *args, **kwargs):
+        assert self.can_solve
+        return super(SolveBlockMixin, self).iter_eval(*args, **kwargs)
+
     def batch_eval(self, *args, **kwargs):
         assert self.can_solve
         return super(SolveBlockMixin, self).batch_eval(*args, **kwargs)
@@ -27,6 +31,10 @@ class SolveBlockMixin(object):
         assert self.can_solve
         return super(SolveBlockMixin, self).max(*args, **kwargs)
 
+    def bounds(self, *args, **kwargs):
+        assert self.can_solve
+        return super(SolveBlockMixin, self).bounds(*args, **kwargs)
+
     def satisfiable(self, *args, **kwargs):
         assert self.can_solve
         return super(SolveBlockMixin, self).satisfiable(*args, **kwargs)
@@ -285,6 +285,24 @@ class CompositeFrontend(ConstrainedFrontend):
         self._reabsorb_solver(ms)
         return r
 
+    def iter_eval(self, e, extra_constraints=(), exact=None):
+        self._ensure_sat(extra_constraints=extra_constraints)
+
+        names = self._names_for(e=e, lst=extra_constraints)
+        ms = self._solver_for_names(names)
+        # the solvers (and constraints) that ms was made from, since they can change between the solutions
+        merged = [ (s, s.constraints, len(s.constraints)) for s in self._solvers_for_variables(names) ]
+        for v in ms.iter_eval(e, extra_constraints=extra_constraints, exact=exact):
+            yield v
+
+        # what ms found is only worth keeping if all the solutions were generated, and if it was not made from solvers
+        # that changed in the meantime
+        current = self._solvers_for_variables(names)
+        if len(current) == len(merged) and all(
+            s is c and s.constraints is sc and len(sc) == n for s, (c, sc, n) in zip(current, merged)
+        ):
+            self._reabsorb_solver(ms)
+
     def batch_eval(self, exprs, n, extra_constraints=(), exact=None):
         self._ensure_sat(extra_constraints=extra_constraints)
 
@@ -309,6 +327,14 @@ class CompositeFrontend(ConstrainedFrontend):
         self._reabsorb_solver(ms)
         return r
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), exact=None):
+        self._ensure_sat(extra_constraints=extra_constraints)
+
+        ms = self._merged_solver_for(lst2=exprs, lst=extra_constraints)
+        r = ms.bounds(exprs, signed=signed, extra_constraints=extra_constraints, exact=exact)
+        self._reabsorb_solver(ms)
+        return r
+
     def solution(self, e, v, extra_constraints=(), exact=None):
         self._ensure_sat(extra_constraints=extra_constraints)
 
@@ -8,6 +8,11 @@ from ..frontend import Frontend
 
 
 class ConstrainedFrontend(Frontend):  # pylint:disable=abstract-method
+    # if this is set, constraint sets with more distinct ASTs than this are only simplified with the claripy-native
+    # rules, since a round trip through the solver backend would cost more than it is likely to save. None (the
+    # default) means no limit.
+    full_simplification_limit = None
+
     def __init__(self):
         Frontend.__init__(self)
         self.constraints = []
@@ -116,10 +121,18 @@ class ConstrainedFrontend(Frontend):  # pylint:disable=abstract-method
         if len(to_simplify) == 0:
             return self.constraints
 
-        simplified = simplify(And(*to_simplify)).split(['And']) #pylint:disable=no-member
+        conjunction = And(*to_simplify)
+        simplified = simplify(conjunction, full=self._worth_full_simplification(conjunction)).split(['And']) #pylint:disable=no-member
         self.constraints = no_simplify + simplified
         return self.constraints
 
+    def _worth_full_simplification(self, e):
+        limit = self.full_simplification_limit
+        if limit is None:
+            return True
+        # the tree size is an upper bound of the DAG size that is always at hand
+        return e.tree_size <= limit or e.dag_size <= limit
+
     #
     # Stuff that should be implemented by subclasses
     #
@@ -84,14 +84,27 @@ class FullFrontend(ConstrainedFrontend):
         return self.constraints
 
     def satisfiable(self, extra_constraints=(), exact=None):
+        store = persistent_store.store
+        if store is not None:
+            backend_name = self._solver_backend.__class__.__name__
+            constraints = tuple(self.constraints) + tuple(extra_constraints)
+            r = store.get_satisfiable(backend_name, constraints)
+            if r is not None:
+                return r
+
         try:
-            return self._solver_backend.satisfiable(
+            r = self._solver_backend.satisfiable(
                 extra_constraints=extra_constraints,
                 solver=self._get_solver(), model_callback=self._model_hook
             )
         except BackendError as e:
             raise_from(ClaripyFrontendError("Backend error during solve"), e)
 
+        # a check that gave up is reported as unsatisfiable, but another one might not give up
+        if store is not None and self._solver_backend.last_check_definite():
+            store.put_satisfiable(backend_name, constraints, r)
+        return r
+
     def eval(self, e, n, extra_constraints=(), exact=None):
         if not self.satisfiable(extra_constraints=extra_constraints):
             raise UnsatError('unsat')
@@ -104,6 +117,23 @@ class FullFrontend(ConstrainedFrontend):
         except BackendError as e:
             raise_from(ClaripyFrontendError("Backend error during eval"), e)
 
+    def iter_eval(self, e, extra_constraints=(), exact=None):
+        # the backend finds the solutions one at a time, and nothing is left on the solver between them
+        solutions = None
+        try:
+            solutions = self._solver_backend.iter_eval(
+                e, extra_constraints=extra_constraints,
+                solver=self._get_solver(), model_callback=self._model_hook
+            )
+            for v in solutions:
+                yield v
+        except BackendError as ex:
+            raise_from(ClaripyFrontendError("Backend error during iter_eval"), ex)
+        finally:
+            # the generator of the backend is closed as soon as we are, instead of whenever it is collected
+            if solutions is not None:
+                solutions.close()
+
     def batch_eval(self, exprs, n, extra_constraints=(), exact=None):
         if not self.satisfiable(extra_constraints=extra_constraints):
             raise UnsatError('unsat')
@@ -159,6 +189,20 @@ class FullFrontend(ConstrainedFrontend):
         except BackendError as e:
             raise_from(ClaripyFrontendError("Backend error during min"), e)
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), exact=None):
+        l.debug("Frontend.bounds() of %d expressions with %d extra_constraints", len(exprs), len(extra_constraints))
+
+        # the backend searches for all of them with the same solver, and every model it finds tightens all the bounds
+        try:
+            return self._solver_backend.bounds(
+                exprs, extra_constraints=extra_constraints,
+                solver=self._get_solver(),
+                model_callback=self._model_hook,
+                signed=signed
+            )
+        except BackendError as e:
+            raise_from(ClaripyFrontendError("Backend error during bounds"), e)
+
     def solution(self, e, v, extra_constraints=(), exact=None):
         try:
             return self._solver_backend.solution(
@@ -220,3 +264,4 @@ class FullFrontend(ConstrainedFrontend):
 from ..errors import UnsatError, BackendError, ClaripyFrontendError
 from ..ast.bv import UGE, ULE
 from ..backend_manager import backends
+from .. import persistent_store
@@ -81,6 +81,26 @@ class HybridFrontend(Frontend):
     def eval(self, e, n, extra_constraints=(), exact=None):
         return self._hybrid_call('eval', e, n, extra_constraints=extra_constraints, exact=exact)
 
+    def iter_eval(self, e, extra_constraints=(), exact=None):
+        # the approximation backend fails when the solutions are generated, so this can't go through _hybrid_call().
+        # The exact frontend is only fallen back to before any solution was yielded, since it would yield them again.
+        if exact is False:
+            try:
+                solutions = iter(self._approximate_frontend.iter_eval(e, extra_constraints=extra_constraints))
+                first = next(solutions)
+            except StopIteration:
+                return
+            except ClaripyFrontendError:
+                pass
+            else:
+                yield first
+                for v in solutions:
+                    yield v
+                return
+
+        for v in self._exact_frontend.iter_eval(e, extra_constraints=extra_constraints):
+            yield v
+
     def batch_eval(self, e, n, extra_constraints=(), exact=None):
         return self._hybrid_call('batch_eval', e, n, extra_constraints=extra_constraints, exact=exact)
 
@@ -90,6 +110,9 @@ class HybridFrontend(Frontend):
     def min(self, e, extra_constraints=(), exact=None):
         return self._hybrid_call('min', e, extra_constraints=extra_constraints, exact=exact)
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), exact=None):
+        return self._hybrid_call('bounds', exprs, signed=signed, extra_constraints=extra_constraints, exact=exact)
+
     def solution(self, e, v, extra_constraints=(), exact=None):
         return self._hybrid_call('solution', e, v, extra_constraints=extra_constraints, exact=exact)
 
@@ -19,6 +19,7 @@ class ReplacementFrontend(ConstrainedFrontend):
         self._unsafe_replacement = False if unsafe_replacement is None else unsafe_replacement
         self._replacements = {} if replacements is None else replacements
         self._replacement_cache = weakref.WeakKeyDictionary() if replacement_cache is None else replacement_cache
+        self._replaced_variables = None
 
         self._validation_frontend = None
 
@@ -32,6 +33,7 @@ class ReplacementFrontend(ConstrainedFrontend):
         c._unsafe_replacement = self._unsafe_replacement
         c._replacements = {}
         c._replacement_cache = weakref.WeakKeyDictionary()
+        c._replaced_variables = None
 
         if self._validation_frontend is not None:
             c._validation_frontend = self._validation_frontend.blank_copy()
@@ -46,6 +48,7 @@ class ReplacementFrontend(ConstrainedFrontend):
 
         c._replacements = self._replacements
         c._replacement_cache = self._replacement_cache
+        c._replaced_variables = self._replaced_variables
 
     #
     # Replacements
@@ -88,20 +91,22 @@ class ReplacementFrontend(ConstrainedFrontend):
         self._replacement_cache = weakref.WeakKeyDictionary(self._replacements)
 
     def _replacement(self, old):
-        if self._replacement_cache is None or len(self._replacement_cache) == 0: # pylint:disable=len-as-condition
-            return old
-
         if not isinstance(old, Base):
             return old
+        return self._replace_list((old,))[0]
+
+    def _replacement_skip(self):
+        # only ASTs that share variables with the replaced ones can contain them. Copies of this frontend share
+        # self._replacements and can add to it, so this is recomputed whenever it is a different dict or has grown.
+        replacements = self._replacements
+        cached = self._replaced_variables
+        if cached is None or cached[0] is not replacements or cached[1] != len(replacements):
+            variables = _replacement_variables(replacements)
+            cached = (replacements, len(replacements), variables)
+            self._replaced_variables = cached
 
-        try:
-            return self._replacement_cache[old.cache_key]
-        except KeyError:
-            # not found in the cache
-            new = old.replace_dict(self._replacement_cache)
-            if new is not old:
-                self._replacement_cache[old.cache_key] = new
-            return new
+        variables = cached[2]
+        return None if variables is None else lambda ast: ast.variables.isdisjoint(variables)
 
     def _add_solve_result(self, e, er, r):
         if not self._auto_replace:
@@ -148,13 +153,18 @@ class ReplacementFrontend(ConstrainedFrontend):
 
         super(ReplacementFrontend, self)._ana_setstate(base_state)
         self._replacement_cache = weakref.WeakKeyDictionary(self._replacements)
+        self._replaced_variables = None
 
     #
     # Replacement solving
     #
 
     def _replace_list(self, lst):
-        return tuple(self._replacement(c) for c in lst)
+        if self._replacement_cache is None or len(self._replacement_cache) == 0: # pylint:disable=len-as-condition
+            return tuple(lst)
+
+        # the replaced ASTs are memoized in the replacement cache
+        return tuple(_replace_many(lst, self._replacement_cache, skip=self._replacement_skip()))
 
     def eval(self, e, n, extra_constraints=(), exact=None):
         er = self._replacement(e)
@@ -163,6 +173,11 @@ class ReplacementFrontend(ConstrainedFrontend):
         if self._unsafe_replacement: self._add_solve_result(e, er, r[0])
         return r
 
+    def iter_eval(self, e, extra_constraints=(), exact=None):
+        er = self._replacement(e)
+        ecr = self._replace_list(extra_constraints)
+        return self._actual_frontend.iter_eval(er, extra_constraints=ecr, exact=exact)
+
     def batch_eval(self, exprs, n, extra_constraints=(), exact=None):
         er = self._replace_list(exprs)
         ecr = self._replace_list(extra_constraints)
@@ -186,6 +201,15 @@ class ReplacementFrontend(ConstrainedFrontend):
         if self._unsafe_replacement: self._add_solve_result(e, er, r)
         return r
 
+    def bounds(self, exprs, signed=False, extra_constraints=(), exact=None):
+        er = self._replace_list(exprs)
+        ecr = self._replace_list(extra_constraints)
+        r = self._actual_frontend.bounds(er, signed=signed, extra_constraints=ecr, exact=exact)
+        if self._unsafe_replacement and not signed:
+            for i, original in enumerate(exprs):
+                self._add_solve_result(original, er[i], r[i][0])
+        return r
+
     def solution(self, e, v, extra_constraints=(), exact=None):
         er = self._replacement(e)
         vr = self._replacement(v)
@@ -272,7 +296,7 @@ class ReplacementFrontend(ConstrainedFrontend):
         return added
 
 
-from ..ast.base import Base
+from ..ast.base import Base, _replace_many, _replacement_variables
 from ..ast.bv import BVV
 from ..ast.bool import BoolV, false
 from ..errors import ClaripyFrontendError, BackendError
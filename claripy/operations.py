@@ -7,6 +7,7 @@ from .utils import OrderedSet
 
 def op(name, arg_types, return_type, extra_check=None, calc_length=None, do_coerce=True, bound=True): #pylint:disable=unused-argument
     if type(arg_types) in (tuple, list): #pylint:disable=unidiomatic-typecheck
+        arg_types = tuple(arg_types)
         expected_num_args = len(arg_types)
     elif type(arg_types) is type: #pylint:disable=unidiomatic-typecheck
         expected_num_args = None
@@ -42,20 +43,17 @@ def op(name, arg_types, return_type, extra_check=None, calc_length=None, do_coer
             else:
                 yield arg
 
-    def _op(*args):
-        fixed_args = tuple(_type_fixer(args))
-        for i in fixed_args:
-            if i is NotImplemented:
-                return NotImplemented
-
+    def _build(args, fixed_args):
         if extra_check is not None:
             success, msg = extra_check(*fixed_args)
             if not success:
                 raise ClaripyOperationError(msg)
 
-        #pylint:disable=too-many-nested-blocks
-        if name in simplifiers:
-            simp = _handle_annotations(simplifiers[name](*fixed_args), args)
+        # the simplifiers and preprocessors are looked up on every call, so that they can be registered or replaced
+        # after the operation was created
+        simplifier = simplifiers.get(name, None)
+        if simplifier is not None:
+            simp = _handle_annotations(simplifier(*fixed_args), args)
             if simp is not None:
                 return simp
 
@@ -63,23 +61,69 @@ def op(name, arg_types, return_type, extra_check=None, calc_length=None, do_coer
         if calc_length is not None:
             kwargs['length'] = calc_length(*fixed_args)
 
+        # only ASTs with an extension object can be uninitialized
         kwargs['uninitialized'] = None
-        if any(a.uninitialized is True for a in args if isinstance(a, ast.Base)):
-            kwargs['uninitialized'] = True
+        for a in args:
+            if isinstance(a, ast.Base) and a._ext is not None and a.uninitialized is True:
+                kwargs['uninitialized'] = True
+                break
 
-        if name in preprocessors:
-            args, kwargs = preprocessors[name](*args, **kwargs)
+        preprocessor = preprocessors.get(name, None)
+        if preprocessor is not None:
+            args, kwargs = preprocessor(*args, **kwargs)
 
         return return_type(name, fixed_args, **kwargs)
 
-    _op.calc_length = calc_length
-    return _op
+    def _op(*args):
+        fixed_args = tuple(_type_fixer(args))
+        for i in fixed_args:
+            if i is NotImplemented:
+                return NotImplemented
+        return _build(args, fixed_args)
+
+    # the fast paths skip the type fixing when the arguments already have the right types, which is almost always the
+    # case. Anything else goes through _op.
+    if expected_num_args is None:
+        def _fast_op(*args):
+            for a in args:
+                if not isinstance(a, arg_types):
+                    return _op(*args)
+            return _build(args, args)
+    elif expected_num_args == 1:
+        t0, = arg_types
+        def _fast_op(*args):
+            if len(args) == 1 and isinstance(args[0], t0):
+                return _build(args, args)
+            return _op(*args)
+    elif expected_num_args == 2:
+        t0, t1 = arg_types
+        def _fast_op(*args):
+            if len(args) == 2 and isinstance(args[0], t0) and isinstance(args[1], t1):
+                return _build(args, args)
+            return _op(*args)
+    elif expected_num_args == 3:
+        t0, t1, t2 = arg_types
+        def _fast_op(*args):
+            if len(args) == 3 and isinstance(args[0], t0) and isinstance(args[1], t1) and isinstance(args[2], t2):
+                return _build(args, args)
+            return _op(*args)
+    else:
+        def _fast_op(*args):
+            if len(args) == expected_num_args and all(isinstance(a, t) for a, t in zip(args, arg_types)):
+                return _build(args, args)
+            return _op(*args)
+
+    _fast_op.calc_length = calc_length
+    return _fast_op
 
 def _handle_annotations(simp, args):
     if simp is None:
         return None
 
     ast_args = tuple(a for a in args if isinstance(a, ast.Base))
+    if not any(a._annotated for a in ast_args):
+        # there are no annotations that the simplification could have lost
+        return simp
 
     preserved_relocatable = frozenset(simp._relocatable_annotations)
     relocated_annotations = set()
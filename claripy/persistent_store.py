@@ -0,0 +1,242 @@
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+l = logging.getLogger("claripy.persistent_store")
+
+class PersistentStore(object):
+    """
+    A persistent, size-limited store for the results of simplifications and satisfiability checks, so that analyses
+    that run over and over on the same inputs do not have to recompute them. It is an sqlite database in a directory of
+    the user's choosing. Results are keyed by AST fingerprints, which (unlike hashes) are the same in every process.
+
+    When the store holds more than `max_entries` results, the least recently used ones are evicted. To keep reads off
+    the disk, the times at which the results were used are only written in batches, when the store evicts results or is closed.
+
+    Other users might be able to write to the database, so nothing that is read from it is unpickled: the ASTs are
+    stored in the DAG format of claripy.ast.serialization without pickles, and the results that can't be are not stored.
+    """
+
+    def __init__(self, directory, max_entries=100000, max_value_size=1 << 20, used_batch_size=1000,
+                 filename='claripy-store.sqlite'):
+        """
+        :param directory:       The directory of the database. It is created if it does not exist.
+        :param max_entries:     The maximum number of results in the store.
+        :param max_value_size:  Results that take more than this many bytes are not stored.
+        :param used_batch_size: The number of reads after which the times they were used at are written anyway.
+        :param filename:        The name of the database file.
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.path = os.path.join(directory, filename)
+        self.max_entries = max_entries
+        self.max_value_size = max_value_size
+        self.used_batch_size = used_batch_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # the times at which results were read, by (kind, key), that are not written yet
+        self._used = { }
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results '
+            '(kind TEXT, key BLOB, value BLOB, last_used REAL, PRIMARY KEY (kind, key))'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self._db.commit()
+        self._size = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._write_used()
+            self._db.commit()
+            self._db.close()
+
+    #
+    # The raw store
+    #
+
+    def _get(self, kind, key):
+        """
+        :return: The stored bytes, or None.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT value FROM results WHERE kind=? AND key=?', (kind, key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._used[(kind, key)] = time.time()
+            if len(self._used) >= self.used_batch_size:
+                self._write_used()
+                self._db.commit()
+            self.hits += 1
+            return bytes(row[0])
+
+    def _write_used(self):
+        if self._used:
+            self._db.executemany(
+                'UPDATE results SET last_used=? WHERE kind=? AND key=?',
+                [ (t, kind, key) for (kind, key), t in self._used.items() ]
+            )
+            self._used.clear()
+
+    def _put(self, kind, key, value):
+        """
+        Stores bytes.
+        """
+        if len(value) > self.max_value_size:
+            return
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (kind, key, sqlite3.Binary(value), time.time())
+            )
+            self._used.pop((kind, key), None)
+            # replacements are counted too, so this can overestimate the size until the next recount
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # other processes might share the database, so we recount before evicting. Evicting a tenth of the store at
+        # once keeps us from doing this on every insertion.
+        self._write_used()
+        self._size = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        excess = self._size - self.max_entries * 9 // 10
+        if self._size <= self.max_entries or excess <= 0:
+            return
+        self._db.execute(
+            'DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        l.debug("Evicted %d results from %s", excess, self.path)
+        self.evictions += excess
+        self._size -= excess
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM results')
+            self._db.commit()
+            self._used.clear()
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        """
+        :return: A dict with the size, maximum size, hits, misses and evictions of the store.
+        """
+        return {
+            'size': self._size,
+            'max_size': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    #
+    # Simplification results
+    #
+
+    def get_simplification(self, expr):
+        """
+        :param expr:    An AST.
+        :return:        The stored simplification of the AST, or None.
+        """
+        try:
+            data = self._get('simplify', expr.fingerprint)
+            return None if data is None else serialization.loads(data, allow_pickle=False)[0]
+        except ClaripySerializationError:
+            # the AST can't be fingerprinted, or the stored data is not an AST that can be read without unpickling
+            return None
+
+    def put_simplification(self, expr, result):
+        """
+        Stores the simplification of an AST.
+        """
+        try:
+            self._put('simplify', expr.fingerprint, serialization.dumps([ result ], allow_pickle=False))
+        except ClaripySerializationError:
+            # ASTs that can't be fingerprinted, or written without pickling, are not stored
+            pass
+
+    #
+    # Satisfiability results
+    #
+
+    _satisfiable_values = { b'\x01': True, b'\x00': False }
+
+    @staticmethod
+    def _constraints_key(backend, constraints):
+        # the constraints are a conjunction, so their order does not matter
+        h = hashlib.md5(backend.encode())
+        for f in sorted(set(c.fingerprint for c in constraints)):
+            h.update(f)
+        return h.digest()
+
+    def get_satisfiable(self, backend, constraints):
+        """
+        :param backend:     The name of the backend that solves the constraints.
+        :param constraints: The constraints.
+        :return:            Whether the constraints are satisfiable, or None if that is not known.
+        """
+        try:
+            data = self._get('satisfiable', self._constraints_key(backend, constraints))
+        except ClaripySerializationError:
+            return None
+        return self._satisfiable_values.get(data, None)
+
+    def put_satisfiable(self, backend, constraints, result):
+        """
+        Stores whether a set of constraints is satisfiable. The result must be a definite one: a check that timed out
+        or gave up is not an answer for the checks that come after it.
+        """
+        try:
+            self._put('satisfiable', self._constraints_key(backend, constraints), b'\x01' if result else b'\x00')
+        except ClaripySerializationError:
+            pass
+
+#
+# The store that claripy uses
+#
+
+store = None
+
+def enable(directory=None, **kwargs):
+    """
+    Makes claripy keep the results of simplifications and satisfiability checks in a persistent store.
+
+    :param directory:   The directory of the store. Defaults to the CLARIPY_STORE environment variable, or to
+                        ~/.cache/claripy.
+    :param kwargs:      Passed to PersistentStore.
+    :return:            The store.
+    """
+    global store #pylint:disable=global-statement
+    if directory is None:
+        directory = os.environ.get('CLARIPY_STORE', None) or os.path.join(os.path.expanduser('~'), '.cache', 'claripy')
+    disable()
+    store = PersistentStore(directory, **kwargs)
+    return store
+
+def disable():
+    """
+    Stops claripy from using the persistent store.
+    """
+    global store #pylint:disable=global-statement
+    if store is not None:
+        store.close()
+        store = None
+
+from .ast import serialization
+from .errors import ClaripySerializationError
+
+if os.environ.get('CLARIPY_STORE', False):
+    enable()
@@ -0,0 +1,345 @@
+import collections
+import inspect
+import logging
+import operator
+from functools import reduce
+
+from . import operations
+
+l = logging.getLogger("claripy.simplifications")
+
+class SimplificationManager(object):
+    """
+    A claripy-native rewrite engine. It holds rewrite rules, indexed by the op of the AST that they apply to, and
+    applies them bottom-up over a whole DAG, without converting anything to a solver backend.
+
+    A rule is a function that takes an AST (whose arguments are already simplified) and returns an equivalent AST, or
+    None if it does not apply. The rules of an AST are applied until none of them changes it anymore. The ASTs that get
+    rebuilt along the way also go through the simplifiers that operations.py applies when an AST is constructed.
+    """
+
+    def __init__(self, max_rewrites=16):
+        """
+        :param max_rewrites:    The maximum number of times that a single AST is rewritten, as a guard against rules
+                                that keep rewriting each other's results.
+        """
+        self.max_rewrites = max_rewrites
+        self._rules = collections.defaultdict(list)
+        self._superseded = set()
+
+    def register(self, op, rule):
+        """
+        Registers a rewrite rule for the ASTs of an op. Rules are tried in the order in which they were registered.
+        ASTs that were already simplified are not simplified again, so rules should be registered before claripy is
+        used.
+
+        :param op:      The AST operation ('__add__', 'If', etc).
+        :param rule:    The rule, a function of the AST to its rewritten form (or None).
+        """
+        self._rules[op].append(rule)
+
+    def supersede(self, op):
+        """
+        Stops the simplifier that operations.py has for an op from being applied to the ASTs of that op that get
+        rebuilt, for ops whose rules already cover what it does.
+
+        :param op:      The AST operation.
+        """
+        self._superseded.add(op)
+
+    def rules(self, op):
+        """
+        :return: The rules registered for an op.
+        """
+        return tuple(self._rules.get(op, ()))
+
+    @staticmethod
+    def _apply(rule, e):
+        r = rule(e)
+        if r is None or r is e:
+            return None
+        return operations._handle_annotations(r, e.args)
+
+    def _rewrite(self, e, rebuilt):
+        for _ in range(self.max_rewrites):
+            # rewriting an annotated AST would lose its annotations
+            if e.annotations:
+                return e
+
+            for rule in self._rules.get(e.op, ()):
+                r = self._apply(rule, e)
+                if r is not None:
+                    break
+            else:
+                # ASTs that were constructed through their operation already went through its simplifier, but the
+                # ones that we rebuilt did not
+                r = self._apply(_operation_simplifier, e) if rebuilt and e.op not in self._superseded else None
+                if r is None:
+                    return e
+
+            l.debug("Rewrote a %s into a %s", e.op, r.op)
+            e = r
+            rebuilt = True
+            if not isinstance(e, Base) or e.op in operations.leaf_operations:
+                return e
+        return e
+
+    def simplify(self, expr):
+        """
+        Simplifies an AST with the rewrite rules.
+
+        :param expr:    The AST.
+        :return:        The simplified AST.
+        """
+        if not isinstance(expr, Base):
+            return expr
+
+        # ASTs that the rules left alone are marked as simplified, and the ones that they changed remember what they
+        # were changed into, so that the ASTs that sibling expressions share are only simplified once
+        results = { }
+
+        def descend(node):
+            if node._simplified:
+                return False
+            r = node._rewritten
+            if r is None:
+                return True
+            results[node._cache_key] = r
+            return False
+
+        for node in _iter_postorder((expr,), memo=results, descend=descend):
+            key = node._cache_key
+            if key in results:
+                continue
+            if node._simplified or node.op in operations.leaf_operations:
+                results[key] = node
+                continue
+
+            new_args = tuple(results[a._cache_key] if isinstance(a, Base) else a for a in node.args)
+            rebuilt = any(new is not old for new, old in zip(new_args, node.args))
+            r = node.make_like(node.op, new_args) if rebuilt else node
+
+            if r.op not in operations.leaf_operations and not r._simplified:
+                r = self._rewrite(r, rebuilt)
+            if not r._simplified:
+                r._simplified = Base.LITE_SIMPLIFY
+            if r is not node:
+                node._rewritten = r
+            results[key] = r
+
+        return results[expr._cache_key]
+
+#
+# The rules
+#
+
+def _bvv_value(a):
+    return a.args[0] if a.op == 'BVV' and not a._annotated else None
+
+def _mask(e):
+    return (1 << e.length) - 1
+
+def _nary_rule(f, identity, absorbing=None):
+    """
+    Builds a rule for a commutative and associative operation: it merges all of the concrete operands into one, drops
+    it if it is the identity, and returns the absorbing element if it shows up.
+
+    :param f:           The operation on ints.
+    :param identity:    A function of the mask of the AST to the identity of the operation.
+    :param absorbing:   A function of the mask of the AST to the absorbing element of the operation, if there is one.
+    """
+    def rule(e):
+        mask = _mask(e)
+        symbolic = [ ]
+        concrete = [ ]
+        for a in e.args:
+            v = _bvv_value(a)
+            if v is None:
+                symbolic.append(a)
+            else:
+                concrete.append(v)
+
+        if not concrete:
+            return None
+
+        value = reduce(f, concrete) & mask
+        if absorbing is not None and value == absorbing(mask):
+            return ast.all_operations.BVV(value, e.length)
+        if value == identity(mask):
+            args = symbolic
+        elif len(concrete) == 1:
+            return None
+        else:
+            args = symbolic + [ ast.all_operations.BVV(value, e.length) ]
+
+        if not args:
+            return ast.all_operations.BVV(value, e.length)
+        elif len(args) == 1:
+            return args[0]
+        else:
+            return e.make_like(e.op, tuple(args))
+    return rule
+
+def _complement_rule(result):
+    """
+    Builds a rule for x op ~x, given a function of the mask of the AST to the result.
+    """
+    def rule(e):
+        if len(e.args) != 2:
+            return None
+        a, b = e.args
+        if (a.op == '__invert__' and a.args[0] is b) or (b.op == '__invert__' and b.args[0] is a):
+            return ast.all_operations.BVV(result(_mask(e)), e.length)
+    return rule
+
+def _involution_rule(e):
+    # ~~x -> x, --x -> x, Not(Not(x)) -> x
+    inner = e.args[0]
+    if inner.op == e.op:
+        return inner.args[0]
+
+def _shift_rule(e):
+    # shifting left or logically right by the size or more gives 0
+    shift = _bvv_value(e.args[1])
+    if shift is not None and shift >= e.length:
+        return ast.all_operations.BVV(0, e.length)
+
+def _div_rule(e):
+    if _bvv_value(e.args[1]) == 1:
+        return e.args[0]
+
+def _mod_rule(e):
+    if _bvv_value(e.args[1]) == 1:
+        return ast.all_operations.BVV(0, e.length)
+
+def _nested_extension_rule(e):
+    # ZeroExt(a, ZeroExt(b, x)) -> ZeroExt(a+b, x), and the same for SignExt
+    n, inner = e.args
+    if inner.op == e.op:
+        return e.make_like(e.op, (n + inner.args[0], inner.args[1]))
+
+_reflexive_comparisons = {
+    '__le__': True, '__ge__': True, 'SLE': True, 'SGE': True,
+    '__lt__': False, '__gt__': False, 'SLT': False, 'SGT': False,
+}
+
+def _reflexive_rule(e):
+    # x <= x -> True, x < x -> False
+    a, b = e.args
+    if a is b:
+        return ast.all_operations.true if _reflexive_comparisons[e.op] else ast.all_operations.false
+
+def _unsigned_bound_rule(e):
+    # nothing is unsigned-less than 0 or unsigned-greater than all-ones
+    a, b = e.args
+    va = _bvv_value(a)
+    vb = _bvv_value(b)
+    mask = _mask(a)
+    op = e.op
+    if op in ('__lt__', '__ge__') and (vb == 0 or va == mask):
+        return ast.all_operations.false if op == '__lt__' else ast.all_operations.true
+    if op in ('__gt__', '__le__') and (va == 0 or vb == mask):
+        return ast.all_operations.false if op == '__gt__' else ast.all_operations.true
+
+def _boolean_rule(identity, absorbing):
+    """
+    Builds the rule for And (or Or): it flattens nested conjunctions, drops True (False) and duplicates, and gives
+    False (True) if it shows up or if an argument shows up together with its negation. Arguments are compared by
+    identity only, so unlike the simplifiers of operations.py, this never asks a backend about the truth of anything.
+
+    :param identity:    A function that returns the identity of the operation.
+    :param absorbing:   A function that returns the absorbing element of the operation.
+    """
+    def rule(e):
+        args = [ ]
+        seen = set()
+        changed = False
+        for a in e.args:
+            if a.op == e.op and not a.annotations:
+                children = a.args
+                changed = True
+            else:
+                children = (a,)
+
+            for c in children:
+                if c is absorbing():
+                    return c
+                if c is identity() or id(c) in seen:
+                    changed = True
+                    continue
+                seen.add(id(c))
+                args.append(c)
+
+        if any(a.op == 'Not' and id(a.args[0]) in seen for a in args):
+            return absorbing()
+        if not changed:
+            return None
+        if not args:
+            return identity()
+        if len(args) == 1:
+            return args[0]
+        return e.make_like(e.op, tuple(args))
+    return rule
+
+def _if_rule(e):
+    cond, if_true, if_false = e.args
+    if if_true is if_false:
+        return if_true
+    if if_true is ast.all_operations.true and if_false is ast.all_operations.false:
+        return cond
+    if if_true is ast.all_operations.false and if_false is ast.all_operations.true:
+        return ast.all_operations.Not(cond)
+    if cond.op == 'Not':
+        return e.make_like('If', (cond.args[0], if_false, if_true))
+    # If(c, If(c, a, b), d) -> If(c, a, d) and If(c, a, If(c, b, d)) -> If(c, a, d)
+    if if_true.op == 'If' and if_true.args[0] is cond:
+        return e.make_like('If', (cond, if_true.args[1], if_false))
+    if if_false.op == 'If' and if_false.args[0] is cond:
+        return e.make_like('If', (cond, if_true, if_false.args[2]))
+
+def _operation_simplifier(e):
+    # the simplifier of operations.py that runs when an AST of this op is constructed. They take the arguments of the
+    # operation, and most of them only take as many as the operation does.
+    simplifier = operations.simplifiers.get(e.op, None)
+    if simplifier is None:
+        return None
+    code = simplifier.__code__
+    if not code.co_flags & inspect.CO_VARARGS and code.co_argcount != len(e.args):
+        return None
+    return simplifier(*e.args)
+
+def _default_rules():
+    rules = [
+        ('__add__', _nary_rule(operator.add, lambda m: 0)),
+        ('__mul__', _nary_rule(operator.mul, lambda m: 1, absorbing=lambda m: 0)),
+        ('__and__', _nary_rule(operator.and_, lambda m: m, absorbing=lambda m: 0)),
+        ('__or__', _nary_rule(operator.or_, lambda m: 0, absorbing=lambda m: m)),
+        ('__xor__', _nary_rule(operator.xor, lambda m: 0)),
+        ('__and__', _complement_rule(lambda m: 0)),
+        ('__or__', _complement_rule(lambda m: m)),
+        ('__xor__', _complement_rule(lambda m: m)),
+        ('__invert__', _involution_rule),
+        ('__neg__', _involution_rule),
+        ('Not', _involution_rule),
+        ('__lshift__', _shift_rule),
+        ('LShR', _shift_rule),
+        ('__floordiv__', _div_rule),
+        ('__mod__', _mod_rule),
+        ('ZeroExt', _nested_extension_rule),
+        ('SignExt', _nested_extension_rule),
+        ('And', _boolean_rule(lambda: ast.all_operations.true, lambda: ast.all_operations.false)),
+        ('Or', _boolean_rule(lambda: ast.all_operations.false, lambda: ast.all_operations.true)),
+        ('If', _if_rule),
+    ]
+    rules.extend((op, _reflexive_rule) for op in _reflexive_comparisons)
+    rules.extend((op, _unsigned_bound_rule) for op in ('__lt__', '__le__', '__gt__', '__ge__'))
+    return rules
+
+simpleton = SimplificationManager()
+for _op, _rule in _default_rules():
+    simpleton.register(_op, _rule)
+simpleton.supersede('And')
+simpleton.supersede('Or')
+
+from . import ast
+from .ast.base import Base, _iter_postorder
@@ -0,0 +1,93 @@
+import collections
+import sys
+
+def _ast_bytes(a, counted_variable_sets):
+    """
+    Estimates the memory used by a single AST: the object itself, its argument tuple, its cache key and extension
+    object (if they were created) and the non-AST arguments. Variable sets are shared between ASTs, so each one is only
+    counted once.
+    """
+    size = sys.getsizeof(a) + sys.getsizeof(a.args)
+    if a._cache_key_object is not None:
+        size += sys.getsizeof(a._cache_key_object)
+    if a._ext is not None:
+        size += sys.getsizeof(a._ext)
+    for arg in a.args:
+        if not isinstance(arg, Base) and arg is not None and type(arg) is not bool:
+            size += sys.getsizeof(arg)
+
+    v = a.variables
+    if id(v) not in counted_variable_sets:
+        counted_variable_sets.add(id(v))
+        size += sys.getsizeof(v)
+    return size
+
+def cache_stats(reset_counters=False):
+    """
+    Reads the counters and cache sizes that claripy keeps anyway. This takes constant time (in the number of ASTs), so
+    this is the one to call periodically or to log.
+
+    The result is a dict with the following keys:
+
+    - `asts`: the number of live (hash-consed) ASTs
+    - `hash_cache_hits` and `hash_cache_misses`: how many AST constructions found an existing AST and how many
+      created a new one
+    - `backends`: a dict of backend names to the sizes of their caches (those of the current thread, for the
+      per-thread caches)
+
+    :param reset_counters:  Reset the hash-cache hit and miss counters after reading them.
+    :return:                A dict.
+    """
+    stats = {
+        'asts': len(Base._hash_cache),
+        'hash_cache_hits': base._hash_cache_hits,
+        'hash_cache_misses': base._hash_cache_misses,
+        'backends': dict((name, b.cache_sizes()) for name, b in backends._backends_by_name.items()),
+    }
+
+    if reset_counters:
+        base._hash_cache_hits = 0
+        base._hash_cache_misses = 0
+
+    return stats
+
+def memory_census(reset_counters=False):
+    """
+    Takes a census of the memory that claripy holds on to. Unlike cache_stats(), this walks every live AST, so it
+    takes time (and a snapshot of the hash cache takes memory) linear in their number: with millions of live ASTs, a
+    census takes seconds. It is meant for debugging memory use, not for being called on every step of an analysis.
+
+    The result has the keys of cache_stats(), and the following ones:
+
+    - `by_op`: a dict of AST ops to their number of live ASTs
+    - `by_type`: a dict of AST type names ('BV', 'Bool', ...) to their number of live ASTs
+    - `estimated_bytes`: an estimate of the memory used by the live ASTs
+    - `variable_sets`: the number of distinct variable sets referenced by the live ASTs
+
+    :param reset_counters:  Reset the hash-cache hit and miss counters after reading them.
+    :return:                A dict.
+    """
+    by_op = collections.Counter()
+    by_type = collections.Counter()
+    counted_variable_sets = set()
+    estimated_bytes = 0
+
+    asts = Base._hash_cache.values()
+    for a in asts:
+        by_op[a.op] += 1
+        by_type[type(a).__name__] += 1
+        estimated_bytes += _ast_bytes(a, counted_variable_sets)
+
+    census = cache_stats(reset_counters=reset_counters)
+    census.update({
+        'asts': len(asts),
+        'by_op': dict(by_op),
+        'by_type': dict(by_type),
+        'estimated_bytes': estimated_bytes,
+        'variable_sets': len(counted_variable_sets),
+    })
+    return census
+
+from .ast import base
+from .ast.base import Base
+from .backend_manager import backends
@@ -1,2 +1,4 @@
 
 from .orderedset import OrderedSet
+from .sharded_dict import ShardedWeakValueDictionary
+from .lru import LRUCache
@@ -0,0 +1,129 @@
+import collections
+import threading
+import weakref
+
+
+class LRUCache(object):
+    """
+    A dict with a maximum size, which evicts its least recently used items to stay within it. It counts its hits,
+    misses and evictions, and every operation takes a lock, so it can be shared between threads.
+
+    A weak cache only holds weak references to its values, so it never keeps them alive. The items whose value is gone
+    are treated as missing.
+    """
+
+    def __init__(self, max_size=10000, weak=False, on_evict=None):
+        """
+        :param max_size:    The maximum number of items. A cache of size 0 never stores anything.
+        :param weak:        Whether to hold the values through weak references.
+        :param on_evict:    A function that is called with the key and the value (None if it is gone) of every evicted
+                            item, after the cache is unlocked again.
+        """
+        self._lock = threading.Lock()
+        self._items = collections.OrderedDict()
+        self._weak = weak
+        self._on_evict = on_evict
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the value for `key` (and marks it as recently used), or `default` if there is none.
+        """
+        with self._lock:
+            try:
+                # OrderedDict.move_to_end() does not exist in python 2
+                stored = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            value = stored() if self._weak else stored
+            if value is None and self._weak:
+                self.misses += 1
+                return default
+            self._items[key] = stored
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = weakref.ref(value) if self._weak else value
+            evicted = self._shrink()
+        self._evicted(evicted)
+
+    def _shrink(self):
+        evicted = [ ]
+        while len(self._items) > self.max_size:
+            evicted.append(self._items.popitem(last=False))
+            self.evictions += 1
+        return evicted
+
+    def _evicted(self, evicted):
+        if self._on_evict is not None:
+            for key, stored in evicted:
+                self._on_evict(key, stored() if self._weak else stored)
+
+    def resize(self, max_size):
+        """
+        Changes the maximum size of the cache, evicting items if it is now too big.
+        """
+        with self._lock:
+            self.max_size = max_size
+            evicted = self._shrink()
+        self._evicted(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            try:
+                stored = self._items.pop(key)
+            except KeyError:
+                return default
+            value = stored() if self._weak else stored
+            return default if value is None and self._weak else value
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def items(self):
+        """
+        :return: A list of the items, from the least to the most recently used one.
+        """
+        with self._lock:
+            if not self._weak:
+                return list(self._items.items())
+            items = [ (k, r()) for k, r in self._items.items() ]
+            return [ (k, v) for k, v in items if v is not None ]
+
+    def clear(self):
+        """
+        Removes all the items. They count as evicted for on_evict, but not in the stats.
+        """
+        with self._lock:
+            evicted = list(self._items.items())
+            self._items.clear()
+        self._evicted(evicted)
+
+    def stats(self):
+        """
+        :return: A dict with the size, maximum size, hits, misses and evictions of the cache.
+        """
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
@@ -0,0 +1,76 @@
+import threading
+import weakref
+
+
+class ShardedWeakValueDictionary(object):
+    """
+    A WeakValueDictionary with integer keys, split into shards that each have their own lock. Several threads can
+    insert into it at once, and setdefault() is atomic, so that two threads racing to insert the same key agree on
+    the value that won.
+    """
+
+    def __init__(self, shard_bits=4):
+        self._mask = (1 << shard_bits) - 1
+        self._shards = [ weakref.WeakValueDictionary() for _ in range(1 << shard_bits) ]
+        self._locks = [ threading.Lock() for _ in range(1 << shard_bits) ]
+
+    def get(self, key, default=None):
+        # reading a WeakValueDictionary is safe without the lock
+        return self._shards[key & self._mask].get(key, default)
+
+    def setdefault(self, key, value):
+        """
+        Returns the value stored for `key`, storing `value` first if there is none.
+        """
+        i = key & self._mask
+        with self._locks[i]:
+            return self._shards[i].setdefault(key, value)
+
+    def __getitem__(self, key):
+        return self._shards[key & self._mask][key]
+
+    def __setitem__(self, key, value):
+        i = key & self._mask
+        with self._locks[i]:
+            self._shards[i][key] = value
+
+    def pop(self, key, default=None):
+        i = key & self._mask
+        with self._locks[i]:
+            return self._shards[i].pop(key, default)
+
+    def __delitem__(self, key):
+        i = key & self._mask
+        with self._locks[i]:
+            del self._shards[i][key]
+
+    def __contains__(self, key):
+        return key in self._shards[key & self._mask]
+
+    def __len__(self):
+        return sum(len(s) for s in self._shards)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def _snapshot(self, what):
+        # inserts from other threads would break the iteration, so every shard is copied under its lock
+        r = [ ]
+        for s, lock in zip(self._shards, self._locks):
+            with lock:
+                r.extend(getattr(s, what)())
+        return r
+
+    def keys(self):
+        return self._snapshot('keys')
+
+    def values(self):
+        return self._snapshot('values')
+
+    def items(self):
+        return self._snapshot('items')
+
+    def clear(self):
+        for s, lock in zip(self._shards, self._locks):
+            with lock:
+                s.clear()
@@ -118,7 +118,38 @@ def test_eagerness():
     y = x + 1
     assert y.annotations == x.annotations
 
+def test_annotation_bookkeeping():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+
+    # unannotated ASTs all share the same empty bookkeeping
+    e = (x + y) * 3
+    f = claripy.Concat(x, y)[15:0]
+    assert not e._annotated and not f._annotated
+    assert e._uneliminatable_annotations is f._uneliminatable_annotations
+    assert e._relocatable_annotations is f._relocatable_annotations
+    assert len(e._uneliminatable_annotations) == 0 and len(e._relocatable_annotations) == 0
+
+    # annotations below an AST are collected, however deep they are
+    b = AnnotationB('b', 1)
+    c = AnnotationC('c', 1)
+    g = ((x.annotate(b) + 1) * y.annotate(c)) + 2
+    assert g._annotated
+    assert not (x + 1)._annotated
+    assert g._uneliminatable_annotations == frozenset([ b ])
+    assert list(g._relocatable_annotations) == [ c ]
+
+    # eliminatable annotations are annotations too, but they are not kept for simplification
+    h = x.annotate(AnnotationA('a', 1)) + 1
+    assert h._annotated
+    assert len(h._uneliminatable_annotations) == 0 and len(h._relocatable_annotations) == 0
+
+    # unannotated expressions are still simplified
+    assert (x + 0) is x
+    assert (x ^ x).depth == 1
+
 if __name__ == '__main__':
+    test_annotation_bookkeeping()
     test_annotations()
     test_backend()
     test_eagerness()
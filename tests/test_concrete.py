@@ -1,5 +1,8 @@
+import itertools
+
 import claripy
 import nose
+from claripy.ast import folding
 
 def test_concrete():
     a = claripy.BVV(10, 32)
@@ -26,6 +29,59 @@ def test_concrete_fp():
     f = claripy.FPV(1.0, claripy.FSORT_FLOAT)
     nose.tools.assert_equal(claripy.backends.concrete.eval(f, 2), (1.0,))
 
+def _check_folding(op, args):
+    bc = claripy.backends.concrete
+    try:
+        expected = bc._abstract(bc.call(op, args))
+    except Exception: #pylint:disable=broad-except
+        expected = None
+
+    folded = folding.fold(op, args)
+    if folded is not None:
+        # whatever gets folded must come out exactly like the concrete backend's result
+        nose.tools.assert_is(folded, expected, "%s%r folded to %r instead of %r" % (op, args, folded, expected))
+
+def test_constant_folding():
+    values = [ claripy.BVV(v, 8) for v in (0, 1, 2, 3, 7, 8, 9, 0x7f, 0x80, 0x81, 0xfe, 0xff) ]
+    values += [ claripy.BVV(v, 3) for v in range(8) ]
+    bools = [ claripy.true, claripy.false ]
+
+    binary_ops = [ '__add__', '__sub__', '__mul__', '__and__', '__or__', '__xor__', '__floordiv__', '__mod__',
+                   'SDiv', 'SMod', '__lshift__', '__rshift__', 'LShR', 'RotateLeft', 'RotateRight', '__eq__',
+                   '__ne__', '__lt__', '__le__', '__gt__', '__ge__', 'SLT', 'SLE', 'SGT', 'SGE' ]
+    for a, b in itertools.product(values, repeat=2):
+        if a.length != b.length:
+            continue
+        for op in binary_ops:
+            _check_folding(op, (a, b))
+        _check_folding('Concat', (a, b))
+        _check_folding('If', (claripy.true, a, b))
+        _check_folding('If', (claripy.false, a, b))
+
+    for a in values + [ claripy.BVV(0x123456789a, 40), claripy.BVV(0xdeadbeef, 32) ]:
+        for op in ('__invert__', '__neg__', 'Reverse'):
+            _check_folding(op, (a,))
+        for n in (0, 1, 8):
+            _check_folding('ZeroExt', (n, a))
+            _check_folding('SignExt', (n, a))
+        for high in range(a.length):
+            for low in range(high + 1):
+                _check_folding('Extract', (high, low, a))
+
+    for a, b in itertools.product(bools, repeat=2):
+        for op in ('And', 'Or', '__eq__', '__ne__'):
+            _check_folding(op, (a, b))
+    for a in bools:
+        _check_folding('Not', (a,))
+
+    # the folders are used when building ASTs
+    x = claripy.BVV(0x1000, 32)
+    nose.tools.assert_is(x + 0x10, claripy.BVV(0x1010, 32))
+    nose.tools.assert_is(claripy.SignExt(32, claripy.BVV(-4, 32)), claripy.BVV(-4, 64))
+    nose.tools.assert_is(claripy.If(x == 0x1000, claripy.true, claripy.false), claripy.true)
+    nose.tools.assert_raises(claripy.ClaripyZeroDivisionError, lambda: x / 0)
+
 if __name__ == '__main__':
     test_concrete()
     test_concrete_fp()
+    test_constant_folding()
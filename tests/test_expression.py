@@ -1,3 +1,8 @@
+import binascii
+import gc
+import pickle
+import weakref
+
 import claripy
 import nose
 
@@ -228,6 +233,63 @@ def test_if_stuff():
     iiii = claripy.If(x > 10, (x*3+2)+0x20, (x*4+2)+0x10)
     nose.tools.assert_is(iii.ite_excavated, iiii)
 
+def test_deep_ite():
+    # symbolic memory reads make long If chains, which are excavated and burrowed without recursion
+    addr = claripy.BVS('addr', 64)
+    a = claripy.ite_cases([ (addr == k, claripy.BVS('a_%d' % k, 32)) for k in range(1500) ], claripy.BVV(0, 32))
+    b = claripy.ite_cases([ (addr == k, claripy.BVS('b_%d' % k, 32)) for k in range(1500) ], claripy.BVV(0, 32))
+    e = (a + b).ite_excavated
+    nose.tools.assert_equal(e.op, 'If')
+    nose.tools.assert_is(e.args[0], addr == 0)
+    nose.tools.assert_is(e.ite_excavated, e)
+    nose.tools.assert_is((a + b).ite_excavated, e)
+
+    c = claripy.BVS('x', 32) > 5
+    t0 = claripy.BVS('t', 32)
+    f0 = claripy.BVS('f', 32)
+    t, f = t0, f0
+    vs = [ claripy.BVS('v_%d' % k, 32) for k in range(1500) ]
+    for v in vs:
+        t = v - t
+        f = v - f
+    r = claripy.If(c, t, f).ite_burrowed
+    for v in reversed(vs):
+        nose.tools.assert_equal(r.op, '__sub__')
+        nose.tools.assert_is(r.args[0], v)
+        r = r.args[1]
+    nose.tools.assert_is(r, claripy.If(c, t0, f0))
+
+def test_ite_pass_memo():
+    c = claripy.BVS('memo_c', 32) > 5
+    e = claripy.If(c, claripy.BVS('memo_t', 32), claripy.BVS('memo_f', 32)) + 1
+    r = e.ite_excavated
+    nose.tools.assert_is(r.ite_excavated, r)
+
+    # the results are flagged as their own results, rather than referring to themselves, so they are freed without
+    # waiting for the cycle collector
+    ref = weakref.ref(r)
+    gc.disable()
+    try:
+        del e, r
+        nose.tools.assert_is(ref(), None)
+    finally:
+        gc.enable()
+
+def test_deep_ast():
+    # not every walk over ASTs is iterative, and the ones that recurse still have to handle deep ASTs
+    x = claripy.BVS('deep_x', 32)
+    e = x
+    for i in range(2000):
+        e = claripy.If(x == i, e, x - i)
+    nose.tools.assert_equal(e.depth, 2002)
+
+    loaded = pickle.loads(pickle.dumps(e, -1))
+    nose.tools.assert_equal((loaded._hash, loaded.depth), (e._hash, e.depth))
+    assert repr(e).startswith('<BV32 if ')
+    assert e.dbg_repr()
+    assert e.structurally_match(claripy.If(x == 2000, e, x - 2000).args[1])
+    assert claripy.backends.vsa.convert(e).identical(claripy.backends.vsa.convert(x - 1))
+
 def test_ite():
     yield raw_ite, claripy.Solver
     yield raw_ite, claripy.SolverHybrid
@@ -384,6 +446,26 @@ def test_depth():
     x2 = x1 + 1
     assert x2.depth == 2
 
+def test_size_metrics():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    assert (x.depth, x.tree_size, x.dag_size) == (1, 1, 1)
+
+    # (x+y) is shared, and x and y are leaves of both it and the top-level AST
+    s = x + y
+    e = claripy.Concat(s * s, x, y)
+    assert e.depth == 4
+    assert e.tree_size == 1 + (1 + 3 + 3) + 1 + 1
+    assert e.dag_size == 5
+    assert e.dag_size == 5
+
+    # the depth and the tree size of deep ASTs come for free
+    for _ in range(2000):
+        s = claripy.LShR(s, 1)
+    assert s.depth == 2002
+    assert s.tree_size == 3 + 2000 * 2
+    assert s.dag_size == 3 + 1 + 2000
+
 def test_multiarg():
     x = claripy.BVS('x', 32)
     o = claripy.BVV(2, 32)
@@ -493,9 +575,284 @@ def test_arith_shift():
     solver.add(a == -4)
     assert list(solver.eval(a >> 1, 2)) == [2**32-2]
 
+def test_fingerprint():
+    import os
+    import subprocess
+    import sys
+
+    x = claripy.BVS('x', 32, explicit_name=True)
+    y = claripy.BVS('y', 32, explicit_name=True)
+    a = claripy.If(x > y, claripy.Concat(x, y), claripy.BVV(-1, 64))[40:8]
+
+    nose.tools.assert_equal(len(a.fingerprint), 16)
+    nose.tools.assert_equal(a.fingerprint, (claripy.If(x > y, claripy.Concat(x, y), claripy.BVV(-1, 64))[40:8]).fingerprint)
+    nose.tools.assert_not_equal((x + y).fingerprint, (y + x).fingerprint)
+    nose.tools.assert_not_equal(claripy.BVV(-1, 32).fingerprint, claripy.BVV(-2, 32).fingerprint)
+    nose.tools.assert_not_equal(claripy.FPV(0.0, claripy.FSORT_DOUBLE).fingerprint, claripy.FPV(-0.0, claripy.FSORT_DOUBLE).fingerprint)
+
+    # sorts and annotations are fingerprinted by their state, and unknown objects are refused
+    f = claripy.FPS('f', claripy.FSORT_DOUBLE, explicit_name=True)
+    nose.tools.assert_not_equal(f.fingerprint, claripy.FPS('f', claripy.FSORT_FLOAT, explicit_name=True).fingerprint)
+    nose.tools.assert_equal(
+        x.annotate(claripy.SimplificationAvoidanceAnnotation()).fingerprint,
+        x.annotate(claripy.SimplificationAvoidanceAnnotation()).fingerprint
+    )
+    nose.tools.assert_not_equal(x.annotate(claripy.SimplificationAvoidanceAnnotation()).fingerprint, x.fingerprint)
+    odd = claripy.ast.BV('BVS', ('odd', object()), length=32)
+    nose.tools.assert_raises(claripy.ClaripySerializationError, lambda: odd.fingerprint)
+
+    # the fingerprint must not depend on hash randomization
+    script = (
+        "import claripy, binascii, sys\n"
+        "x = claripy.BVS('x', 32, explicit_name=True)\n"
+        "y = claripy.BVS('y', 32, explicit_name=True)\n"
+        "f = claripy.FPS('f', claripy.FSORT_DOUBLE, explicit_name=True)\n"
+        "a = claripy.If(x > y, claripy.Concat(x, y), claripy.BVV(-1, 64))[40:8]\n"
+        "a = claripy.Concat(a, f.to_bv()).annotate(claripy.SimplificationAvoidanceAnnotation())\n"
+        "sys.stdout.write(binascii.hexlify(a.fingerprint).decode())\n"
+    )
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..') + os.pathsep + env.get('PYTHONPATH', '')
+    for seed in ('1', '2'):
+        env['PYTHONHASHSEED'] = seed
+        out = subprocess.check_output([ sys.executable, '-c', script ], env=env)
+        b = claripy.Concat(a, f.to_bv()).annotate(claripy.SimplificationAvoidanceAnnotation())
+        nose.tools.assert_equal(out.decode(), binascii.hexlify(b.fingerprint).decode())
+
+def test_hash():
+    import os
+    import subprocess
+    import sys
+
+    x = claripy.BVS('x', 64, explicit_name=True)
+    asts = [ x + claripy.BVV(v, 64) for v in (5, 2**61 + 4, -1, -2, 2**63, 0) ]
+    asts += [ claripy.FPV(0.0, claripy.FSORT_DOUBLE), claripy.FPV(-0.0, claripy.FSORT_DOUBLE) ]
+    nose.tools.assert_equal(len(set(a._hash for a in asts)), len(asts))
+    nose.tools.assert_equal(len(set(id(a) for a in asts)), len(asts))
+    # ints that Python would hash to the same value (2**61 - 1 is its modulus), and names of different types
+    asts += [ claripy.BVV(v, 128) for v in (1, 2**61, 2**122, 2**61 - 1, 0) ]
+    asts += [ claripy.ast.BV('BVS', (n, None, None, None, False, False, None), length=64, variables={ n }, symbolic=True)
+              for n in ('n', b'n') ]
+    nose.tools.assert_equal(len(set(a._hash for a in asts)), len(asts))
+    for a in asts:
+        nose.tools.assert_equal(hash(a), a._hash)
+
+    # variable names may be bytes as well as str
+    nose.tools.assert_equal(len(claripy.Concat(x, claripy.FPS('f', claripy.FSORT_DOUBLE).to_bv()).variables), 2)
+
+    # like the fingerprint, the hash does not depend on hash randomization
+    script = (
+        "import claripy, sys\n"
+        "x = claripy.BVS('x', 64, explicit_name=True)\n"
+        "sys.stdout.write(str(claripy.If(x > 3, x, x + 1)._hash))\n"
+    )
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..') + os.pathsep + env.get('PYTHONPATH', '')
+    for seed in ('1', '2'):
+        env['PYTHONHASHSEED'] = seed
+        out = subprocess.check_output([ sys.executable, '-c', script ], env=env)
+        nose.tools.assert_equal(out.decode(), str(claripy.If(x > 3, x, x + 1)._hash))
+
+def test_variable_sets():
+    import pickle
+    from claripy.ast.base import _VariableSet
+
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    z = claripy.BVS('z', 32)
+
+    # ASTs with the same variables share one canonical set
+    nose.tools.assert_is(type(x.variables), _VariableSet)
+    nose.tools.assert_is((x + 1).variables, x.variables)
+    nose.tools.assert_is(((x + 1) * 3)[7:0].variables, x.variables)
+    nose.tools.assert_is((x + y).variables, (y * x).variables)
+    nose.tools.assert_is(claripy.Concat(x, y, z).variables, claripy.Concat(z, x + y).variables)
+    nose.tools.assert_equal(claripy.Concat(x, y, z).variables, { x.args[0], y.args[0], z.args[0] })
+    nose.tools.assert_is(claripy.BVV(1, 32).variables, claripy.true.variables)
+    nose.tools.assert_equal(len(claripy.BVV(1, 32).variables), 0)
+
+    # sets given explicitly and unpickled sets are interned too
+    w = claripy.ast.BV('BVS', (x.args[0], None, None, None, False, False, None), length=32, variables={ x.args[0] }, symbolic=True)
+    nose.tools.assert_is(w.variables, x.variables)
+    nose.tools.assert_is(pickle.loads(pickle.dumps((x + y).variables, 2)), (x + y).variables)
+
+    # and the sets are freed with the ASTs
+    import gc
+    from claripy.ast import base
+    gc.collect()
+    before = len(base._variable_sets)
+    many = [ claripy.BVS('many', 32) for _ in range(2000) ]
+    sums = [ a + x for a in many ]
+    nose.tools.assert_is(sums[0].variables, (x + many[0]).variables)
+    nose.tools.assert_greater_equal(len(base._variable_sets), before + 4000)
+    del many, sums
+    gc.collect()
+    nose.tools.assert_less_equal(len(base._variable_sets), before)
+
+def test_extension():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+
+    # ordinary ASTs have no extension object, and reading the fields does not create one
+    for a in (x, x + y, claripy.BVV(0x13572468, 32), (x + y)[7:0], claripy.If(x > y, x, y)):
+        nose.tools.assert_is_none(a._ext)
+        nose.tools.assert_is_none(a._uc_alloc_depth)
+        nose.tools.assert_is_none(a._burrowed)
+        a._eager_backends = None
+        nose.tools.assert_is_none(a._ext)
+    nose.tools.assert_is(x.uninitialized, False)
+    nose.tools.assert_is_none((x + y).uninitialized)
+    nose.tools.assert_is_none(claripy.simplify(x)._ext)
+
+    # the fields are kept in an extension object once they are set
+    u = claripy.BVS('u', 32, uninitialized=True)
+    nose.tools.assert_is_not_none(u._ext)
+    nose.tools.assert_is(u.uninitialized, True)
+    nose.tools.assert_is((u + 1).uninitialized, True)
+    nose.tools.assert_is_none((u + 1)._uc_alloc_depth)
+
+    e = claripy.If(x > 1, x, y) + 1
+    excavated = e.ite_excavated
+    nose.tools.assert_is_not_none(e._ext)
+    nose.tools.assert_is(e._excavated, excavated)
+    nose.tools.assert_is(e.ite_excavated, excavated)
+
+    # the cache key is only created when it is asked for
+    z = claripy.BVS('z', 32) * 5
+    nose.tools.assert_is_none(z._cache_key_object)
+    nose.tools.assert_is(z.cache_key, z.cache_key)
+    nose.tools.assert_is(z.cache_key.ast, z)
+
+def test_op_wrappers():
+    from claripy import operations
+
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    a = claripy.SimplificationAvoidanceAnnotation()
+
+    # one, two and three arguments, and any number of them, with and without coercion
+    nose.tools.assert_equal((~x).op, '__invert__')
+    nose.tools.assert_equal((x + y).op, '__add__')
+    nose.tools.assert_is(x + 1, x + claripy.BVV(1, 32))
+    nose.tools.assert_is(1 + x, claripy.BVV(1, 32) + x)
+    nose.tools.assert_equal(claripy.Extract(7, 0, x).op, 'Extract')
+    nose.tools.assert_equal(claripy.Concat(x, y, x).length, 96)
+    nose.tools.assert_equal(claripy.And(x == 1, y == 2, x == y).op, 'And')
+    f = claripy.FPS('f', claripy.FSORT_DOUBLE)
+    nose.tools.assert_is(claripy.fpAdd(claripy.fp.RM.default(), f, f), claripy.fpAdd(f, f))
+    nose.tools.assert_raises(claripy.ClaripyTypeError, claripy.Extract, 7, x)
+    nose.tools.assert_raises(TypeError, lambda: x + claripy.true)
+
+    # the annotations of the arguments are kept by all of them
+    xa = x.annotate(a)
+    for e in (~xa, xa + y, y + xa, claripy.Extract(7, 0, xa), claripy.Concat(y, xa, y), xa + 0, xa ^ xa):
+        nose.tools.assert_true(e._annotated)
+        nose.tools.assert_in(a, e._uneliminatable_annotations)
+    nose.tools.assert_is(x + 0, x)
+
+    # simplifiers and preprocessors are looked up when the operation is called
+    calls = [ ]
+    old_simplifier = operations.simplifiers['__add__']
+    old_preprocessor = operations.preprocessors['union']
+    def simplifier(*args):
+        calls.append('simplify')
+        return old_simplifier(*args)
+    def preprocessor(*args, **kwargs):
+        calls.append('preprocess')
+        return old_preprocessor(*args, **kwargs)
+    try:
+        operations.simplifiers['__add__'] = simplifier
+        operations.preprocessors['union'] = preprocessor
+        x + y
+        x.union(y)
+        nose.tools.assert_equal(calls, [ 'simplify', 'preprocess' ])
+    finally:
+        operations.simplifiers['__add__'] = old_simplifier
+        operations.preprocessors['union'] = old_preprocessor
+
+def test_deep():
+    # deeper than the default recursion limit
+    x = claripy.BVS('x', 32)
+    e = claripy.BVV(0, 32)
+    for i in range(1, 1200):
+        e = claripy.If(x == i, claripy.BVV(i, 32), e)
+
+    nose.tools.assert_equal(e.depth, 1201)
+    nose.tools.assert_equal(set(a.op for a in e.recursive_leaf_asts), { 'BVS', 'BVV' })
+
+    r = e.replace(x, claripy.BVV(9, 32))
+    nose.tools.assert_equal(claripy.backends.concrete.convert(r).value, 9)
+
+    z = claripy.backends.z3.convert(e)
+    nose.tools.assert_equal(claripy.backends.z3._abstract(z).variables, e.variables)
+
+    s = claripy.Solver()
+    s.add(e == 7)
+    nose.tools.assert_equal(s.eval(x, 2), (7,))
+
+def test_threaded_hash_consing():
+    import threading
+
+    variables = [ claripy.BVS('v%d' % i, 32) for i in range(16) ]
+    results = [ ]
+    def build():
+        results.append([ claripy.Concat(variables[i % 16], variables[(i * 7) % 16] + i) for i in range(500) ])
+
+    threads = [ threading.Thread(target=build) for _ in range(4) ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for r in results[1:]:
+        nose.tools.assert_true(all(a is b for a, b in zip(results[0], r)))
+
+def test_arena():
+    hash_cache = claripy.ast.base.Base._hash_cache
+    x = claripy.BVS('x', 32)
+
+    with claripy.ast_arena() as arena:
+        y = x + 0x1234567
+        x + 0 # already exists, so it isn't tracked
+        claripy.backends.z3.convert(y)
+
+    nose.tools.assert_equal(len(arena), 2) # the constant and the addition
+    nose.tools.assert_is(hash_cache.get(y._hash), y)
+    nose.tools.assert_in(y.cache_key, claripy.backends.z3._object_cache)
+
+    nose.tools.assert_equal(arena.release(), 2)
+    nose.tools.assert_equal(len(arena), 0)
+    nose.tools.assert_is(hash_cache.get(y._hash), None)
+    nose.tools.assert_not_in(y.cache_key, claripy.backends.z3._object_cache)
+    nose.tools.assert_is(hash_cache.get(x._hash), x)
+
+def test_errored():
+    bc = claripy.backends.concrete
+    x = claripy.BVS('x', 32)
+    e = x + claripy.BVS('y', 32)
+    nose.tools.assert_is(e._errored, claripy.BVV(0x4321, 32)._errored)
+
+    nose.tools.assert_raises(claripy.BackendError, bc.convert, e)
+    nose.tools.assert_in(bc, e._errored)
+    nose.tools.assert_in(bc, x._errored)
+    nose.tools.assert_in(bc, (e * 3)._errored)
+    nose.tools.assert_raises(claripy.BackendError, bc.convert, e)
+    claripy.backends.z3.convert(e)
+    nose.tools.assert_not_in(claripy.backends.z3, e._errored)
+
 if __name__ == '__main__':
+    test_errored()
+    test_arena()
+    test_threaded_hash_consing()
+    test_deep()
+    test_fingerprint()
+    test_hash()
+    test_variable_sets()
+    test_extension()
+    test_op_wrappers()
     test_multiarg()
     test_depth()
+    test_size_metrics()
     test_rename()
     test_canonical()
     test_depth_repr()
@@ -509,6 +866,9 @@ if __name__ == '__main__':
     for func, param in test_ite():
         func(param)
     test_if_stuff()
+    test_deep_ite()
+    test_ite_pass_memo()
+    test_deep_ast()
     test_signed_concrete()
     test_signed_symbolic()
     test_arith_shift()
@@ -75,7 +75,95 @@ def test_branching_replacement_solver():
     #assert s1a.satisfiable()
     #assert not s1b.satisfiable()
 
+def test_replace_many():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    z = claripy.BVS('z', 32)
+    shared = (x + 1) * y
+    asts = [ shared + z, shared - 2, z * 3, 5, shared + z ]
+
+    replacements = { x.cache_key: claripy.BVV(4, 32) }
+    r = claripy.replace_many(asts, replacements)
+    assert len(r) == len(asts)
+    for a, b in zip(asts, r):
+        if isinstance(a, claripy.ast.Base):
+            assert b is a.replace_dict({ x.cache_key: claripy.BVV(4, 32) })
+        else:
+            assert b == a
+    # the ASTs without x are left alone, and the replaced ones are memoized in the dict
+    assert r[2] is asts[2]
+    assert r[0] is r[4]
+    assert replacements[shared.cache_key] is (claripy.BVV(5, 32) * y)
+
+    # replacing concrete ASTs can not prune anything
+    r = claripy.replace_many([ x + 1, y * 1 + 1 ], { claripy.BVV(1, 32).cache_key: claripy.BVV(2, 32) })
+    assert r[0] is x + 2
+    assert r[1] is (y * 2) + 2
+
+def test_model_cache_eval_constraints():
+    from claripy.frontend_mixins.model_cache_mixin import ModelCache
+
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    mc = ModelCache({ x.args[0]: 0, y.args[0]: 2 })
+    assert mc.eval_constraints([ x + 1 == 1, y + 3 == 5 ])
+
+    # the constraints after the first one that fails are not even replaced
+    mc = ModelCache({ x.args[0]: 0, y.args[0]: 2 })
+    assert not mc.eval_constraints([ x == 1, y + 3 == 5 ])
+    assert x.cache_key in mc.replacements
+    assert y.cache_key not in mc.replacements
+
+def test_occurrence_index():
+    addr = claripy.BVS('addr', 64)
+    values = [ claripy.BVS('v_%d' % i, 8) for i in range(8) ]
+    mem = claripy.Concat(*[ claripy.If(addr == i, v, claripy.BVV(0, 8)) for i, v in enumerate(values) ])
+
+    index = claripy.ast.occurrences.OccurrenceIndex(mem)
+    assert values[3] in index
+    assert index.leaves(next(iter(addr.variables))) == (addr,)
+    ancestors = index.ancestors(values[3])
+    assert ancestors[0] is values[3] and ancestors[-1] is mem and len(ancestors) == 3
+
+    # substitutions through the index give the same ASTs as the walk
+    for v in values:
+        expected = mem._replace({ v.cache_key: claripy.BVV(0x41, 8) }, variable_set=v.variables)
+        assert index.replace(v, claripy.BVV(0x41, 8)) is expected
+        assert mem.replace(v, claripy.BVV(0x41, 8)) is expected
+    assert claripy.ast.occurrences.cached_occurrence_index(mem) is not None
+    assert index.replace(claripy.BVS('unrelated', 8), values[0]) is mem
+
+    # the cached index goes away with its AST
+    import gc
+    import weakref
+    other = claripy.Concat(*[ claripy.If(addr == i, v, claripy.BVV(1, 8)) for i, v in enumerate(values) ])
+    other.replace(values[0], values[1])
+    other.replace(values[0], values[1])
+    assert claripy.ast.occurrences.cached_occurrence_index(other).root is other
+    ref = weakref.ref(other)
+    del other
+    gc.collect()
+    assert ref() is None
+
+    # and only a few indexes are kept
+    claripy.ast.occurrences.set_occurrence_index_cache_size(2)
+    try:
+        mems = [ mem + i for i in range(4) ]
+        for m in mems:
+            claripy.ast.occurrences.occurrence_index(m)
+        assert [ m._occurrence_index is not None for m in mems ] == [ False, False, True, True ]
+    finally:
+        claripy.ast.occurrences.set_occurrence_index_cache_size(64)
+
+    # replacing the address rebuilds every If
+    r = index.replace(addr, claripy.BVV(2, 64))
+    assert r is mem._replace({ addr.cache_key: claripy.BVV(2, 64) }, variable_set=addr.variables)
+    assert all(a.args[0].is_true() == (i == 2) for i, a in enumerate(r.args))
+
 if __name__ == '__main__':
+    test_occurrence_index()
+    test_model_cache_eval_constraints()
+    test_replace_many()
     test_branching_replacement_solver()
     test_replacement_solver()
     test_contradiction()
@@ -2,6 +2,7 @@ import claripy
 import ana
 import nose
 import pickle
+import shutil
 import tempfile
 
 import logging
@@ -81,7 +82,175 @@ def test_datalayer():
     nose.tools.assert_equal(old_constraint_sets, new_constraint_sets)
     nose.tools.assert_equal(str(s.variables), str(ss.variables))
 
+def test_persistent_store():
+    from claripy.ast import serialization
+
+    store_dir = tempfile.mkdtemp()
+    z3 = claripy.backends.z3
+    old_size = z3.simplification_cache_stats()['max_size']
+    try:
+        store = claripy.persistent_store.enable(store_dir, max_entries=10)
+        z3.set_simplification_cache_size(0)
+
+        x = claripy.BVS('store_x', 32)
+        y = claripy.BVS('store_y', 32)
+        e = claripy.If(x > 3, (x + y) * 3 - y * 3, x & 0xff)
+        simplified = z3.simplify(e)
+        nose.tools.assert_equal(store.stats()['misses'], 1)
+
+        # the stored simplification is rebuilt into the very same (hash-consed) AST
+        nose.tools.assert_is(z3.simplify(e), simplified)
+        nose.tools.assert_equal(store.stats()['hits'], 1)
+        nose.tools.assert_is(store.get_simplification(e), simplified)
+
+        # a reopened store still has it
+        claripy.persistent_store.disable()
+        store = claripy.persistent_store.enable(store_dir, max_entries=10)
+        nose.tools.assert_is(store.get_simplification(e), simplified)
+
+        # satisfiability checks do not depend on the order of the constraints
+        s = claripy.Solver()
+        s.add(x == 1)
+        s.add(y == x + 1)
+        nose.tools.assert_false(s.satisfiable(extra_constraints=(y == 1,)))
+        nose.tools.assert_false(store.get_satisfiable('BackendZ3', (y == 1, y == x + 1, x == 1)))
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', (y == x + 1, x == 1)) is None)
+
+        # and another solver with the same constraints gets its answer from the store
+        hits = store.stats()['hits']
+        s = claripy.Solver()
+        s.add(y == x + 1)
+        s.add(x == 1)
+        nose.tools.assert_false(s.satisfiable(extra_constraints=(y == 1,)))
+        nose.tools.assert_equal(store.stats()['hits'], hits + 1)
+
+        # checks that time out are reported as unsatisfiable, but they are not stored
+        w = claripy.BVS('store_w', 64)
+        hard = (w * w * w + w * 7 == 123457 ** 3 + 7 * 123457, claripy.UGT(w, 3))
+        s = claripy.Solver(timeout=1)
+        s.add(hard)
+        if not s.satisfiable():
+            nose.tools.assert_true(store.get_satisfiable('BackendZ3', hard) is None)
+        s = claripy.Solver()
+        s.add(hard)
+        nose.tools.assert_true(s.satisfiable())
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', hard))
+
+        # the least recently used results are evicted
+        for i in range(20):
+            store.put_satisfiable('BackendZ3', (x == i,), True)
+        nose.tools.assert_less_equal(len(store), 10)
+        nose.tools.assert_greater(store.stats()['evictions'], 0)
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', (x == 0,)) is None)
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', (x == 19,)))
+
+        # ASTs that can't be fingerprinted are not stored
+        odd = claripy.ast.BV('BVS', ('odd', object()), length=32)
+        store.put_simplification(odd, x)
+        nose.tools.assert_true(store.get_simplification(odd) is None)
+        store.put_satisfiable('BackendZ3', (odd == 1,), True)
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', (odd == 1,)) is None)
+
+        # nor are results that can only be written by pickling them
+        annotated = x.annotate(claripy.SimplificationAvoidanceAnnotation())
+        store.put_simplification(x + 3, annotated)
+        nose.tools.assert_true(store.get_simplification(x + 3) is None)
+
+        # nothing that is read from the database is unpickled
+        import pickle
+        store._put('simplify', (x + 4).fingerprint, pickle.dumps([ x ], 2))
+        store._put('satisfiable', store._constraints_key('BackendZ3', (x == 4,)), pickle.dumps(True, 2))
+        nose.tools.assert_true(store.get_simplification(x + 4) is None)
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', (x == 4,)) is None)
+
+        # nor are corrupt rows
+        store._put('simplify', (x + 5).fingerprint, serialization.dumps([ x + 1 ], allow_pickle=False)[:-3] + b'\xff')
+        nose.tools.assert_true(store.get_simplification(x + 5) is None)
+
+        # variable names can be a mix of strings and bytes
+        mixed = claripy.ast.BV('__add__', (x, y), length=32, variables=frozenset([ 'store_x', b'store_y' ]))
+        store.put_simplification(x + 6, mixed)
+        nose.tools.assert_is(store.get_simplification(x + 6), mixed)
+        nose.tools.assert_equal(serialization.dumps([ mixed ]), serialization.dumps([ mixed ]))
+
+        # reads don't write to the database until the times they were used at are written
+        key = store._constraints_key('BackendZ3', (x == 19,))
+        last_used = lambda: store._db.execute('SELECT last_used FROM results WHERE key=?', (key,)).fetchone()[0]
+        before = last_used()
+        nose.tools.assert_true(store.get_satisfiable('BackendZ3', (x == 19,)))
+        nose.tools.assert_equal(last_used(), before)
+        store._write_used()
+        nose.tools.assert_greater(last_used(), before)
+    finally:
+        claripy.persistent_store.disable()
+        z3.set_simplification_cache_size(old_size)
+        shutil.rmtree(store_dir)
+
+def test_dag_serialization():
+    from claripy.ast import serialization
+
+    x = claripy.BVS('dag_x', 32)
+    y = claripy.BVS('dag_y', 32)
+    shared = claripy.If(x > 3, x + y, claripy.BVV(-7, 32))
+    f = claripy.FPS('dag_f', claripy.FSORT_FLOAT)
+    roots = [
+        shared * 2,
+        (shared - y).annotate(claripy.SimplificationAvoidanceAnnotation()),
+        claripy.And(shared == 1, claripy.fpToFP(claripy.fp.RM_RNE, f, claripy.FSORT_DOUBLE) > 1.5),
+        shared,
+    ]
+
+    # the ASTs are rebuilt into the very same (hash-consed) ASTs
+    data = serialization.dumps(roots)
+    loaded = serialization.loads(data)
+    nose.tools.assert_equal(len(loaded), len(roots))
+    for a, b in zip(loaded, roots):
+        nose.tools.assert_equal(a.fingerprint, b.fingerprint)
+    nose.tools.assert_is(loaded[0], roots[0])
+    nose.tools.assert_is(loaded[2], roots[2])
+    nose.tools.assert_is(loaded[3], shared)
+
+    # except for the annotated ones, since annotations are compared by identity
+    nose.tools.assert_is(loaded[1].args[0], roots[1].args[0])
+    nose.tools.assert_is_instance(loaded[1].annotations[0], claripy.SimplificationAvoidanceAnnotation)
+
+    # the ASTs that were already written are only referred to
+    w = serialization.ASTWriter()
+    w.write(roots[0])
+    size = len(w)
+    nose.tools.assert_equal(w.write(shared), w.write(shared))
+    nose.tools.assert_less(len(w) - size, 8)
+    nose.tools.assert_less(len(data), len(pickle.dumps(roots, -1)))
+
+    # streams can be read incrementally
+    r = serialization.ASTReader(w.getvalue())
+    nose.tools.assert_is(r.read(), roots[0])
+    nose.tools.assert_is(r.read(), shared)
+    nose.tools.assert_is(r.read(), shared)
+    nose.tools.assert_is(r.read(), None)
+
+    nose.tools.assert_raises(claripy.ClaripySerializationError, serialization.loads, b'not an AST')
+    nose.tools.assert_raises(claripy.ClaripySerializationError, serialization.loads, data[:len(data) // 2])
+
+    # without pickles, the annotated AST can't be written or read, but the others still round-trip
+    nose.tools.assert_raises(claripy.ClaripySerializationError, serialization.dumps, roots, allow_pickle=False)
+    nose.tools.assert_raises(claripy.ClaripySerializationError, serialization.loads, data, allow_pickle=False)
+    plain = roots[:1] + roots[2:]
+    for a, b in zip(serialization.loads(serialization.dumps(plain, allow_pickle=False), allow_pickle=False), plain):
+        nose.tools.assert_is(a, b)
+
+    # corrupt data only ever fails with a ClaripySerializationError
+    plain_data = serialization.dumps(plain, allow_pickle=False)
+    for i in range(len(plain_data)):
+        for b in (0x00, 0x01, 0x07, 0x7f, 0x80, 0xff, plain_data[i] ^ 0x10):
+            try:
+                serialization.loads(plain_data[:i] + bytes(bytearray([ b ])) + plain_data[i+1:], allow_pickle=False)
+            except claripy.ClaripySerializationError:
+                pass
+
 if __name__ == '__main__':
+    test_dag_serialization()
+    test_persistent_store()
     test_pickle_ast()
     test_pickle_frontend()
     test_datalayer()
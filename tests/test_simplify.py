@@ -44,6 +44,177 @@ def test_simplification():
     assert_correct(x/y, claripy.backends.z3.simplify(x/y))
     assert_correct(x%y, claripy.backends.z3.simplify(x%y))
 
+def test_native_simplification():
+    def assert_native(a, b):
+        nose.tools.assert_is(claripy.simplify(a, full=False), b)
+
+    x, y = (claripy.BVS(name, 32) for name in ('x', 'y'))
+    a, b = (claripy.BoolS(name) for name in ('a', 'b'))
+    zero = claripy.BVV(0, 32)
+    ones = claripy.BVV(0xffffffff, 32)
+
+    # concrete operands are merged, identities dropped and absorbing elements taken
+    assert_native(claripy.ast.BV('__add__', (x, claripy.BVV(1, 32), y, claripy.BVV(-1, 32)), length=32), x + y)
+    assert_native(claripy.ast.BV('__mul__', (x, claripy.BVV(3, 32), zero), length=32), zero)
+    assert_native(claripy.ast.BV('__and__', (x, ones, y), length=32), x & y)
+    assert_native(claripy.ast.BV('__or__', (x, ones), length=32), ones)
+    assert_native(x & ~x, zero)
+    assert_native(x ^ ~x, ones)
+    assert_native(~~x, x)
+    assert_native(x << 32, zero)
+    assert_native(claripy.LShR(x, 40), zero)
+    assert_native(x / 1, x)
+    assert_native(x % 1, zero)
+    assert_native(claripy.ZeroExt(8, claripy.ZeroExt(8, x)), claripy.ZeroExt(16, x))
+
+    # comparisons
+    assert_native(claripy.ULE(x, x), claripy.true)
+    assert_native(claripy.SLT(x, x), claripy.false)
+    assert_native(claripy.ULT(x, 0), claripy.false)
+    assert_native(claripy.UGE(ones, x), claripy.true)
+
+    # booleans and if-then-else
+    assert_native(claripy.And(a, b, claripy.Not(a)), claripy.false)
+    assert_native(claripy.Or(b, claripy.Not(a), a), claripy.true)
+    assert_native(claripy.If(a, claripy.true, claripy.false), a)
+    assert_native(claripy.If(claripy.Not(a), x, y), claripy.If(a, y, x))
+    assert_native(claripy.If(a, claripy.If(a, x, y), zero), claripy.If(a, x, zero))
+
+    # the rules apply everywhere in the DAG, and the rewritten arguments are simplified with the rules of their parent
+    nested = claripy.Concat(claripy.If(a, ~~x, x), x & ~x)
+    assert_native(nested, claripy.Concat(x, zero))
+    assert_native((y + (x & ~x)) * 1, y)
+    z = claripy.BVS('z', 32)
+    assert_native(x + y + z, x + y + z)
+
+    # what the rules cannot simplify is left to z3
+    s = claripy.simplify(claripy.And(a, b) == claripy.And(b, a))
+    nose.tools.assert_is(s, claripy.true)
+
+def test_full_simplification_skips_native_rules():
+    from claripy.simplifications import simpleton
+
+    calls = [ ]
+    old_simplify = simpleton.simplify
+    def simplify(e):
+        calls.append(e)
+        return old_simplify(e)
+
+    x = claripy.BVS('x', 32)
+    e = (x & ~x) + (x + 1) * 1
+    try:
+        simpleton.simplify = simplify
+        # the default (full) simplification costs one z3 round trip, and nothing on top of it
+        s = claripy.simplify(e)
+        nose.tools.assert_equal(calls, [ ])
+        nose.tools.assert_false(claripy.Solver().satisfiable(extra_constraints=(s != x + 1,)))
+        claripy.simplify(e, full=False)
+        nose.tools.assert_equal(calls, [ e ])
+    finally:
+        simpleton.simplify = old_simplify
+
+def test_full_simplification_without_backend():
+    from claripy.ast.base import Base
+
+    x = claripy.BVS('x', 32)
+    e = (x & ~x) + (x + 1) * 1
+    old_first_backend = Base._first_backend
+    try:
+        # with no backend able to simplify, only the native rules run, and the result must not pass as fully simplified
+        Base._first_backend = lambda self, what: None
+        s = claripy.simplify(e)
+        nose.tools.assert_equal(s._simplified, Base.LITE_SIMPLIFY)
+    finally:
+        Base._first_backend = old_first_backend
+
+    # so a later full simplification still does the work
+    nose.tools.assert_equal(claripy.simplify(s)._simplified, Base.FULL_SIMPLIFY)
+
+def test_simplification_cache():
+    z3 = claripy.backends.z3
+    old_size = z3.simplification_cache_stats()['max_size']
+    try:
+        z3.set_simplification_cache_size(2)
+        z3._simplification_cache.clear()
+        z3._simplification_cache.reset_stats()
+
+        x = claripy.BVS('cache_x', 32)
+        exprs = [ (x + i) * 3 - (x + i) * 2 for i in range(3) ]
+        simplified = [ z3.simplify(e) for e in exprs ]
+        stats = z3.simplification_cache_stats()
+        nose.tools.assert_equal((stats['size'], stats['misses'], stats['hits'], stats['evictions']), (2, 3, 0, 1))
+
+        # the recently used results come out of the cache
+        nose.tools.assert_is(z3.simplify(exprs[2]), simplified[2])
+        nose.tools.assert_equal(z3.simplification_cache_stats()['hits'], 1)
+
+        # the least recently used one was evicted, and simplifying it again evicts the next one
+        nose.tools.assert_is(z3.simplify(exprs[0]), simplified[0])
+        stats = z3.simplification_cache_stats()
+        nose.tools.assert_equal((stats['misses'], stats['evictions']), (4, 2))
+        nose.tools.assert_not_in(exprs[1]._hash, z3._simplification_cache)
+
+        # evicting an AST drops its simplification, and size 0 disables the cache
+        claripy.backends.evict([ exprs[0] ])
+        nose.tools.assert_not_in(exprs[0]._hash, z3._simplification_cache)
+        z3.set_simplification_cache_size(0)
+        nose.tools.assert_equal(z3.cache_sizes()['simplification_cache'], 0)
+        z3.simplify(exprs[1])
+        nose.tools.assert_equal(z3.cache_sizes()['simplification_cache'], 0)
+
+        # the cache does not keep the ASTs alive
+        import gc
+        import weakref
+        z3.set_simplification_cache_size(2)
+        e = (x + 5) * 3 - (x + 5) * 2
+        h = e._hash
+        r = weakref.ref(z3.simplify(e))
+        nose.tools.assert_is(z3._simplification_cache.get(h), r())
+        del e
+        gc.collect()
+        nose.tools.assert_is_none(r())
+        nose.tools.assert_is_none(z3._simplification_cache.get(h))
+        nose.tools.assert_equal(z3._simplification_cache.items(), [ ])
+    finally:
+        z3.set_simplification_cache_size(old_size)
+
+def test_abstraction_cache():
+    import gc
+    z3 = claripy.backends.z3
+
+    x = claripy.BVS('abstract_x', 32)
+    y = claripy.BVS('abstract_y', 32)
+    e = claripy.If(x > 3, (x + y) * 3 - y * 3, x & 0xff)
+    raw = z3.convert(e) * 2
+    root_id = raw.get_id()
+    a = z3._abstract(raw)
+    nose.tools.assert_equal(a.variables, e.variables)
+
+    # the abstractions are cached by the ids of the z3 ASTs, which are pinned
+    nose.tools.assert_is(z3._ast_cache[root_id], a)
+    del raw
+    gc.collect()
+    nose.tools.assert_is(z3._ast_cache[root_id], a)
+    nose.tools.assert_equal(z3.convert(a).get_id(), root_id)
+    nose.tools.assert_is(z3._abstract(z3.convert(a)), a)
+
+    # several expressions are abstracted together
+    b, c, t = z3._abstract_list([ z3.convert(a + 1), z3.convert(a - y), z3.convert(x == y) ])
+    nose.tools.assert_is(b.args[0], a)
+    nose.tools.assert_is(c.args[0], a)
+    nose.tools.assert_is_instance(t, claripy.ast.Bool)
+
+    # and the z3 ASTs are released with their abstractions
+    pins = z3.cache_sizes()['ast_pins']
+    del a, b, c
+    gc.collect()
+    nose.tools.assert_less(z3.cache_sizes()['ast_pins'], pins)
+
 if __name__ == '__main__':
+    test_abstraction_cache()
+    test_simplification_cache()
+    test_native_simplification()
+    test_full_simplification_skips_native_rules()
+    test_full_simplification_without_backend()
     test_simplification()
     test_bool_simplification()
@@ -1,3 +1,4 @@
+import gc
 import claripy
 import nose
 
@@ -411,6 +412,36 @@ def test_simplification_annotations():
     s.simplify()
     assert len(s.constraints) == 2
 
+def test_full_simplification_limit():
+    z3 = claripy.backends.z3
+    x = claripy.BVS("x", 32)
+
+    def z3_simplifications():
+        stats = z3.simplification_cache_stats()
+        return stats['hits'] + stats['misses']
+
+    # there is no limit by default, and the DAG size isn't computed then
+    s = claripy.Solver()
+    assert s.full_simplification_limit is None
+    s.add(x * 3 > 10)
+    s.add(x * 2 - x > 11)
+    conjunction = claripy.And(*s.constraints)
+    before = z3_simplifications()
+    s.simplify()
+    assert z3_simplifications() > before
+    assert conjunction._dag_size is None
+
+    # over the limit, only the native rules run
+    s = claripy.Solver()
+    s.full_simplification_limit = 4
+    s.add(x * 3 > 10)
+    s.add(x * 2 - x > 11)
+    before = z3_simplifications()
+    s.simplify()
+    assert z3_simplifications() == before
+    assert len(s.constraints) == 2
+    assert s.satisfiable()
+
 def raw_ancestor_merge(solver):
     s = solver()
     x = claripy.BVS("x", 32)
@@ -487,14 +518,241 @@ def test_zero_division_in_cache_mixin():
     s = claripy.Solver()
     assert s.min(a/b) == 0
 
+def test_extra_constraints_as_assumptions():
+    z3 = claripy.backends.z3
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+
+    def queries(solver):
+        return (
+            z3.satisfiable(extra_constraints=(x == 3,), solver=solver),
+            z3.satisfiable(extra_constraints=(x == 3, y == 5), solver=solver),
+            sorted(z3.eval(x, 5, extra_constraints=(y == 5,), solver=solver)),
+            z3.min(x, extra_constraints=(x > 3,), solver=solver),
+            z3.max(x, extra_constraints=(x < 200, x != 199), solver=solver),
+            sorted(z3.eval(x, 5, extra_constraints=(y == 5,), solver=solver)),
+        )
+
+    def solver():
+        s = z3.solver()
+        z3.add(s, [ x + y == 10, claripy.ULT(x, 20) ])
+        return s
+
+    expected = queries(solver())
+    assert expected == (True, False, [ 5 ], 4, 19, [ 5 ])
+
+    max_literals = z3.max_assumption_literals
+    try:
+        z3.set_extra_constraints_as_assumptions(True)
+        s = solver()
+        assert queries(s) == expected
+
+        # the literals of the extra constraints are reused, and the solver is not left pushed
+        assert len(z3._assumption_literals[s]) == 5
+        assert queries(s) == expected
+        assert len(z3._assumption_literals[s]) == 5
+        assert s.num_scopes() == 0
+
+        # so repeated queries, including the ones that exclude the solutions they found, don't grow the solver
+        assertions = len(s.assertions())
+        for _ in range(20):
+            assert queries(s) == expected
+            sorted(z3.eval(y, 3, extra_constraints=(x != 4,), solver=s))
+        nose.tools.assert_equal(len(s.assertions()), assertions + 1)
+        sorted(z3.eval(y, 3, extra_constraints=(x != 4,), solver=s))
+        nose.tools.assert_equal(len(s.assertions()), assertions + 1)
+
+        # past the limit, new extra constraints are pushed and popped instead
+        z3.max_assumption_literals = 6
+        nose.tools.assert_equal(z3.min(x, extra_constraints=(x > 5,), solver=s), 6)
+        nose.tools.assert_equal(len(s.assertions()), assertions + 1)
+        assert s.num_scopes() == 0
+        assert queries(s) == expected
+        nose.tools.assert_equal(len(s.assertions()), assertions + 1)
+
+        # and they do not show up in models
+        models = [ ]
+        z3.satisfiable(extra_constraints=(x == 3,), solver=s, model_callback=models.append)
+        assert set(models[0]) == { x.args[0], y.args[0] }
+    finally:
+        z3.set_extra_constraints_as_assumptions(False)
+        z3.max_assumption_literals = max_literals
+
+def test_min_max_strategies():
+    z3 = claripy.backends.z3
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+
+    s = z3.solver()
+    z3.add(s, [ z3.convert(x * 3 + y == 1000), z3.convert(claripy.ULT(y, 77)) ])
+    extra = (claripy.SGT(x, 5), x != 308)
+
+    for strategy in z3.MIN_MAX_STRATEGIES:
+        results = [ ]
+        results.append(z3.min(x, solver=s, strategy=strategy))
+        results.append(z3.max(x, solver=s, strategy=strategy))
+        results.append(z3.min(x, solver=s, strategy=strategy, signed=True))
+        results.append(z3.max(x, solver=s, strategy=strategy, signed=True))
+        results.append(z3.min(x, extra_constraints=extra, solver=s, strategy=strategy, signed=True))
+        assert results == [ 308, 2863311864, -1431655457, 1431656098, 309 ], (strategy, results)
+        assert s.num_scopes() == 0
+
+    nose.tools.assert_raises(claripy.BackendError, z3.min, x, solver=s, strategy='guess')
+
+def test_bounds():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    constraints = [ x * 3 + y == 1000, claripy.ULT(y, 77) ]
+    exprs = [ x, y, x + y, claripy.BVV(7, 32) ]
+    expected = [ (308, 2863311864), (0, 76), (334, 2863311914), (7, 7) ]
+
+    for solver_type in (claripy.Solver, claripy.SolverCacheless, claripy.SolverComposite, claripy.SolverHybrid):
+        s = solver_type()
+        s.add(constraints)
+        nose.tools.assert_equal(s.bounds(exprs), expected)
+        nose.tools.assert_equal(
+            s.bounds(exprs, signed=True),
+            [ (-1431655457, 1431656098), (0, 76), (-1431655432, 1431656148), (7, 7) ]
+        )
+        nose.tools.assert_equal(s.bounds([ x ], extra_constraints=(claripy.SGT(x, 5), x != 308)), [ (309, 1431656098) ])
+        nose.tools.assert_equal(s.bounds([ ]), [ ])
+
+    # the bounds are looked up in the cached models once they are known
+    s = claripy.Solver()
+    s.add(constraints)
+    s.bounds(exprs)
+    count = claripy._backends_module.backend_z3.solve_count
+    nose.tools.assert_equal(s.bounds(exprs), expected)
+    nose.tools.assert_equal(claripy._backends_module.backend_z3.solve_count, count)
+
+    z3 = claripy.backends.z3
+    s = z3.solver()
+    z3.add(s, [ z3.convert(c) for c in constraints ])
+    nose.tools.assert_equal(z3.bounds(exprs, solver=s), expected)
+    assert s.num_scopes() == 0
+    nose.tools.assert_raises(claripy.UnsatError, z3.bounds, exprs, extra_constraints=(y == 100,), solver=s)
+    assert s.num_scopes() == 0
+
+def test_iter_eval():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    constraints = [ x + y == 10, claripy.ULT(x, 5) ]
+
+    for solver_type in (claripy.Solver, claripy.SolverCacheless, claripy.SolverComposite, claripy.SolverHybrid):
+        s = solver_type()
+        s.add(constraints)
+        nose.tools.assert_equal(sorted(s.iter_eval(x)), [ 0, 1, 2, 3, 4 ])
+        nose.tools.assert_equal(sorted(s.iter_eval(y, extra_constraints=(x != 0,))), [ 6, 7, 8, 9 ])
+        nose.tools.assert_equal(list(s.iter_eval(x, extra_constraints=(x == 7,))), [ ])
+        nose.tools.assert_equal(list(s.iter_eval(claripy.BVV(3, 32))), [ 3 ])
+
+        # stopping early leaves nothing behind
+        it = s.iter_eval(y, extra_constraints=(claripy.UGT(y, 7),))
+        first = next(it)
+        it.close()
+        assert first in (8, 9, 10)
+        nose.tools.assert_equal(sorted(s.eval(y, 10)), [ 6, 7, 8, 9, 10 ])
+
+    # the models that were found are cached
+    s = claripy.Solver()
+    s.add(constraints)
+    sorted(s.iter_eval(x))
+    count = claripy._backends_module.backend_z3.solve_count
+    nose.tools.assert_equal(sorted(s.eval(x, 10)), [ 0, 1, 2, 3, 4 ])
+    nose.tools.assert_equal(claripy._backends_module.backend_z3.solve_count, count)
+
+    z3 = claripy.backends.z3
+    s = z3.solver()
+    z3.add(s, [ z3.convert(c) for c in constraints ])
+    assertions = len(s.assertions())
+    it = z3.iter_eval(x, extra_constraints=(x != 2,), solver=s)
+    next(it)
+    it.close()
+    assert s.num_scopes() == 0
+    nose.tools.assert_equal(len(s.assertions()), assertions)
+    nose.tools.assert_equal(sorted(z3.eval(x, 10, solver=s)), [ 0, 1, 2, 3, 4 ])
+
+    # nothing is added to the solver while the solutions are generated, so other queries can come in between
+    it = z3.iter_eval(x, solver=s)
+    found = [ next(it), next(it) ]
+    nose.tools.assert_equal(len(s.assertions()), assertions)
+    nose.tools.assert_equal(sorted(z3.eval(x, 10, solver=s)), [ 0, 1, 2, 3, 4 ])
+    nose.tools.assert_equal(sorted(found + list(it)), [ 0, 1, 2, 3, 4 ])
+    nose.tools.assert_equal(len(s.assertions()), assertions)
+
+def test_composite_iter_eval_reabsorb():
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+
+    # a generator that is dropped after the solver changed does not bring back its outdated models
+    s = claripy.SolverComposite()
+    s.add([ claripy.ULT(x, 5), claripy.ULT(y, 5) ])
+    it = s.iter_eval(x + y)
+    for _ in range(4):
+        next(it)
+    s.add(x == 1)
+    del it
+    gc.collect()
+    nose.tools.assert_equal(s.eval(x, 10), (1,))
+
+    # nor does one that is exhausted after that
+    s = claripy.SolverComposite()
+    s.add([ claripy.ULT(x, 5), claripy.ULT(y, 5) ])
+    it = s.iter_eval(x + y)
+    next(it)
+    s.add(x == 2)
+    list(it)
+    nose.tools.assert_equal(s.eval(x, 10), (2,))
+
+    # but the models of a generator that ran to the end on an unchanged solver are kept
+    s = claripy.SolverComposite()
+    s.add([ claripy.ULT(x, 5), claripy.ULT(y, 5) ])
+    nose.tools.assert_equal(sorted(s.iter_eval(x + y)), list(range(9)))
+    nose.tools.assert_greater(len(s._solvers[x.args[0]]._models), 1)
+
+def test_hybrid_iter_eval_fallback():
+    x = claripy.BVS('x', 32)
+
+    def failing(after):
+        def iter_eval(e, extra_constraints=()): #pylint:disable=unused-argument
+            for v in after:
+                yield v
+            raise claripy.ClaripyFrontendError("no more")
+        return iter_eval
+
+    # the exact frontend is fallen back to when the approximate one fails before finding anything
+    s = claripy.SolverHybrid()
+    s.add(claripy.ULT(x, 3))
+    s._approximate_frontend.iter_eval = failing([ ])
+    nose.tools.assert_equal(sorted(s.iter_eval(x, exact=False)), [ 0, 1, 2 ])
+
+    # but not after that, since it would find the same solutions again
+    s._approximate_frontend.iter_eval = failing([ 1 ])
+    found = [ ]
+    try:
+        for v in s.iter_eval(x, exact=False):
+            found.append(v)
+    except claripy.ClaripyFrontendError:
+        pass
+    else:
+        assert False, "the error of the approximate frontend was swallowed"
+    nose.tools.assert_equal(found, [ 1 ])
+
 if __name__ == '__main__':
 
+    test_iter_eval()
+    test_composite_iter_eval_reabsorb()
+    test_hybrid_iter_eval_fallback()
+    test_bounds()
+    test_min_max_strategies()
+    test_extra_constraints_as_assumptions()
     for func, param in test_unsat_core():
         func(param)
 
     for func,param in test_ancestor_merge():
         func(param)
     test_simplification_annotations()
+    test_full_simplification_limit()
     test_model()
     test_composite_discrepancy()
     for func, param in test_solver():
@@ -0,0 +1,45 @@
+import claripy
+import nose
+
+def test_memory_census():
+    claripy.stats.memory_census(reset_counters=True)
+
+    x = claripy.BVS('x', 32)
+    y = claripy.BVS('y', 32)
+    e = (x + y) * x
+    e2 = (x + y) * x
+    claripy.backends.z3.convert(e == 3)
+
+    census = claripy.stats.memory_census()
+    nose.tools.assert_greater_equal(census['asts'], 5)
+    nose.tools.assert_greater_equal(census['by_op']['BVS'], 2)
+    nose.tools.assert_greater_equal(census['by_type']['BV'], 4)
+    nose.tools.assert_greater(census['estimated_bytes'], 0)
+    nose.tools.assert_greater_equal(census['hash_cache_misses'], 5)
+    nose.tools.assert_greater_equal(census['hash_cache_hits'], 2) # e2 hit the cache twice
+    nose.tools.assert_greater_equal(census['backends']['z3']['object_cache'], 5)
+    nose.tools.assert_is(e, e2)
+
+    census = claripy.stats.memory_census(reset_counters=True)
+    census = claripy.stats.memory_census()
+    nose.tools.assert_equal(census['hash_cache_hits'], 0)
+    nose.tools.assert_equal(census['hash_cache_misses'], 0)
+
+def test_cache_stats():
+    claripy.stats.cache_stats(reset_counters=True)
+    x = claripy.BVS('x', 32)
+    e = x + 1
+    e2 = x + 1
+
+    stats = claripy.stats.cache_stats()
+    nose.tools.assert_is(e, e2)
+    nose.tools.assert_greater_equal(stats['asts'], 3)
+    nose.tools.assert_greater_equal(stats['hash_cache_hits'], 1)
+    nose.tools.assert_greater_equal(stats['hash_cache_misses'], 1)
+    nose.tools.assert_in('z3', stats['backends'])
+    # the cheap stats do not walk the ASTs
+    nose.tools.assert_not_in('by_op', stats)
+
+if __name__ == '__main__':
+    test_memory_census()
+    test_cache_stats()
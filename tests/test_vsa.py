@@ -1028,8 +1028,30 @@ def test_reverse():
     nose.tools.assert_equal(r2._model_vsa.max, 1337)
     nose.tools.assert_equal(r3._model_vsa.max, 1337)
 
+def test_convert_excavated():
+    from claripy.ast.base import _iter_postorder
+    vsa = claripy.backends.vsa
+
+    x = claripy.SI(bits=32, stride=1, lower_bound=0, upper_bound=10)
+    y = claripy.SI(bits=32, stride=1, lower_bound=20, upper_bound=30)
+    c = claripy.If(x == 3, y, x)
+    e = claripy.If(x == 1, c + 1, y) * 2
+
+    # some ASTs in the excavated tree are not excavated themselves. They are converted through their excavated
+    # version, so their own arguments are never converted.
+    unexcavated = [ a for a in _iter_postorder((e.ite_excavated,)) if a.ite_excavated is not a ]
+    nose.tools.assert_true(unexcavated)
+
+    vsa.downsize()
+    nose.tools.assert_true(vsa.convert(e).identical(vsa.convert(e.ite_excavated)))
+    for a in unexcavated:
+        nose.tools.assert_in(a.cache_key, vsa._object_cache)
+        for arg in a.args:
+            if isinstance(arg, claripy.ast.Base) and arg.op not in claripy.operations.leaf_operations:
+                nose.tools.assert_not_in(arg.cache_key, vsa._object_cache)
 
 if __name__ == '__main__':
+    test_convert_excavated()
     test_reasonable_bounds()
     test_reversed_concat()
     test_fucked_extract()